@@ -22,6 +22,7 @@ It is derived from one written live for an SDN crash course.
 
 from pox.core import core
 import pox.openflow.libopenflow_01 as of
+from pox.lib.packet.ethernet import ethernet
 from pox.lib.revent import *
 from pox.lib.util import dpidToStr
 from pox.lib.util import str_to_bool
@@ -32,6 +33,11 @@ log = core.getLogger()
 # We don't want to flood immediately when a switch connects.
 FLOOD_DELAY = 5
 
+# Flow for traffic to a MAC we've learned: it matches the packet exactly,
+# outputs to the destination's port and releases the buffered packet
+_flow_mod = of.FlowModTemplate(of.ofp_flow_mod(idle_timeout = 10,
+    hard_timeout = 30, action = of.ofp_action_output(port = of.OFPP_NONE)))
+
 
 class LearningSwitch (EventMixin):
   """
@@ -93,7 +99,8 @@ class LearningSwitch (EventMixin):
     Handles packet in messages from the switch to implement above algorithm.
     """
 
-    packet = event.parse()
+    # Only header fields are needed here, so skip the full parse
+    packet = event.headers
 
     def flood ():
       """ Floods the packet """
@@ -104,7 +111,7 @@ class LearningSwitch (EventMixin):
       msg = of.ofp_packet_out()
       if time.time() - self.connection.connect_time > FLOOD_DELAY:
         # Only flood if we've been connected for a little while...
-        #log.debug("%i: flood %s -> %s", event.dpid, packet.src, packet.dst)
+        #log.debug("%i: flood %s -> %s", event.dpid, packet.eth_src, packet.eth_dst)
         msg.actions.append(of.ofp_action_output(port = of.OFPP_FLOOD))
       else:
         pass
@@ -122,7 +129,7 @@ class LearningSwitch (EventMixin):
         if not isinstance(duration, tuple):
           duration = (duration,duration)
         msg = of.ofp_flow_mod()
-        msg.match = of.ofp_match.from_packet(packet)
+        msg.match = of.ofp_match.from_raw(event.data)
         msg.idle_timeout = duration[0]
         msg.hard_timeout = duration[1]
         msg.buffer_id = event.ofp.buffer_id
@@ -133,37 +140,34 @@ class LearningSwitch (EventMixin):
         msg.in_port = event.port
         self.connection.send(msg)
 
-    self.macToPort[packet.src] = event.port # 1
+    self.macToPort[packet.eth_src] = event.port # 1
 
     if not self.transparent:
-      if packet.type == packet.LLDP_TYPE or packet.dst.isBridgeFiltered(): # 2
+      if (packet.ethertype == ethernet.LLDP_TYPE or
+          packet.eth_dst.isBridgeFiltered()): # 2
         drop()
         return
 
-    if packet.dst.isMulticast():
+    if packet.eth_dst.isMulticast():
       flood() # 3a
     else:
-      if packet.dst not in self.macToPort: # 4
-        log.debug("Port for %s unknown -- flooding" % (packet.dst,))
+      if packet.eth_dst not in self.macToPort: # 4
+        log.debug("Port for %s unknown -- flooding" % (packet.eth_dst,))
         flood() # 4a
       else:
-        port = self.macToPort[packet.dst]
+        port = self.macToPort[packet.eth_dst]
         if port == event.port: # 5
           # 5a
           log.warning("Same port for packet from %s -> %s on %s.  Drop." %
-                      (packet.src, packet.dst, port), dpidToStr(event.dpid))
+                      (packet.eth_src, packet.eth_dst, port), dpidToStr(event.dpid))
           drop(10)
           return
         # 6
         log.debug("installing flow for %s.%i -> %s.%i" %
-                  (packet.src, event.port, packet.dst, port))
-        msg = of.ofp_flow_mod()
-        msg.match = of.ofp_match.from_packet(packet)
-        msg.idle_timeout = 10
-        msg.hard_timeout = 30
-        msg.actions.append(of.ofp_action_output(port = port))
-        msg.buffer_id = event.ofp.buffer_id # 6a
-        self.connection.send(msg)
+                  (packet.eth_src, event.port, packet.eth_dst, port))
+        self.connection.send(_flow_mod.pack(
+            match = of.ofp_match.from_raw(event.data), port = port,
+            buffer_id = event.ofp.buffer_id)) # 6a
 
 class l2_learning (EventMixin):
   """
@@ -29,6 +29,7 @@ import pox.openflow.libopenflow_01 as of
 from pox.lib.revent import *
 from collections import defaultdict
 from pox.openflow.discovery import Discovery
+from pox.openflow.of_01 import _clear_flows
 from pox.lib.util import dpidToStr
 
 log = core.getLogger()
@@ -45,6 +46,11 @@ mac_map = {}
 # [sw1][sw2] -> (distance, intermediate)
 path_map = defaultdict(lambda:defaultdict(lambda:(None,None)))
 
+# Flow for one hop of a path.  Every switch on the path gets the same
+# (prepacked) match and its own output port; only the first gets a buffer.
+_flow_mod = of.FlowModTemplate(of.ofp_flow_mod(idle_timeout = 10,
+    hard_timeout = 30, action = of.ofp_action_output(port = of.OFPP_NONE)))
+
 
 def _calc_paths ():
   """
@@ -151,15 +157,11 @@ class Switch (EventMixin):
     return dpidToStr(self.dpid)
 
   def _install (self, switch, port, match, buf = -1):
-    msg = of.ofp_flow_mod()
-    msg.match = match
-    msg.idle_timeout = 10
-    msg.hard_timeout = 30
-    msg.actions.append(of.ofp_action_output(port = port))
-    msg.buffer_id = buf
-    switch.connection.send(msg)
+    switch.connection.send(_flow_mod.pack(match = match, port = port,
+                                          buffer_id = buf))
 
   def _install_path (self, p, match, buffer_id = -1):
+    match = match.pack(flow_mod = True) # Same for every switch on the path
     for sw,port in p[1:]:
       self._install(sw, port, match)
 
@@ -277,7 +279,7 @@ class Switch (EventMixin):
       else:
         dest = mac_map[packet.dst]
         #print packet.dst, "is on", dest
-        match = of.ofp_match.from_packet(packet)
+        match = of.ofp_match.from_raw(event.data)
         self.install_path(dest[0], dest[1], match, event)
 
   def disconnect (self):
@@ -328,9 +330,7 @@ class l2_multi (EventMixin):
     # For link removals, this makes sure that we don't use a
     # path that may have been broken.
     #NOTE: This could be radically improved! (e.g., not *ALL* paths break)
-    clear = of.ofp_flow_mod(match=of.ofp_match(),command=of.OFPFC_DELETE)
-    for sw in switches.itervalues():
-      sw.connection.send(clear)
+    core.openflow.sendToAll(_clear_flows, switches)
     path_map.clear()
 
     if event.removed:
@@ -131,7 +131,7 @@ class l3_switch (EventMixin):
                                 hard_timeout=of.OFP_FLOW_PERMANENT,
                                 buffer_id=event.ofp.buffer_id,
                                 action=of.ofp_action_output(port = prt),
-                                match=of.ofp_match.from_packet(packet, inport))
+                                match=of.ofp_match.from_raw(event.data, inport))
           event.connection.send(msg.pack())
 
     elif isinstance(packet.next, arp):
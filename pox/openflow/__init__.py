@@ -32,12 +32,16 @@ difficult, really, but that hasn't stopped it from beind handled wrong
 wrong more than once).  In POX, the raw events are available, but you will
 generally just want to listen to the aggregate stats events which take
 care of this for you and are only fired when all data is available.
+For very large replies, there are also events for each part as it arrives
+(e.g., FlowStatsPartReceived), which let you process the entries without
+holding on to all of them at once.
 
 NOTE: this module is automatically loaded by pox.py
 """
 from pox.lib.revent import *
 import libopenflow_01 as of
 from pox.lib.packet.ethernet import ethernet
+from packet_headers import PacketHeaders
 
 class ConnectionUp (Event):
   """
@@ -139,12 +143,44 @@ class PortStatsReceived (StatsReply):
 class QueueStatsReceived (StatsReply):
   pass
 
+class StatsPartReceived (Event):
+  """
+  Abstract superclass for the parts of multipart stats replies
+
+  These fire as each part arrives, so you can process large replies (e.g.,
+  flow stats from a switch with a huge table) incrementally.  Parts are
+  only kept around for the aggregate event (e.g., FlowStatsReceived) if
+  something is listening for it.
+  ofp - this part's ofp_stats_reply
+  stats - the entries in this part
+  more - True unless this is the last part
+  """
+  def __init__ (self, connection, ofp, stats, more):
+    Event.__init__(self)
+    self.connection = connection
+    self.ofp = ofp
+    self.stats = stats
+    self.more = more
+
+class FlowStatsPartReceived (StatsPartReceived):
+  pass
+
+class TableStatsPartReceived (StatsPartReceived):
+  pass
+
+class PortStatsPartReceived (StatsPartReceived):
+  pass
+
+class QueueStatsPartReceived (StatsPartReceived):
+  pass
+
 class PacketIn (Event):
   """
   Fired in response to PacketIn events
   port (int) - number of port the packet came in on
   data (bytes) - raw packet data
   parsed (packet subclasses) - pox.lib.packet's parsed version
+  headers (PacketHeaders) - lazily decoded header fields of data
   """
   def __init__ (self, connection, ofp):
     Event.__init__(self)
@@ -152,13 +188,22 @@ class PacketIn (Event):
     self.ofp = ofp
     self.port = ofp.in_port
     self.data = ofp.data
-    self._parsed = None
+    self._headers = None
     self.dpid = connection.dpid
 
+  @property
+  def headers (self):
+    """
+    A PacketHeaders view of the packet
+
+    This is much cheaper than .parsed if you only need a few header fields.
+    """
+    if self._headers is None:
+      self._headers = PacketHeaders(self.data)
+    return self._headers
+
   def parse (self):
-    if self._parsed is None:
-      self._parsed = ethernet(self.data)
-    return self._parsed
+    return self.headers.parsed
 
   @property
   def parsed (self):
@@ -7,6 +7,8 @@ from pox.core import core
 from pox.lib.revent import EventMixin
 from pox.openflow import *
 
+log = core.getLogger()
+
 class OpenFlowConnectionArbiter (EventMixin):
   """
   Determines which OpenFlowNexus gets the switch.
@@ -50,6 +52,10 @@ class OpenFlowNexus (EventMixin):
     TableStatsReceived,
     PortStatsReceived,
     QueueStatsReceived,
+    FlowStatsPartReceived,
+    TableStatsPartReceived,
+    PortStatsPartReceived,
+    QueueStatsPartReceived,
     FlowRemoved,
   ])
 
@@ -72,6 +78,9 @@ class OpenFlowNexus (EventMixin):
   def sendToDPID (self, dpid, data):
     """
     Send data to a specific DPID.
+
+    data can be anything Connection.send() takes, including a PackedMessage
+    (see ofp_header.prepack()), which is sent without being repacked.
     """
     if dpid in self._connections:
       self._connections[dpid].send(data)
@@ -80,6 +89,50 @@ class OpenFlowNexus (EventMixin):
       print "Couldn't send to", dpid, "because we're not connected to it!"
       return False
 
+  def sendToMany (self, dpids, data):
+    """
+    Send the same data to each of the given DPIDs.
+
+    If data is an OpenFlow message, it's packed just once (so every switch
+    gets it with the same xid).  Each switch's copy goes through its own
+    connection's send queue.  Returns a list of the DPIDs it couldn't be
+    sent to.
+    """
+    if type(data) is not bytes and hasattr(data, 'pack'):
+      data = data.pack()
+    failed = []
+    for dpid in dpids:
+      con = self._connections.get(dpid)
+      if con is None or con.disconnected:
+        failed.append(dpid)
+        continue
+      try:
+        con.send(data)
+      except:
+        log.exception("Couldn't send to %s", con)
+        failed.append(dpid)
+        continue
+      if con.disconnected:
+        failed.append(dpid)
+    return failed
+
+  def sendToAll (self, data, dpids = None):
+    """
+    Send the same data to every connected switch (or just to dpids).
+
+    See sendToMany().
+    """
+    if dpids is None:
+      dpids = self._connections.keys()
+    return self.sendToMany(dpids, data)
+
+  def getSendQueueDepths (self):
+    """
+    Returns a dict of DPID -> bytes queued but not yet sent to that switch.
+    """
+    return dict((dpid, con.send_queue_depth)
+                for dpid,con in self._connections.iteritems())
+
   def _handle_DownEvent (self, event):
     for c in self._connections.values():
       try:
@@ -264,10 +264,11 @@ class Discovery (EventMixin):
   def _handle_PacketIn (self, event):
     """ Handle incoming lldp packets.  Use to maintain link state """
 
-    packet = event.parsed
+    # Check the headers first so we don't parse every other packet
+    if event.headers.ethertype != ethernet.LLDP_TYPE: return
+    if event.headers.eth_dst != NDP_MULTICAST: return
 
-    if packet.type != ethernet.LLDP_TYPE: return
-    if packet.dst != NDP_MULTICAST: return
+    packet = event.parsed
 
     if not packet.next:
       log.error("lldp packet could not be parsed")
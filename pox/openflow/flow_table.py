@@ -5,11 +5,14 @@ Implementation of an OpenFlow flow table
 @author: Colin Scott (cs@cs.berkeley.edu)
 
 """
-from collections import namedtuple
+from collections import namedtuple, OrderedDict
 from libopenflow_01 import *
 from pox.lib.revent import *
 
 import time
+import itertools
+from bisect import insort, bisect_left
+from heapq import heappush, heappop, heapify
 
 # FlowTable Entries:
 #   match - ofp_match (13-tuple)
@@ -69,6 +72,17 @@ class TableEntry (object):
     self.counters["packets"] += 1
     self.counters["last_touched"] = now
 
+  def next_expiry(self):
+    """ return the time after which this entry expires if it isn't touched again, or None if it never does """
+    deadline = None
+    if self.hard_timeout > 0:
+      deadline = self.counters["created"] + self.hard_timeout
+    if self.idle_timeout > 0:
+      idle = self.counters["last_touched"] + self.idle_timeout
+      if deadline is None or idle < deadline:
+        deadline = idle
+    return deadline
+
   def is_expired(self, now=None):
     """" return whether this flow entry is expired due to its idle timeout or hard timeout"""
     if now==None: now = time.time()
@@ -100,6 +114,207 @@ class TableEntry (object):
         actions = self.actions
         )
 
+# Exact matches always go before wildcarded ones, whatever their priority
+EXACT_MATCH_PRIORITY = (1<<16) + 1
+
+def effective_priority(entry):
+  """ the priority an entry is ordered by in a FlowTable """
+  return entry.priority if entry.match.is_wildcarded else EXACT_MATCH_PRIORITY
+
+class _MaskGroup (object):
+  """ The entries of a TupleSpaceIndex that share one compiled match mask """
+  __slots__ = ('mask', 'buckets', 'priorities', 'priority', 'projections',
+               'queried')
+
+  # most projections a group keeps at once
+  MAX_PROJECTIONS = 8
+
+  def __init__(self, mask):
+    self.mask = mask
+    # masked value -> [(rank, entry), ...] kept sorted by rank
+    self.buckets = {}
+    # effective priority -> number of entries with it
+    self.priorities = {}
+    self.priority = -1
+    # query mask -> {value & query mask -> set of bucket values}, for
+    # finding the buckets covered by queries with a narrower mask than ours
+    self.projections = {}
+    # query masks we've scanned all buckets for once
+    self.queried = set()
+
+  def add_value(self, value):
+    for (mask, projection) in self.projections.iteritems():
+      projection.setdefault(value & mask, set()).add(value)
+
+  def remove_value(self, value):
+    for (mask, projection) in self.projections.iteritems():
+      values = projection[value & mask]
+      values.discard(value)
+      if not values:
+        del projection[value & mask]
+
+  def covered_values(self, value, mask):
+    """ return the values of the buckets whose value & mask is the given one """
+    projection = self.projections.get(mask)
+    if projection is not None:
+      return projection.get(value, ())
+    if mask not in self.queried:
+      # a one-off query isn't worth building a projection for
+      self.queried.add(mask)
+      return [ v for v in self.buckets if v & mask == value ]
+    if len(self.projections) >= self.MAX_PROJECTIONS:
+      self.projections.clear()
+    projection = {}
+    for v in self.buckets:
+      projection.setdefault(v & mask, set()).add(v)
+    self.projections[mask] = projection
+    return projection.get(value, ())
+
+class TupleSpaceIndex (object):
+  """
+  Finds the best entry matching a packet by tuple space search.
+
+  Entries are grouped by the mask of their compiled match (see
+  ofp_match.compile()), and each group hashes the entries by their masked
+  value.  A lookup is one dict probe per group: groups are tried in order
+  of the highest priority they hold, stopping as soon as none of the
+  remaining ones can hold anything better than what was found.  All exact
+  matches share one mask, so they're a single probe.
+
+  Entries are ordered by a rank given when they're added (lowest first),
+  whose first element is minus the effective priority.
+
+  It also finds all the entries a match covers (for non-strict flow_mods
+  and stats requests).  Only groups whose mask includes the query's mask
+  can hold covered entries.  Where the two masks are the same, that's one
+  probe again.  Where the group's mask is wider, the group keeps a
+  projection of its values onto the query's mask (once a query with that
+  mask has come twice), so repeated queries don't scan the group either.
+  Finding the entries that overlap a match (for OFPFF_CHECK_OVERLAP) works
+  the same way on the bits both masks have in common, and skips groups
+  with nothing at the priority in question.
+  """
+  def __init__(self):
+    self._groups = {} # mask -> _MaskGroup
+    self._ordered = None # groups by descending priority, rebuilt as needed
+
+  def add(self, entry, compiled, rank):
+    group = self._groups.get(compiled.mask)
+    if group is None:
+      group = _MaskGroup(compiled.mask)
+      self._groups[compiled.mask] = group
+      self._ordered = None
+    bucket = group.buckets.get(compiled.value)
+    if bucket is None:
+      bucket = []
+      group.buckets[compiled.value] = bucket
+      group.add_value(compiled.value)
+    insort(bucket, (rank, entry))
+    priority = -rank[0]
+    group.priorities[priority] = group.priorities.get(priority, 0) + 1
+    if priority > group.priority:
+      group.priority = priority
+      self._ordered = None
+
+  def remove(self, entry, compiled, rank):
+    group = self._groups[compiled.mask]
+    bucket = group.buckets[compiled.value]
+    bucket.remove((rank, entry))
+    if not bucket:
+      del group.buckets[compiled.value]
+      group.remove_value(compiled.value)
+    priority = -rank[0]
+    count = group.priorities[priority] - 1
+    if count:
+      group.priorities[priority] = count
+      return
+    del group.priorities[priority]
+    if not group.priorities:
+      del self._groups[compiled.mask]
+      self._ordered = None
+    elif priority == group.priority:
+      group.priority = max(group.priorities)
+      self._ordered = None
+
+  def exact(self, compiled):
+    """ return the entries whose compiled match is the given one, in rank order """
+    group = self._groups.get(compiled.mask)
+    if group is None:
+      return []
+    return [entry for (rank, entry) in group.buckets.get(compiled.value, ())]
+
+  def covered(self, query):
+    """ return [(rank, entry), ...] for the entries whose matches are covered
+    by the given CompiledMatch (in no particular order) """
+    value = query.value
+    mask = query.mask
+    result = []
+    for group in self._groups.itervalues():
+      m = group.mask
+      if m & mask != mask:
+        continue
+      buckets = group.buckets
+      if m == mask:
+        bucket = buckets.get(value)
+        if bucket is not None:
+          result.extend(bucket)
+      elif mask == 0:
+        for bucket in buckets.itervalues():
+          result.extend(bucket)
+      else:
+        for v in group.covered_values(value, mask):
+          result.extend(buckets[v])
+    return result
+
+  def overlapping(self, compiled, priority):
+    """ return [(rank, entry), ...] for the entries with the given priority
+    whose matches overlap the given CompiledMatch, i.e., some packet could
+    match both (in no particular order) """
+    value = compiled.value
+    mask = compiled.mask
+    result = []
+    for group in self._groups.itervalues():
+      if (priority not in group.priorities
+          and EXACT_MATCH_PRIORITY not in group.priorities):
+        # exact matches are ranked above their priority, so they can't
+        # be pruned by it
+        continue
+      m = group.mask
+      common = m & mask
+      if common == m:
+        values = (value & m,) if value & m in group.buckets else ()
+      else:
+        values = group.covered_values(value & common, common)
+      for v in values:
+        for (rank, entry) in group.buckets[v]:
+          if entry.priority == priority:
+            result.append((rank, entry))
+    return result
+
+  def lookup(self, packet_match):
+    """ return the best entry covering the given CompiledMatch, or None """
+    ordered = self._ordered
+    if ordered is None:
+      ordered = sorted(self._groups.itervalues(),
+                       key=lambda(g): g.priority, reverse=True)
+      self._ordered = ordered
+    value = packet_match.value
+    mask = packet_match.mask
+    best = None
+    for group in ordered:
+      if best is not None and group.priority < -best[0][0]:
+        break
+      m = group.mask
+      if mask & m != m:
+        continue
+      bucket = group.buckets.get(value & m)
+      if bucket is not None and (best is None or bucket[0] < best):
+        best = bucket[0]
+    return best[1] if best is not None else None
+
+  def __len__(self):
+    return len(self._groups)
+
 class FlowTableModification (Event):
   def __init__(self, added=[], removed=[]):
     Event.__init__(self)
@@ -115,39 +330,152 @@ class FlowTable (EventMixin):
   """
   def __init__(self):
     EventMixin.__init__(self)
-    # For now we represent the table as a multidimensional array.
-    #
-    # [ (cookie, match, counters, actions),
-    #   (cookie, match, counters, actions),
-    #    ...                        ]
-    # 
-    # Implies O(N) lookup for now. TODO: fix
-    self._table = []
+    # Entries are kept ordered by descending priority, with exact matches
+    # always going first, and in the order they were added within a
+    # priority.  Each (effective) priority has a bucket of its entries, so
+    # adding or removing one doesn't have to touch the others.
+    self._buckets = {} # effective priority -> OrderedDict of entries
+    self._priorities = [] # the negated priorities of _buckets, ascending
+    self._entries = None # all of the entries in order, built as needed
+    # Lookups for packets go through _index instead (see TupleSpaceIndex).
+    self._index = TupleSpaceIndex()
+    # entry -> (compiled match, rank) as it was added to _index
+    self._indexed = {}
+    # port -> set of entries with an output action to it (see set_actions)
+    self._out_ports = {}
+    self._sequence = itertools.count()
+    # Heap of (deadline, rank sequence number, entry) for entries with
+    # timeouts.  Touching an entry doesn't update it; instead, an entry
+    # whose deadline comes up but which was touched since is pushed again
+    # with its new deadline.  Items for removed entries are skipped (and
+    # cleared out once they pile up).
+    self._expiry = []
+
+  @property
+  def _table(self):
+    """ the list of entries, in order """
+    entries = self._entries
+    if entries is None:
+      buckets = self._buckets
+      entries = [ entry for p in self._priorities for entry in buckets[-p] ]
+      self._entries = entries
+    return entries
 
   @property
   def entries(self):
     return self._table
 
   def __len__(self):
-    return len(self._table)
+    return len(self._indexed)
 
   def add_entry(self, entry):
     if not isinstance(entry, TableEntry):
       raise "Not an Entry type"
-    self._table.append(entry)
-
-    # keep table sorted by descending priority, with exact matches always going first
-    # note: python sort is stable
-    self._table.sort(key=lambda(e): (e.priority if e.match.is_wildcarded else (1<<16) + 1), reverse=True)
-
+    self._add(entry)
     self.raiseEvent(FlowTableModification(added=[entry]))
 
+  def add_entries(self, entries):
+    """ add a batch of entries (e.g., when loading a whole table), raising a
+    single FlowTableModification for all of them """
+    entries = list(entries)
+    for entry in entries:
+      if not isinstance(entry, TableEntry):
+        raise "Not an Entry type"
+    for entry in entries:
+      self._add(entry)
+    self.raiseEvent(FlowTableModification(added=entries))
+
   def remove_entry(self, entry):
     if not isinstance(entry, TableEntry):
       raise "Not an Entry type"
-    self._table.remove(entry)
+    self._remove(entry)
     self.raiseEvent(FlowTableModification(removed=[entry]))
 
+  def _add(self, entry):
+    if entry in self._indexed:
+      # re-adding an entry (e.g., a NOMFlowTable resync) replaces it
+      self._remove(entry)
+    priority = effective_priority(entry)
+    bucket = self._buckets.get(priority)
+    if bucket is None:
+      bucket = OrderedDict()
+      self._buckets[priority] = bucket
+      insort(self._priorities, -priority)
+    bucket[entry] = None
+    self._entries = None
+
+    compiled = entry.match.compile()
+    # ties in priority go to the entry added first, as in _table
+    rank = (-priority, self._sequence.next())
+    self._indexed[entry] = (compiled, rank)
+    self._index.add(entry, compiled, rank)
+    self._index_ports(entry, entry.actions)
+    deadline = entry.next_expiry()
+    if deadline is not None:
+      heappush(self._expiry, (deadline, rank[1], entry))
+
+  def _remove(self, entry):
+    if entry not in self._indexed:
+      raise ValueError("Entry not in table")
+    (compiled, rank) = self._indexed.pop(entry)
+    self._index.remove(entry, compiled, rank)
+    self._unindex_ports(entry, entry.actions)
+
+    priority = -rank[0]
+    bucket = self._buckets[priority]
+    del bucket[entry]
+    if not bucket:
+      del self._buckets[priority]
+      del self._priorities[bisect_left(self._priorities, -priority)]
+    self._entries = None
+
+    if len(self._expiry) > 2 * len(self._indexed) + 64:
+      self._expiry = [ item for item in self._expiry if self._is_scheduled(item) ]
+      heapify(self._expiry)
+
+  def _index_ports(self, entry, actions):
+    for action in actions:
+      if isinstance(action, ofp_action_output):
+        self._out_ports.setdefault(action.port, set()).add(entry)
+
+  def _unindex_ports(self, entry, actions):
+    for action in actions:
+      if isinstance(action, ofp_action_output):
+        entries = self._out_ports.get(action.port)
+        if entries is not None:
+          entries.discard(entry)
+          if not entries:
+            del self._out_ports[action.port]
+
+  def set_actions(self, entry, actions):
+    """ change the actions of an entry in the table. Use this rather than
+    assigning entry.actions, which would leave out_port queries stale. """
+    self._unindex_ports(entry, entry.actions)
+    entry.actions = actions
+    self._index_ports(entry, actions)
+
+  def _is_scheduled(self, item):
+    """ whether an item of _expiry is for an entry (still) in the table """
+    indexed = self._indexed.get(item[2])
+    return indexed is not None and indexed[1][1] == item[1]
+
+  def _pop_expired(self, now):
+    """ take the entries which have expired off the expiry heap, and return them in table order """
+    heap = self._expiry
+    expired = []
+    while heap and heap[0][0] < now:
+      item = heappop(heap)
+      if not self._is_scheduled(item):
+        continue
+      entry = item[2]
+      if entry.is_expired(now):
+        expired.append(entry)
+      else:
+        # touched since it was scheduled
+        heappush(heap, (max(entry.next_expiry(), now), item[1], entry))
+    expired.sort(key=lambda(e): self._indexed[e][1])
+    return expired
+
   def entries_for_port(self, port_no):
     entries = []
     for entry in self._table:
@@ -161,38 +489,64 @@ class FlowTable (EventMixin):
     return entries
 
   def matching_entries(self, match, priority=0, strict=False, out_port=None):
-    return [ entry for entry in self._table if entry.is_matched_by(match, priority, strict, out_port) ]
+    if out_port == OFPP_NONE:
+      out_port = None
+    if strict:
+      # only entries with the same compiled match can be strict matches
+      return [ entry for entry in self._index.exact(match.compile()) if entry.is_matched_by(match, priority, strict, out_port) ]
+
+    query = match.compile()
+    if out_port is not None:
+      with_port = self._out_ports.get(out_port, ())
+      if query.mask == 0:
+        found = [ (self._indexed[entry][1], entry) for entry in with_port if entry in self._indexed ]
+      else:
+        found = [ c for c in self._index.covered(query) if c[1] in with_port ]
+    elif query.mask == 0:
+      return list(self._table)
+    else:
+      found = self._index.covered(query)
+    found.sort()
+    return [ entry for (rank, entry) in found ]
+
+  def overlapping_entries(self, match, priority):
+    """ return the entries with the given priority that a packet could match along with the given match """
+    found = self._index.overlapping(match.compile(), priority)
+    found.sort()
+    return [ entry for (rank, entry) in found ]
 
   def flow_stats(self, match, out_port=None, now=None):
     return ( e.flow_stats() for e in self.matching_entries(match=match, strict=False, out_port=out_port))
 
   def expired_entries(self, now=None):
-    return [ entry for entry in self._table if entry.is_expired(now) ]
+    if now == None: now = time.time()
+    expired = self._pop_expired(now)
+    for entry in expired:
+      # still in the table, so they stay scheduled
+      heappush(self._expiry, (entry.next_expiry(), self._indexed[entry][1][1], entry))
+    return expired
 
   def remove_expired_entries(self, now=None):
-    remove_flows = self.expired_entries(now)
+    """ remove all expired entries, raising one FlowTableModification for all of them.
+    Only looks at entries whose deadlines have passed. """
+    if now == None: now = time.time()
+    remove_flows = self._pop_expired(now)
     for entry in remove_flows:
-        self._table.remove(entry)
+        self._remove(entry)
     self.raiseEvent(FlowTableModification(removed=remove_flows))
     return remove_flows
 
-  def remove_matching_entries(self, match, priority=0, strict=False):
-    remove_flows = self.matching_entries(match, priority, strict)
+  def remove_matching_entries(self, match, priority=0, strict=False, out_port=None):
+    remove_flows = self.matching_entries(match, priority, strict, out_port)
     for entry in remove_flows:
-        self._table.remove(entry)
+        self._remove(entry)
     self.raiseEvent(FlowTableModification(removed=remove_flows))
     return remove_flows
 
   def entry_for_packet(self, packet, in_port):
     """ return the highest priority flow table entry that matches the given packet 
     on the given in_port, or None if no matching entry is found. """
-    packet_match = ofp_match.from_packet(packet, in_port)
-
-    for entry in self._table:
-      if entry.match.matches_with_wildcards(packet_match, consider_other_wildcards=False):
-        return entry
-    else:
-      return None
+    return self._index.lookup(ofp_match.from_packet(packet, in_port).compile())
 
 class SwitchFlowTable(FlowTable):
   """ 
@@ -202,32 +556,38 @@ class SwitchFlowTable(FlowTable):
 
   def process_flow_mod(self, flow_mod):
     """ Process a flow mod sent to the switch 
-    @return a tuple (added|modified|removed, [list of affected entries])
+    @return a tuple (added|modified|removed, [list of affected entries]), or
+      (overlap, [list of overlapping entries]) if an OFPFF_CHECK_OVERLAP add
+      was refused (in which case the table is unchanged)
     """
-    if(flow_mod.flags & OFPFF_CHECK_OVERLAP): raise NotImplementedError("OFPFF_CHECK_OVERLAP checking not implemented")
-    if(flow_mod.out_port != OFPP_NONE): raise NotImplementedError("flow_mod outport checking not implemented")
-
     if flow_mod.command == OFPFC_ADD:
+      if(flow_mod.flags & OFPFF_CHECK_OVERLAP):
+        overlapping = self.overlapping_entries(flow_mod.match, flow_mod.priority)
+        if overlapping:
+          return ("overlap", overlapping)
       # exactly matching entries have to be removed
       self.remove_matching_entries(flow_mod.match,flow_mod.priority, strict=True)
-      return ("added", self.add_entry(TableEntry.from_flow_mod(flow_mod)))
+      entry = TableEntry.from_flow_mod(flow_mod)
+      self.add_entry(entry)
+      return ("added", [entry])
     elif flow_mod.command == OFPFC_MODIFY or flow_mod.command == OFPFC_MODIFY_STRICT:
       is_strict = (flow_mod.command == OFPFC_MODIFY_STRICT)
-      modified = []
-      for entry in self._table:
+      modified = self.matching_entries(flow_mod.match, priority=flow_mod.priority, strict=is_strict)
+      for entry in modified:
         # update the actions field in the matching flows
-        if(entry.is_matched_by(flow_mod.match, priority=flow_mod.priority, strict=is_strict)):
-          entry.actions = flow_mod.actions
-          modified.append(entry)
+        self.set_actions(entry, flow_mod.actions)
       if(len(modified) == 0):
         # if no matching entry is found, modify acts as add
-        return ("added", self.add_entry(TableEntry.from_flow_mod(flow_mod)))
+        entry = TableEntry.from_flow_mod(flow_mod)
+        self.add_entry(entry)
+        return ("added", [entry])
       else:
         return ("modified", modified)
 
     elif flow_mod.command == OFPFC_DELETE or flow_mod.command == OFPFC_DELETE_STRICT:
+      # only deletes look at out_port (OFPP_NONE means any port)
       is_strict = (flow_mod.command == OFPFC_DELETE_STRICT)
-      return ("removed", self.remove_matching_entries(flow_mod.match, flow_mod.priority, strict=True))
+      return ("removed", self.remove_matching_entries(flow_mod.match, flow_mod.priority, strict=is_strict, out_port=flow_mod.out_port))
     else:
       raise AttributeError("Command not yet implemented: %s" % flow_mod.command)
 
@@ -342,16 +702,23 @@ class NOMFlowTable(EventMixin):
     if barrier.xid in self.pending_barrier_to_ops:
       added = []
       removed = []
+      # runs of adds (e.g., a whole table after a reconnect) go in together
+      to_add = []
       #print "barrier in: pending for barrier: %d: %s" % (barrier.xid, self.pending_barrier_to_ops[barrier.xid])
       for op in self.pending_barrier_to_ops[barrier.xid]:
         (command, entry) = op
         if(command == NOMFlowTable.ADD):
-          self.flow_table.add_entry(entry)
+          to_add.append(entry)
           added.append(entry)
         else:
+          if to_add:
+            self.flow_table.add_entries(to_add)
+            to_add = []
           removed.extend(self.flow_table.remove_matching_entries(entry.match, entry.priority, strict=command == NOMFlowTable.REMOVE_STRICT))
         #print "op: %s, pending: %s" % (op, self.pending)
         self.pending.remove(op)
+      if to_add:
+        self.flow_table.add_entries(to_add)
       del self.pending_barrier_to_ops[barrier.xid]
       self.raiseEvent(FlowTableModification(added = added, removed=removed))
       return EventHalt
@@ -21,6 +21,7 @@
 
 import struct
 import operator
+import binascii
 import collections
 import sys
 from pox.lib.packet.packet_base import packet_base
@@ -44,9 +45,86 @@ _PAD3 = _PAD*3
 _PAD4 = _PAD*4
 _PAD6 = _PAD*6
 
+# Precompiled codecs, named after their format strings
+_struct_B = struct.Struct("!B")
+_struct_BB = struct.Struct("!BB")
+_struct_BBH = struct.Struct("!BBH")
+_struct_BBHL = struct.Struct("!BBHL")
+_struct_H = struct.Struct("!H")
+_struct_HB = struct.Struct("!HB")
+_struct_HBB = struct.Struct("!HBB")
+_struct_HH = struct.Struct("!HH")
+_struct_HHB = struct.Struct("!HHB")
+_struct_HHBxxx = struct.Struct("!HHBxxx")
+_struct_HHH = struct.Struct("!HHH")
+_struct_HHHH = struct.Struct("!HHHH")
+_struct_HHHxx = struct.Struct("!HHHxx")
+_struct_HHI = struct.Struct("!HHI")
+_struct_HHL = struct.Struct("!HHL")
+_struct_HHl = struct.Struct("!HHl")
+_struct_HL = struct.Struct("!HL")
+_struct_IBxxx = struct.Struct("!IBxxx")
+_struct_L = struct.Struct("!L")
+_struct_LH = struct.Struct("!LH")
+_struct_LHH = struct.Struct("!LHH")
+_struct_LHHBB = struct.Struct("!LHHBB")
+_struct_LL = struct.Struct("!LL")
+_struct_LLH = struct.Struct("!LLH")
+_struct_LLHH = struct.Struct("!LLHH")
+_struct_LLHHH = struct.Struct("!LLHHH")
+_struct_LLL = struct.Struct("!LLL")
+_struct_LLLLLL = struct.Struct("!LLLLLL")
+_struct_LLLQQ = struct.Struct("!LLLQQ")
+_struct_LQQQ = struct.Struct("!LQQQ")
+_struct_QHB = struct.Struct("!QHB")
+_struct_QHHHHLHH = struct.Struct("!QHHHHLHH")
+_struct_QLB = struct.Struct("!QLB")
+_struct_QQ = struct.Struct("!QQ")
+_struct_QQL = struct.Struct("!QQL")
+_struct_QQQ = struct.Struct("!QQQ")
+_struct_QQQQQQQQQQQQ = struct.Struct("!QQQQQQQQQQQQ")
+
+# Composite codecs for hot structures (padding included)
+_struct_match = struct.Struct("!LH6s6sHBxHBBxxLLHH")
+_struct_phy_port = struct.Struct("!H6s16sLLLLLL")
+_struct_flow_removed = struct.Struct("!QHBxLLHxxQQ")
+_struct_flow_stats = struct.Struct("!LLHHHxxxxxxQQQ")
+
+# Packet header codecs (see ofp_match.from_raw())
+_struct_eth_header = struct.Struct("!6s6sH")
+_struct_ipv4_header = struct.Struct("!BBHHHBBHLL")
+_struct_arp_body = struct.Struct("!HHBBHxxxxxxLxxxxxxL")
+
 
 EMPTY_ETH = EthAddr(None)
 
+# Decoded addresses are interned, so that decoding a large flow stats reply
+# doesn't allocate a fresh pair of address objects for every entry.  Each
+# cache is simply emptied when it reaches this size.
+ADDR_CACHE_SIZE = 4096
+_eth_cache = {}
+_ip_cache = {}
+
+def _intern_eth (raw):
+  """
+  Returns an EthAddr for the six byte string raw, shared where possible
+  """
+  a = _eth_cache.get(raw)
+  if a is None:
+    if len(_eth_cache) >= ADDR_CACHE_SIZE: _eth_cache.clear()
+    a = _eth_cache[raw] = EthAddr(raw)
+  return a
+
+def _intern_ip (addr):
+  """
+  Returns an IPAddr for the unsigned int addr, shared where possible
+  """
+  a = _ip_cache.get(addr)
+  if a is None:
+    if len(_ip_cache) >= ADDR_CACHE_SIZE: _ip_cache.clear()
+    a = _ip_cache[addr] = IPAddr(addr)
+  return a
+
 MAX_XID = 0x7fFFffFF
 _nextXID = 1
 #USE_MPLS_MATCH = False
@@ -65,6 +143,18 @@ def xid_generator(start=1):
     yield n
     n  = ( n + 1 )  % (MAX_XID + 1)
 
+def _read_bytes (buf, start, end):
+  """
+  Returns buf[start:end] as a byte string
+
+  buf may be a str, buffer, bytearray or memoryview.  The result is always
+  a copy, so it stays valid if buf is reused.
+  """
+  b = buf[start:end]
+  if type(b) is bytes: return b
+  if type(b) is memoryview: return b.tobytes()
+  return bytes(b)
+
 def _format_body (body, prefix):
   if hasattr(body, 'show'):
     #TODO: Check this (spacing may well be wrong)
@@ -97,16 +187,38 @@ class ofp_header (object):
     if(assertstruct):
       if(not ofp_header._assert(self)[0]):
         raise RuntimeError("assertstruct failed")
-    packed = ""
-    packed += struct.pack("!BBHL", self.version, self.header_type, self.length,
-                          self.xid)
-    return packed
+    return _struct_BBHL.pack(self.version, self.header_type, self.length,
+                             self.xid)
+
+  def pack_into (self, buf, offset=0, assertstruct=True):
+    """
+    Packs the header into buf at offset and returns the offset after it
+    """
+    if self.xid is None:
+      self.xid = generateXID()
+    if(assertstruct):
+      if(not ofp_header._assert(self)[0]):
+        raise RuntimeError("assertstruct failed")
+    _struct_BBHL.pack_into(buf, offset, self.version, self.header_type,
+                           self.length, self.xid)
+    return offset + 8
+
+  def prepack (self):
+    """
+    Returns a PackedMessage of this message, for sending many times
+
+    Later changes to this message don't affect the PackedMessage.
+    """
+    return PackedMessage(self.pack())
+
+  def unpack_from (self, buf, offset=0):
+    if (len(buf) - offset < 8):
+      return offset
+    (self.version, self.header_type, self.length, self.xid) = _struct_BBHL.unpack_from(buf, offset)
+    return offset + 8
 
   def unpack (self, binaryString):
-    if (len(binaryString) < 8):
-      return binaryString
-    (self.version, self.header_type, self.length, self.xid) = struct.unpack_from("!BBHL", binaryString, 0)
-    return binaryString[8:]
+    return binaryString[self.unpack_from(binaryString):]
 
   def __len__ (self):
     return self.length
@@ -133,9 +245,41 @@ class ofp_header (object):
   def __str__ (self):
     return self.__class__.__name__ + "\n  " + self.show('  ').strip()
 
+class PackedMessage (object):
+  """
+  The wire bytes of an OpenFlow message, packed just once
+
+  Get one from ofp_header.prepack().  pack() patches in a new xid (or the
+  one it's given) each time, so the message can be sent over and over
+  without being rebuilt.  Connection.send() takes these like any other
+  message.
+  """
+  __slots__ = ('_head', '_body', 'xid')
+
+  def __init__ (self, data):
+    self._head = data[:4]
+    self._body = data[8:]
+    self.xid = None # The xid used by the last pack()
+
+  @property
+  def header_type (self):
+    return ord(self._head[1])
+
+  def pack (self, xid=None):
+    if xid is None:
+      xid = generateXID()
+    self.xid = xid
+    return b''.join((self._head, _struct_L.pack(xid), self._body))
+
+  def __len__ (self):
+    return 8 + len(self._body)
+
 #2. Common Structures
 ##2.1 Port Structures
 class ofp_phy_port (object):
+  __slots__ = ('port_no', 'hw_addr', 'name', 'config', 'state', 'curr',
+               'advertised', 'supported', 'peer')
+
   def __init__ (self, **kw):
     self.port_no = 0
     self.hw_addr = EMPTY_ETH
@@ -163,21 +307,31 @@ class ofp_phy_port (object):
     if(assertstruct):
       if(not self._assert()[0]):
         return None
-    packed = ""
-    packed += struct.pack("!H", self.port_no)
-    packed += self.hw_addr if isinstance(self.hw_addr, bytes) else self.hw_addr.toRaw()
-    packed += self.name.ljust(16,'\0')
-    packed += struct.pack("!LLLLLL", self.config, self.state, self.curr, self.advertised, self.supported, self.peer)
-    return packed
+    return _struct_phy_port.pack(*self._pack_fields())
+
+  def pack_into (self, buf, offset=0, assertstruct=True):
+    if(assertstruct):
+      if(not self._assert()[0]):
+        return None
+    _struct_phy_port.pack_into(buf, offset, *self._pack_fields())
+    return offset + 48
+
+  def _pack_fields (self):
+    hw_addr = self.hw_addr if isinstance(self.hw_addr, bytes) else self.hw_addr.toRaw()
+    return (self.port_no, hw_addr, self.name, self.config, self.state,
+            self.curr, self.advertised, self.supported, self.peer)
+
+  def unpack_from (self, buf, offset=0):
+    if (len(buf) - offset < 48):
+      return offset
+    (self.port_no,) = _struct_H.unpack_from(buf, offset)
+    self.hw_addr = _intern_eth(_read_bytes(buf, offset + 2, offset + 8))
+    self.name = _read_bytes(buf, offset + 8, offset + 24).replace("\0","")
+    (self.config, self.state, self.curr, self.advertised, self.supported, self.peer) = _struct_LLLLLL.unpack_from(buf, offset + 24)
+    return offset + 48
 
   def unpack (self, binaryString):
-    if (len(binaryString) < 48):
-      return binaryString
-    (self.port_no,) = struct.unpack_from("!H", binaryString, 0)
-    self.hw_addr = EthAddr(binaryString[2:8])
-    self.name = binaryString[8:24].replace("\0","")
-    (self.config, self.state, self.curr, self.advertised, self.supported, self.peer) = struct.unpack_from("!LLLLLL", binaryString, 24)
-    return binaryString[48:]
+    return binaryString[self.unpack_from(binaryString):]
 
   def __len__ (self):
     return 48
@@ -256,6 +410,8 @@ ofp_port_features_rev_map = {
 
 ##2.2 Queue Structures
 class ofp_packet_queue (object):
+  __slots__ = ('queue_id', 'length', 'properties')
+
   def __init__ (self, **kw):
     self.queue_id = 0
     self.length = 0
@@ -271,17 +427,20 @@ class ofp_packet_queue (object):
       if(not self._assert()[0]):
         return None
     packed = ""
-    packed += struct.pack("!LH", self.queue_id, self.length)
+    packed += _struct_LH.pack(self.queue_id, self.length)
     packed += _PAD2 # Pad
     for i in self.properties:
       packed += i.pack(assertstruct)
     return packed
 
+  def unpack_from (self, buf, offset=0):
+    if (len(buf) - offset < 8):
+      return offset
+    (self.queue_id, self.length) = _struct_LH.unpack_from(buf, offset)
+    return offset + 8
+
   def unpack (self, binaryString):
-    if (len(binaryString) < 8):
-      return binaryString
-    (self.queue_id, self.length) = struct.unpack_from("!LH", binaryString, 0)
-    return binaryString[8:]
+    return binaryString[self.unpack_from(binaryString):]
 
   def __len__ (self):
     l = 8
@@ -313,6 +472,8 @@ ofp_queue_properties_rev_map = {
 OFPQT_NONE         = 0
 
 class ofp_queue_prop_header (object):
+  __slots__ = ('property', 'length')
+
   def __init__ (self, **kw):
     self.property = 0
     self.length = 8
@@ -327,15 +488,18 @@ class ofp_queue_prop_header (object):
       if(not self._assert()[0]):
         return None
     packed = ""
-    packed += struct.pack("!HH", self.property, self.length)
+    packed += _struct_HH.pack(self.property, self.length)
     packed += _PAD4 # Pad
     return packed
 
+  def unpack_from (self, buf, offset=0):
+    if (len(buf) - offset < 8):
+      return offset
+    (self.property, self.length) = _struct_HH.unpack_from(buf, offset)
+    return offset + 8
+
   def unpack (self, binaryString):
-    if (len(binaryString) < 8):
-      return binaryString
-    (self.property, self.length) = struct.unpack_from("!HH", binaryString, 0)
-    return binaryString[8:]
+    return binaryString[self.unpack_from(binaryString):]
 
   def __len__ (self):
     return 8
@@ -355,6 +519,8 @@ class ofp_queue_prop_header (object):
     return outstr
 
 class ofp_queue_prop_min_rate (object):
+  __slots__ = ('prop_header', 'rate')
+
   def __init__ (self, **kw):
     self.prop_header = ofp_queue_prop_header()
     self.rate = 0
@@ -372,16 +538,19 @@ class ofp_queue_prop_min_rate (object):
         return None
     packed = ""
     packed += self.prop_header.pack()
-    packed += struct.pack("!H", self.rate)
+    packed += _struct_H.pack(self.rate)
     packed += _PAD6
     return packed
 
+  def unpack_from (self, buf, offset=0):
+    if (len(buf) - offset < 16):
+      return offset
+    self.prop_header.unpack_from(buf, offset)
+    (self.rate,) = _struct_H.unpack_from(buf, offset + 8)
+    return offset + 16
+
   def unpack (self, binaryString):
-    if (len(binaryString) < 16):
-      return binaryString
-    self.prop_header.unpack(binaryString[0:])
-    (self.rate,) = struct.unpack_from("!H", binaryString, 8)
-    return binaryString[16:]
+    return binaryString[self.unpack_from(binaryString):]
 
   def __len__ (self):
     return 16
@@ -402,7 +571,62 @@ class ofp_queue_prop_min_rate (object):
     return outstr
 
 ##2.3 Flow Match Structures
+class MatchKey (collections.namedtuple('MatchKey', ('wildcards', 'in_port',
+    'dl_src', 'dl_dst', 'dl_vlan', 'dl_vlan_pcp', 'dl_type', 'nw_tos',
+    'nw_proto', 'nw_src', 'nw_dst', 'tp_src', 'tp_dst'))):
+  """
+  Immutable, hashable form of an ofp_match (see ofp_match.key())
+
+  All fields are integers.  Ethernet addresses are 48 bit numbers.
+  """
+  __slots__ = ()
+
+def _eth_to_int (addr):
+  if type(addr) is not bytes:
+    addr = addr.toRaw()
+  hi,lo = _struct_HL.unpack(addr)
+  return (hi << 32) | lo
+
+def _eth_to_raw (addr):
+  if addr is None: return EMPTY_ETH.toRaw()
+  if type(addr) is bytes: return addr
+  return addr.toRaw()
+
+def _ip_to_int (addr):
+  if addr is None: return 0
+  if type(addr) in (int, long): return addr & 0xffFFffFF
+  return addr.toUnsigned()
+
+class CompiledMatch (collections.namedtuple('CompiledMatch',
+                                            ('value', 'mask'))):
+  """
+  An ofp_match compiled to a (value, mask) pair (see ofp_match.compile())
+
+  Both are integers over the 40 byte wire layout of the match, with the
+  wildcards word and padding always zero.  mask has every bit of every
+  non-wildcarded field set (just the prefix bits for nw_src/nw_dst), and
+  value holds the field values under that mask.
+  """
+  __slots__ = ()
+
+  def covers (self, other):
+    """
+    True if every packet the other CompiledMatch matches is matched by this
+    one (i.e., this is the same as or a superset of other).  For an exact
+    match such as one made by ofp_match.from_packet(), this is just whether
+    the packet matches.
+    """
+    m = self.mask
+    return other.mask & m == m and other.value & m == self.value
+
+_ETH_MASK = b'\xff' * 6
+_ETH_NONE = b'\x00' * 6
+
 class ofp_match (object):
+  __slots__ = ('wildcards', '_in_port', '_dl_src', '_dl_dst', '_dl_vlan',
+               '_dl_vlan_pcp', '_dl_type', '_nw_tos', '_nw_proto', '_nw_src',
+               '_nw_dst', '_tp_src', '_tp_dst', '_compiled')
+
   @classmethod
   def from_packet (cls, packet, in_port = None):
     """ get a match that matches this packet, asuming it came in on in_port in_port
@@ -455,6 +679,91 @@ class ofp_match (object):
 
     return match
 
+  @classmethod
+  def from_raw (cls, data, in_port = None):
+    """
+    Get a match for a raw ethernet frame (e.g., the data of a PacketIn)
+
+    Gives the same match as from_packet(ethernet(data), in_port), but reads
+    the fields straight out of data at fixed offsets instead of parsing the
+    whole packet.  data can be a str, buffer or memoryview.  Headers which
+    are cut short (e.g., by miss_send_len) leave their fields wildcarded, as
+    do the transport ports of IP fragments.
+    """
+    match = cls()
+    s = object.__setattr__
+    w = match.wildcards
+
+    if in_port is not None:
+      s(match, '_in_port', in_port)
+      w &= ~OFPFW_IN_PORT
+
+    size = len(data)
+    if size < 14:
+      s(match, 'wildcards', w)
+      return match
+
+    (dst, src, dl_type) = _struct_eth_header.unpack_from(data, 0)
+    s(match, '_dl_dst', _intern_eth(dst))
+    s(match, '_dl_src', _intern_eth(src))
+    w &= ~(OFPFW_DL_SRC | OFPFW_DL_DST | OFPFW_DL_TYPE)
+    offset = 14
+
+    if dl_type == ethernet.VLAN_TYPE:
+      if size < 18:
+        s(match, '_dl_type', dl_type)
+        s(match, 'wildcards', w)
+        return match
+      (tci, dl_type) = _struct_HH.unpack_from(data, 14)
+      s(match, '_dl_vlan', tci & 0x0fff)
+      s(match, '_dl_vlan_pcp', tci >> 13)
+      offset = 18
+    else:
+      s(match, '_dl_vlan', OFP_VLAN_NONE)
+      s(match, '_dl_vlan_pcp', 0)
+    s(match, '_dl_type', dl_type)
+    w &= ~(OFPFW_DL_VLAN | OFPFW_DL_VLAN_PCP)
+
+    if dl_type == ethernet.IP_TYPE:
+      if size - offset >= 20:
+        (vhl, tos, _, _, frag, _, proto, _, nw_src,
+         nw_dst) = _struct_ipv4_header.unpack_from(data, offset)
+        hl = (vhl & 0x0f) * 4
+        if vhl >> 4 == 4 and hl >= 20:
+          s(match, '_nw_src', _intern_ip(nw_src))
+          s(match, '_nw_dst', _intern_ip(nw_dst))
+          s(match, '_nw_proto', proto)
+          s(match, '_nw_tos', tos)
+          w &= ~(OFPFW_NW_SRC_MASK | OFPFW_NW_DST_MASK | OFPFW_NW_PROTO
+                 | OFPFW_NW_TOS)
+          offset += hl
+          # Skip fragments (MF set or a fragment offset) and short headers
+          if (frag & 0x3fff) == 0 and size - offset >= 4:
+            if proto == ipv4.TCP_PROTOCOL or proto == ipv4.UDP_PROTOCOL:
+              tp = _struct_HH # Ports
+            elif proto == ipv4.ICMP_PROTOCOL:
+              tp = _struct_BB # Type and code
+            else:
+              tp = None
+            if tp is not None:
+              (tp_src, tp_dst) = tp.unpack_from(data, offset)
+              s(match, '_tp_src', tp_src)
+              s(match, '_tp_dst', tp_dst)
+              w &= ~(OFPFW_TP_SRC | OFPFW_TP_DST)
+    elif dl_type == ethernet.ARP_TYPE:
+      if size - offset >= 28:
+        (hwtype, prototype, hwlen, protolen, opcode, nw_src,
+         nw_dst) = _struct_arp_body.unpack_from(data, offset)
+        if (hwtype == arp.HW_TYPE_ETHERNET and prototype == arp.PROTO_TYPE_IP
+            and hwlen == 6 and protolen == 4 and opcode <= 255):
+          s(match, '_nw_src', _intern_ip(nw_src))
+          s(match, '_nw_dst', _intern_ip(nw_dst))
+          s(match, '_nw_proto', opcode)
+          w &= ~(OFPFW_NW_SRC_MASK | OFPFW_NW_DST_MASK | OFPFW_NW_PROTO)
+
+    s(match, 'wildcards', w)
+    return match
+
   def optimize (self):
     """
     Reduce the number of wildcards used.
@@ -486,15 +795,15 @@ class ofp_match (object):
     return self # for chaining
 
   def clone (self):
-    n = ofp_match()
-    for k,v in ofp_match_data.iteritems():
-      setattr(n, '_' + k, getattr(self, '_' + k))
-    n.wildcards = self.wildcards
+    n = ofp_match.__new__(ofp_match)
+    for k in ofp_match.__slots__:
+      object.__setattr__(n, k, getattr(self, k))
     return n
 
   def __init__ (self, **kw):
-    for k,v in ofp_match_data.iteritems():
-      setattr(self, '_' + k, v[0])
+    for k,v in _ofp_match_defaults:
+      object.__setattr__(self, k, v)
+    object.__setattr__(self, '_compiled', None)
 
     self.wildcards = self._normalize_wildcards(OFPFW_ALL)
 
@@ -571,7 +880,10 @@ class ofp_match (object):
 
   def __setattr__ (self, name, value):
     if name not in ofp_match_data:
-      self.__dict__[name] = value
+      object.__setattr__(self, name, value)
+      if name != '_compiled':
+        # Any change invalidates the compiled form
+        object.__setattr__(self, '_compiled', None)
       return
 
     if name == 'nw_dst' or name == 'nw_src':
@@ -580,11 +892,12 @@ class ofp_match (object):
       return value
 
     if value is None:
-      setattr(self, '_' + name, ofp_match_data[name][0])
+      object.__setattr__(self, '_' + name, ofp_match_data[name][0])
       self.wildcards |= ofp_match_data[name][1]
     else:
-      setattr(self, '_' + name, value)
+      object.__setattr__(self, '_' + name, value)
       self.wildcards = self.wildcards & ~ofp_match_data[name][1]
+    # (Setting wildcards above invalidated the compiled form)
 
     return value
 
@@ -596,7 +909,7 @@ class ofp_match (object):
       if name == 'nw_dst' or name == 'nw_src':
         # Special handling
         return getattr(self, 'get_' + name)()[0]
-      return self.__dict__['_' + name]
+      return object.__getattribute__(self, '_' + name)
     raise AttributeError("attribute not found: "+name)
 
   def _assert (self):
@@ -614,43 +927,41 @@ class ofp_match (object):
     if(assertstruct):
       if self._assert() is not None:
         raise RuntimeError(self._assert())
+    return _struct_match.pack(*self._pack_fields(flow_mod))
 
-    packed = ""
-    packed += struct.pack("!LH", self._wire_wildcards(self.wildcards) if flow_mod else self.wildcards, self.in_port or 0)
-    if self.dl_src == None:
-      packed += EMPTY_ETH.toRaw()
-    elif type(self.dl_src) is bytes:
-      packed += self.dl_src
-    else:
-      packed += self.dl_src.toRaw()
-    if self.dl_dst == None:
-      packed += EMPTY_ETH.toRaw()
-    elif type(self.dl_dst) is bytes:
-      packed += self.dl_dst
-    else:
-      packed += self.dl_dst.toRaw()
-
-    def check_ip(val):
-      return (val or 0) if self.dl_type == 0x0800 else 0
-    def check_ip_or_arp(val):
-      return (val or 0) if self.dl_type == 0x0800 or self.dl_type == 0x0806 else 0
-    def check_tp(val):
-      return (val or 0) if self.dl_type == 0x0800 and self.nw_proto in (1,6,17) else 0
-
-    packed += struct.pack("!HB", self.dl_vlan or 0, self.dl_vlan_pcp or 0)
-    packed += _PAD # Hardcode padding
-    packed += struct.pack("!HBB", self.dl_type or 0, check_ip(self.nw_tos), check_ip_or_arp(self.nw_proto))
-    packed += _PAD2 # Hardcode padding
-    def fix (addr):
-      if addr is None: return 0
-      if type(addr) is int: return addr & 0xffFFffFF
-      if type(addr) is long: return addr & 0xffFFffFF
-      return addr.toUnsigned()
-    packed += struct.pack("!LLHH", check_ip_or_arp(fix(self.nw_src)), check_ip_or_arp(fix(self.nw_dst)),
-                          check_tp(self.tp_src), check_tp(self.tp_dst))
+  def pack_into (self, buf, offset=0, assertstruct=True, flow_mod=False):
+    """
+    Packs the match into buf at offset and returns the offset after it
+    """
+    if(assertstruct):
+      if self._assert() is not None:
+        raise RuntimeError(self._assert())
+    _struct_match.pack_into(buf, offset, *self._pack_fields(flow_mod))
+    return offset + 40
+
+  def _pack_fields (self, flow_mod=False):
+    """
+    Returns the values to pack, in wire order
+    """
+    dl_type = self.dl_type
+    is_ip = dl_type == 0x0800
+    is_ip_or_arp = is_ip or dl_type == 0x0806
+    nw_proto = self.nw_proto
+    is_tp = is_ip and nw_proto in (1,6,17)
+
+    return (self._wire_wildcards(self.wildcards) if flow_mod else self.wildcards,
+            self.in_port or 0,
+            _eth_to_raw(self.dl_src), _eth_to_raw(self.dl_dst),
+            self.dl_vlan or 0, self.dl_vlan_pcp or 0,
+            dl_type or 0,
+            (self.nw_tos or 0) if is_ip else 0,
+            (nw_proto or 0) if is_ip_or_arp else 0,
+            _ip_to_int(self.nw_src) if is_ip_or_arp else 0,
+            _ip_to_int(self.nw_dst) if is_ip_or_arp else 0,
+            (self.tp_src or 0) if is_tp else 0,
+            (self.tp_dst or 0) if is_tp else 0)
 #    if USE_MPLS_MATCH:
-#        packed += struct.pack("!IBxxx", self.mpls_label or 0, self.mpls_tc or 0)
-    return packed
+#        packed += _struct_IBxxx.pack(self.mpls_label or 0, self.mpls_tc or 0)
 
   def _normalize_wildcards (self, wildcards):
     """ nw_src and nw_dst values greater than 32 mean the same thing as 32.
@@ -726,21 +1037,31 @@ class ofp_match (object):
   def is_exact (self):
     return not self.is_wildcarded
 
-  def unpack (self, binaryString, flow_mod=False):
-    if (len(binaryString) < self.__len__()):
-      return binaryString
-    (wildcards, self._in_port) = struct.unpack_from("!LH", binaryString, 0)
-    self._dl_src = EthAddr(struct.unpack_from("!BBBBBB", binaryString, 6))
-    self._dl_dst = EthAddr(struct.unpack_from("!BBBBBB", binaryString, 12))
-    (self._dl_vlan, self._dl_vlan_pcp) = struct.unpack_from("!HB", binaryString, 18)
-    (self._dl_type, self._nw_tos, self._nw_proto) = struct.unpack_from("!HBB", binaryString, 22)
-    (self._nw_src, self._nw_dst, self._tp_src, self._tp_dst) = struct.unpack_from("!LLHH", binaryString, 28)
-    self._nw_src = IPAddr(self._nw_src)
-    self._nw_dst = IPAddr(self._nw_dst)
+  def unpack_from (self, buf, offset=0, flow_mod=False):
+    if (len(buf) - offset < self.__len__()):
+      return offset
+    (wildcards, in_port, dl_src, dl_dst, dl_vlan, dl_vlan_pcp, dl_type, nw_tos,
+     nw_proto, nw_src, nw_dst, tp_src, tp_dst) = _struct_match.unpack_from(buf, offset)
+    s = object.__setattr__
+    s(self, '_in_port', in_port)
+    s(self, '_dl_src', _intern_eth(dl_src))
+    s(self, '_dl_dst', _intern_eth(dl_dst))
+    s(self, '_dl_vlan', dl_vlan)
+    s(self, '_dl_vlan_pcp', dl_vlan_pcp)
+    s(self, '_dl_type', dl_type)
+    s(self, '_nw_tos', nw_tos)
+    s(self, '_nw_proto', nw_proto)
+    s(self, '_nw_src', _intern_ip(nw_src))
+    s(self, '_nw_dst', _intern_ip(nw_dst))
+    s(self, '_tp_src', tp_src)
+    s(self, '_tp_dst', tp_dst)
 #    if USE_MPLS_MATCH:
-#      (self.mpls_label, self.mpls_tc) = struct.unpack_from("!IBxxx", binaryString, 40)
+#      (self.mpls_label, self.mpls_tc) = _struct_IBxxx.unpack_from(buf, offset + 40)
     self.wildcards = self._normalize_wildcards(self._unwire_wildcards(wildcards) if flow_mod else wildcards) # Overide
-    return binaryString[self.__len__():]
+    return offset + self.__len__()
+
+  def unpack (self, binaryString, flow_mod=False):
+    return binaryString[self.unpack_from(binaryString, 0, flow_mod):]
 
   def __len__ (self):
  #   if USE_MPLS_MATCH:
@@ -763,45 +1084,117 @@ class ofp_match (object):
 
     return int(h & 0x7fFFffFF)
 
+  def key (self):
+    """
+    Returns a MatchKey for this match, suitable for use in dicts and sets
+
+    Matches that a switch would treat the same get equal keys.  Wildcards
+    are normalized the way a round trip through a flow_mod normalizes them
+    (see _wire_wildcards/_unwire_wildcards), so fields the match ignores
+    count as wildcarded.  Wildcarded fields are zero, and IP addresses are
+    masked to their prefix length.
+    """
+    w = self._normalize_wildcards(self._unwire_wildcards(self.wildcards))
+
+    def field (name, bit):
+      if w & bit: return 0
+      return object.__getattribute__(self, '_' + name) or 0
+
+    def ip (addr, shift):
+      bits = (w >> shift) & 63
+      if bits >= 32: return 0
+      return _ip_to_int(addr) & (0xffFFffFF << bits) & 0xffFFffFF
+
+    return MatchKey(w,
+        field('in_port', OFPFW_IN_PORT),
+        0 if w & OFPFW_DL_SRC else _eth_to_int(self._dl_src),
+        0 if w & OFPFW_DL_DST else _eth_to_int(self._dl_dst),
+        field('dl_vlan', OFPFW_DL_VLAN),
+        field('dl_vlan_pcp', OFPFW_DL_VLAN_PCP),
+        field('dl_type', OFPFW_DL_TYPE),
+        field('nw_tos', OFPFW_NW_TOS),
+        field('nw_proto', OFPFW_NW_PROTO),
+        ip(self._nw_src, OFPFW_NW_SRC_SHIFT),
+        ip(self._nw_dst, OFPFW_NW_DST_SHIFT),
+        field('tp_src', OFPFW_TP_SRC),
+        field('tp_dst', OFPFW_TP_DST))
+
+  @classmethod
+  def from_key (cls, key):
+    """
+    Returns a new match equivalent to the given MatchKey
+    """
+    m = cls()
+    w = key.wildcards
+    for name in ('in_port', 'dl_vlan', 'dl_vlan_pcp', 'dl_type', 'nw_tos',
+                 'nw_proto', 'tp_src', 'tp_dst'):
+      if not w & ofp_match_data[name][1]:
+        setattr(m, name, getattr(key, name))
+    if not w & OFPFW_DL_SRC:
+      m.dl_src = EthAddr(_struct_HL.pack(key.dl_src >> 32, key.dl_src & 0xffFFffFF))
+    if not w & OFPFW_DL_DST:
+      m.dl_dst = EthAddr(_struct_HL.pack(key.dl_dst >> 32, key.dl_dst & 0xffFFffFF))
+    for name, shift in (('nw_src', OFPFW_NW_SRC_SHIFT),
+                        ('nw_dst', OFPFW_NW_DST_SHIFT)):
+      bits = (w >> shift) & 63
+      if bits < 32:
+        getattr(m, 'set_' + name)(IPAddr(getattr(key, name)), 32 - bits)
+    m.wildcards = w
+    return m
+
+  def compile (self):
+    """
+    Returns this match as a CompiledMatch
+
+    The result is cached until the match is next modified.
+    """
+    c = self._compiled
+    if c is not None: return c
+
+    w = self._normalize_wildcards(self.wildcards)
+    def field (name, bit, ones):
+      if w & bit: return (0, 0)
+      return (object.__getattribute__(self, '_' + name) or 0, ones)
+    def eth (addr, bit):
+      if w & bit: return (_ETH_NONE, _ETH_NONE)
+      if type(addr) is not bytes: addr = addr.toRaw()
+      return (addr, _ETH_MASK)
+    def ip (addr, shift):
+      bits = (w >> shift) & 63
+      if bits >= 32: return (0, 0)
+      mask = (0xffFFffFF << bits) & 0xffFFffFF
+      return (_ip_to_int(addr) & mask, mask)
+
+    fields = (field('in_port', OFPFW_IN_PORT, 0xffFF),
+              eth(self._dl_src, OFPFW_DL_SRC),
+              eth(self._dl_dst, OFPFW_DL_DST),
+              field('dl_vlan', OFPFW_DL_VLAN, 0xffFF),
+              field('dl_vlan_pcp', OFPFW_DL_VLAN_PCP, 0xff),
+              field('dl_type', OFPFW_DL_TYPE, 0xffFF),
+              field('nw_tos', OFPFW_NW_TOS, 0xff),
+              field('nw_proto', OFPFW_NW_PROTO, 0xff),
+              ip(self._nw_src, OFPFW_NW_SRC_SHIFT),
+              ip(self._nw_dst, OFPFW_NW_DST_SHIFT),
+              field('tp_src', OFPFW_TP_SRC, 0xffFF),
+              field('tp_dst', OFPFW_TP_DST, 0xffFF))
+    value = _struct_match.pack(0, *[f[0] for f in fields])
+    mask = _struct_match.pack(0, *[f[1] for f in fields])
+    c = CompiledMatch(int(binascii.hexlify(value), 16),
+                      int(binascii.hexlify(mask), 16))
+    object.__setattr__(self, '_compiled', c)
+    return c
+
   def matches_with_wildcards (self, other, consider_other_wildcards=True):
     """
     Test whether /this/ match completely encompasses the other match. Important for non-strict modify flow_mods etc.
+
+    This compares the compiled forms (see compile()).  A field that is
+    exact here never matches a wildcarded field in other, so
+    consider_other_wildcards makes no difference; it is kept for
+    compatibility.
     """
     assert_type("other", other, ofp_match, none_ok=False)
-    # short cut for equal matches
-    if(self == other): return True
-    # only candidate if all wildcard bits in the *other* match are also set in this match (i.e., a submatch)
-
-    # first compare the bitmask part
-    if(consider_other_wildcards):
-      self_bits  = self.wildcards & ~(OFPFW_NW_SRC_MASK | OFPFW_NW_DST_MASK)
-      other_bits = other.wildcards & ~(OFPFW_NW_SRC_MASK | OFPFW_NW_DST_MASK)
-      if( self_bits | other_bits != self_bits): return False
-
-    def match_fail(mine, others):
-      return mine != None and mine != others
-
-    if match_fail(self.in_port, other.in_port): return False
-    if match_fail(self.dl_vlan, other.dl_vlan): return False
-    if match_fail(self.dl_src, other.dl_src): return False
-    if match_fail(self.dl_dst, other.dl_dst): return False
-    if match_fail(self.dl_type, other.dl_type): return False
-    if match_fail(self.nw_proto, other.nw_proto): return False
-    if match_fail(self.tp_src, other.tp_src): return False
-    if match_fail(self.tp_dst, other.tp_dst): return False
-    if match_fail(self.dl_vlan_pcp, other.dl_vlan_pcp): return False
-    if match_fail(self.nw_tos, other.nw_tos): return False
-
-    self_nw_src = self.get_nw_src()
-    if(self_nw_src[0] != None):
-      other_nw_src = other.get_nw_src()
-      if self_nw_src[1] > other_nw_src[1] or not IPAddr(other_nw_src[0]).inNetwork((self_nw_src[0], 32-self_nw_src[1])): return False
-
-    self_nw_dst = self.get_nw_dst()
-    if(self_nw_dst[0] != None):
-      other_nw_dst = other.get_nw_dst()
-      if self_nw_dst[1] > other_nw_dst[1] or not IPAddr(other_nw_dst[0]).inNetwork((self_nw_dst[0], 32-self_nw_dst[1])): return False
-    return True
+    return self.compile().covers(other.compile())
 
   def __eq__ (self, other):
     if type(self) != type(other): return False
@@ -923,6 +1316,8 @@ ofp_action_type_rev_map = {
 }
 
 class ofp_action_header (object):
+  __slots__ = ('type', 'length', 'data')
+
   def __init__ (self, **kw):
     self.type = None # Purposely bad
     self.length = 8
@@ -938,17 +1333,20 @@ class ofp_action_header (object):
       if(not self._assert()[0]):
         return None
     packed = ""
-    packed += struct.pack("!HH", self.type, self.length)
+    packed += _struct_HH.pack(self.type, self.length)
     packed += _PAD4 # Pad
     return packed
 
+  def unpack_from (self, buf, offset=0):
+    if (len(buf) - offset < 8):
+      return offset
+    (self.type, self.length) = _struct_HH.unpack_from(buf, offset)
+    if len(buf) - offset < self.length: return offset
+    self.data = _read_bytes(buf, offset + 8, offset + self.length)
+    return offset + self.length
+
   def unpack (self, binaryString):
-    if (len(binaryString) < 8):
-      return binaryString
-    (self.type, self.length) = struct.unpack_from("!HH", binaryString, 0)
-    if len(binaryString) < self.length: return binaryString
-    self.data = binaryString[8:8+self.length]
-    return binaryString[self.length:]
+    return binaryString[self.unpack_from(binaryString):]
 
   def __len__ (self):
     return self.length
@@ -968,6 +1366,8 @@ class ofp_action_header (object):
     return outstr
 
 class ofp_action_output (object):
+  __slots__ = ('type', 'length', 'port', 'max_len')
+
   def __init__ (self, **kw):
     self.type = OFPAT_OUTPUT
     self.length = 8
@@ -985,15 +1385,26 @@ class ofp_action_output (object):
     if(assertstruct):
       if(not self._assert()[0]):
         return None
-    packed = ""
-    packed += struct.pack("!HHHH", self.type, self.length, self.port, self.max_len)
-    return packed
+    return _struct_HHHH.pack(self.type, self.length, self.port, self.max_len)
+
+  def pack_into (self, buf, offset=0, assertstruct=True):
+    if self.port != OFPP_CONTROLLER:
+      self.max_len = 0
+    if(assertstruct):
+      if(not self._assert()[0]):
+        return None
+    _struct_HHHH.pack_into(buf, offset, self.type, self.length, self.port,
+                           self.max_len)
+    return offset + 8
+
+  def unpack_from (self, buf, offset=0):
+    if (len(buf) - offset < 8):
+      return offset
+    (self.type, self.length, self.port, self.max_len) = _struct_HHHH.unpack_from(buf, offset)
+    return offset + 8
 
   def unpack (self, binaryString):
-    if (len(binaryString) < 8):
-      return binaryString
-    (self.type, self.length, self.port, self.max_len) = struct.unpack_from("!HHHH", binaryString, 0)
-    return binaryString[8:]
+    return binaryString[self.unpack_from(binaryString):]
 
   def __len__ (self):
     return 8
@@ -1017,6 +1428,8 @@ class ofp_action_output (object):
     return outstr
 
 class ofp_action_enqueue (object):
+  __slots__ = ('type', 'length', 'port', 'queue_id')
+
   def __init__ (self, **kw):
     self.type = OFPAT_ENQUEUE
     self.length = 16
@@ -1033,17 +1446,20 @@ class ofp_action_enqueue (object):
       if(not self._assert()[0]):
         return None
     packed = ""
-    packed += struct.pack("!HHH", self.type, self.length, self.port)
+    packed += _struct_HHH.pack(self.type, self.length, self.port)
     packed += _PAD6 # Pad
-    packed += struct.pack("!L", self.queue_id)
+    packed += _struct_L.pack(self.queue_id)
     return packed
 
+  def unpack_from (self, buf, offset=0):
+    if (len(buf) - offset < 16):
+      return offset
+    (self.type, self.length, self.port) = _struct_HHH.unpack_from(buf, offset)
+    (self.queue_id,) = _struct_L.unpack_from(buf, offset + 12)
+    return offset + 16
+
   def unpack (self, binaryString):
-    if (len(binaryString) < 16):
-      return binaryString
-    (self.type, self.length, self.port) = struct.unpack_from("!HHH", binaryString, 0)
-    (self.queue_id,) = struct.unpack_from("!L", binaryString, 12)
-    return binaryString[16:]
+    return binaryString[self.unpack_from(binaryString):]
 
   def __len__ (self):
     return 16
@@ -1067,6 +1483,8 @@ class ofp_action_enqueue (object):
     return outstr
 
 class ofp_action_push_mpls (object):
+  __slots__ = ('type', 'length', 'ethertype')
+
   """ For now a push mpls action, but we can use this for
     push vlan too some day"""
   unicast_mpls_ethertype = 0x8847
@@ -1088,14 +1506,17 @@ class ofp_action_push_mpls (object):
       if not (self._assert()[0]):
         return None
       packed = ""
-      packed += struct.pack("!HHHxx", self.type, self.length, self.ethertype)
+      packed += _struct_HHHxx.pack(self.type, self.length, self.ethertype)
       return packed
   
+  def unpack_from (self, buf, offset=0):
+    if (len(buf) - offset < 8):
+      return offset
+    (self.type, self.length, self.ethertype) = _struct_HHH.unpack_from(buf, offset)
+    return offset + 8
+
   def unpack (self, binaryString):
-    if (len(binaryString) < 8):
-      return binaryString
-    (self.type, self.length, self.ethertype) = struct.unpack_from("!HHH", binaryString, 0)
-    return binaryString[8:]
+    return binaryString[self.unpack_from(binaryString):]
  
   def __len__ (self):
     return self.length
@@ -1118,6 +1539,8 @@ class ofp_action_push_mpls (object):
     return outstr
 
 class ofp_action_mpls_label (object):
+  __slots__ = ('type', 'length', 'mpls_label')
+
   def __init__ (self, **kw):
     self.type = OFPAT_SET_MPLS_LABEL
     self.length = 8
@@ -1133,14 +1556,17 @@ class ofp_action_mpls_label (object):
       if not (self._assert()[0]):
         return None
       packed = ""
-      packed += struct.pack("!HHI", self.type, self.length, self.mpls_label)
+      packed += _struct_HHI.pack(self.type, self.length, self.mpls_label)
       return packed
   
+  def unpack_from (self, buf, offset=0):
+    if (len(buf) - offset < 8):
+      return offset
+    (self.type, self.length, self.mpls_label) = _struct_HHI.unpack_from(buf, offset)
+    return offset + 8
+
   def unpack (self, binaryString):
-    if (len(binaryString) < 8):
-      return binaryString
-    (self.type, self.length, self.mpls_label) = struct.unpack_from("!HHI", binaryString, 0)
-    return binaryString[8:]
+    return binaryString[self.unpack_from(binaryString):]
  
   def __len__ (self):
     return self.length
@@ -1163,6 +1589,8 @@ class ofp_action_mpls_label (object):
     return outstr
 
 class ofp_action_mpls_tc (object):
+  __slots__ = ('type', 'length', 'mpls_tc')
+
   def __init__ (self, **kw):
     self.type = OFPAT_SET_MPLS_TC
     self.length = 8
@@ -1178,14 +1606,17 @@ class ofp_action_mpls_tc (object):
       if not (self._assert()[0]):
         return None
       packed = ""
-      packed += struct.pack("!HHBxxx", self.type, self.length, self.mpls_tc)
+      packed += _struct_HHBxxx.pack(self.type, self.length, self.mpls_tc)
       return packed
   
+  def unpack_from (self, buf, offset=0):
+    if (len(buf) - offset < 8):
+      return offset
+    (self.type, self.length, self.mpls_tc) = _struct_HHB.unpack_from(buf, offset)
+    return offset + 8
+
   def unpack (self, binaryString):
-    if (len(binaryString) < 8):
-      return binaryString
-    (self.type, self.length, self.mpls_tc) = struct.unpack_from("!HHB", binaryString, 0)
-    return binaryString[8:]
+    return binaryString[self.unpack_from(binaryString):]
  
   def __len__ (self):
     return self.length
@@ -1208,6 +1639,8 @@ class ofp_action_mpls_tc (object):
     return outstr
 
 class ofp_action_mpls_ttl (object):
+  __slots__ = ('type', 'length', 'mpls_ttl')
+
   def __init__ (self, **kw):
     self.type = OFPAT_SET_MPLS_TTL
     self.length = 8
@@ -1223,14 +1656,17 @@ class ofp_action_mpls_ttl (object):
       if not (self._assert()[0]):
         return None
       packed = ""
-      packed += struct.pack("!HHBxxx", self.type, self.length, self.mpls_ttl)
+      packed += _struct_HHBxxx.pack(self.type, self.length, self.mpls_ttl)
       return packed
   
+  def unpack_from (self, buf, offset=0):
+    if (len(buf) - offset < 8):
+      return offset
+    (self.type, self.length, self.mpls_ttl) = _struct_HHB.unpack_from(buf, offset)
+    return offset + 8
+
   def unpack (self, binaryString):
-    if (len(binaryString) < 8):
-      return binaryString
-    (self.type, self.length, self.mpls_ttl) = struct.unpack_from("!HHB", binaryString, 0)
-    return binaryString[8:]
+    return binaryString[self.unpack_from(binaryString):]
  
   def __len__ (self):
     return self.length
@@ -1253,16 +1689,22 @@ class ofp_action_mpls_ttl (object):
     return outstr
 
 class ofp_action_mpls_dec_ttl (ofp_action_header):
+  __slots__ = ()
+
   def __init__ (self, **kw):
     super(ofp_action_mpls_dec_ttl, self).__init__(**kw)
     self.type = OFPAT_DEC_MPLS_TTL
 
 class ofp_action_resubmit (ofp_action_header):
+  __slots__ = ()
+
   def __init__ (self, **kw):
     super(ofp_action_resubmit, self).__init__(**kw)
     self.type = OFPAT_RESUBMIT
 
 class ofp_action_pop_mpls (object):
+  __slots__ = ('type', 'length', 'ethertype')
+
   def __init__ (self, **kw):
     self.type = OFPAT_POP_MPLS
     self.length = 8
@@ -1278,14 +1720,17 @@ class ofp_action_pop_mpls (object):
       if not (self._assert()[0]):
         return None
       packed = ""
-      packed += struct.pack("!HHHxx", self.type, self.length, self.ethertype)
+      packed += _struct_HHHxx.pack(self.type, self.length, self.ethertype)
       return packed
   
+  def unpack_from (self, buf, offset=0):
+    if (len(buf) - offset < 8):
+      return offset
+    (self.type, self.length, self.ethertype) = _struct_HHH.unpack_from(buf, offset)
+    return offset + 8
+
   def unpack (self, binaryString):
-    if (len(binaryString) < 8):
-      return binaryString
-    (self.type, self.length, self.ethertype) = struct.unpack_from("!HHH", binaryString, 0)
-    return binaryString[8:]
+    return binaryString[self.unpack_from(binaryString):]
  
   def __len__ (self):
     return self.length
@@ -1308,6 +1753,8 @@ class ofp_action_pop_mpls (object):
     return outstr
 
 class ofp_action_vlan_vid (object):
+  __slots__ = ('type', 'length', 'vlan_vid')
+
   def __init__ (self, **kw):
     self.type = OFPAT_SET_VLAN_VID
     self.length = 8
@@ -1323,15 +1770,18 @@ class ofp_action_vlan_vid (object):
       if(not self._assert()[0]):
         return None
     packed = ""
-    packed += struct.pack("!HHH", self.type, self.length, self.vlan_vid)
+    packed += _struct_HHH.pack(self.type, self.length, self.vlan_vid)
     packed += _PAD2 # Pad
     return packed
 
+  def unpack_from (self, buf, offset=0):
+    if (len(buf) - offset < 8):
+      return offset
+    (self.type, self.length, self.vlan_vid) = _struct_HHH.unpack_from(buf, offset)
+    return offset + 8
+
   def unpack (self, binaryString):
-    if (len(binaryString) < 8):
-      return binaryString
-    (self.type, self.length, self.vlan_vid) = struct.unpack_from("!HHH", binaryString, 0)
-    return binaryString[8:]
+    return binaryString[self.unpack_from(binaryString):]
 
   def __len__ (self):
     return 8
@@ -1353,6 +1803,8 @@ class ofp_action_vlan_vid (object):
     return outstr
 
 class ofp_action_vlan_pcp (object):
+  __slots__ = ('type', 'length', 'vlan_pcp')
+
   def __init__ (self, **kw):
     self.type = OFPAT_SET_VLAN_PCP
     self.length = 8
@@ -1368,15 +1820,18 @@ class ofp_action_vlan_pcp (object):
       if(not self._assert()[0]):
         return None
     packed = ""
-    packed += struct.pack("!HHB", self.type, self.length, self.vlan_pcp)
+    packed += _struct_HHB.pack(self.type, self.length, self.vlan_pcp)
     packed += _PAD3 # Pad
     return packed
 
+  def unpack_from (self, buf, offset=0):
+    if (len(buf) - offset < 8):
+      return offset
+    (self.type, self.length, self.vlan_pcp) = _struct_HHB.unpack_from(buf, offset)
+    return offset + 8
+
   def unpack (self, binaryString):
-    if (len(binaryString) < 8):
-      return binaryString
-    (self.type, self.length, self.vlan_pcp) = struct.unpack_from("!HHB", binaryString, 0)
-    return binaryString[8:]
+    return binaryString[self.unpack_from(binaryString):]
 
   def __len__ (self):
     return 8
@@ -1398,6 +1853,8 @@ class ofp_action_vlan_pcp (object):
     return outstr
 
 class ofp_action_dl_addr (object):
+  __slots__ = ('type', 'length', 'dl_addr')
+
   @classmethod
   def set_dst (cls, dl_addr = None):
     return cls(OFPAT_SET_DL_DST, dl_addr)
@@ -1428,7 +1885,7 @@ class ofp_action_dl_addr (object):
       if(not self._assert()[0]):
         return None
     packed = ""
-    packed += struct.pack("!HH", self.type, self.length)
+    packed += _struct_HH.pack(self.type, self.length)
     if isinstance(self.dl_addr, EthAddr):
       packed += self.dl_addr.toRaw()
     else:
@@ -1436,12 +1893,15 @@ class ofp_action_dl_addr (object):
     packed += _PAD6
     return packed
 
+  def unpack_from (self, buf, offset=0):
+    if (len(buf) - offset < 16):
+      return offset
+    (self.type, self.length) = _struct_HH.unpack_from(buf, offset)
+    self.dl_addr = _intern_eth(_read_bytes(buf, offset + 4, offset + 10))
+    return offset + 16
+
   def unpack (self, binaryString):
-    if (len(binaryString) < 16):
-      return binaryString
-    (self.type, self.length) = struct.unpack_from("!HH", binaryString, 0)
-    self.dl_addr = EthAddr(struct.unpack_from("!BBBBBB", binaryString, 4))
-    return binaryString[16:]
+    return binaryString[self.unpack_from(binaryString):]
 
   def __len__ (self):
     return 16
@@ -1463,6 +1923,8 @@ class ofp_action_dl_addr (object):
     return outstr
 
 class ofp_action_nw_addr (object):
+  __slots__ = ('type', 'length', 'nw_addr')
+
   @classmethod
   def set_dst (cls, nw_addr = None):
     return cls(OFPAT_SET_NW_DST, nw_addr)
@@ -1490,15 +1952,18 @@ class ofp_action_nw_addr (object):
       if(not self._assert()[0]):
         return None
     packed = ""
-    packed += struct.pack("!HHl", self.type, self.length, self.nw_addr.toSigned())
+    packed += _struct_HHl.pack(self.type, self.length, self.nw_addr.toSigned())
     return packed
 
+  def unpack_from (self, buf, offset=0):
+    if (len(buf) - offset < 8):
+      return offset
+    (self.type, self.length, self.nw_addr) = _struct_HHL.unpack_from(buf, offset)
+    self.nw_addr = _intern_ip(self.nw_addr)
+    return offset + 8
+
   def unpack (self, binaryString):
-    if (len(binaryString) < 8):
-      return binaryString
-    (self.type, self.length, self.nw_addr) = struct.unpack_from("!HHL", binaryString, 0)
-    self.nw_addr = IPAddr(self.nw_addr, networkOrder=False)
-    return binaryString[8:]
+    return binaryString[self.unpack_from(binaryString):]
 
   def __len__ (self):
     return 8
@@ -1520,6 +1985,8 @@ class ofp_action_nw_addr (object):
     return outstr
 
 class ofp_action_nw_tos (object):
+  __slots__ = ('type', 'length', 'nw_tos')
+
   def __init__ (self, nw_tos = 0):
     self.type = OFPAT_SET_NW_TOS
     self.length = 8
@@ -1533,15 +2000,18 @@ class ofp_action_nw_tos (object):
       if(not self._assert()[0]):
         return None
     packed = ""
-    packed += struct.pack("!HHB", self.type, self.length, self.nw_tos)
+    packed += _struct_HHB.pack(self.type, self.length, self.nw_tos)
     packed += _PAD3
     return packed
 
+  def unpack_from (self, buf, offset=0):
+    if (len(buf) - offset < 8):
+      return offset
+    (self.type, self.length, self.nw_tos) = _struct_HHB.unpack_from(buf, offset)
+    return offset + 8
+
   def unpack (self, binaryString):
-    if (len(binaryString) < 8):
-      return binaryString
-    (self.type, self.length, self.nw_tos) = struct.unpack_from("!HHB", binaryString, 0)
-    return binaryString[8:]
+    return binaryString[self.unpack_from(binaryString):]
 
   def __len__ (self):
     return 8
@@ -1563,6 +2033,8 @@ class ofp_action_nw_tos (object):
     return outstr
 
 class ofp_action_tp_port (object):
+  __slots__ = ('type', 'length', 'tp_port')
+
   @classmethod
   def set_dst (cls, tp_port = None):
     return cls(OFPAT_SET_TP_DST, tp_port)
@@ -1586,15 +2058,18 @@ class ofp_action_tp_port (object):
       if(not self._assert()[0]):
         return None
     packed = ""
-    packed += struct.pack("!HHH", self.type, self.length, self.tp_port)
+    packed += _struct_HHH.pack(self.type, self.length, self.tp_port)
     packed += _PAD2
     return packed
 
+  def unpack_from (self, buf, offset=0):
+    if (len(buf) - offset < 8):
+      return offset
+    (self.type, self.length, self.tp_port) = _struct_HHH.unpack_from(buf, offset)
+    return offset + 8
+
   def unpack (self, binaryString):
-    if (len(binaryString) < 8):
-      return binaryString
-    (self.type, self.length, self.tp_port) = struct.unpack_from("!HHH", binaryString, 0)
-    return binaryString[8:]
+    return binaryString[self.unpack_from(binaryString):]
 
   def __len__ (self):
     return 8
@@ -1616,6 +2091,8 @@ class ofp_action_tp_port (object):
     return outstr
 
 class ofp_action_vendor_header (object):
+  __slots__ = ('type', 'length', 'vendor')
+
   def __init__ (self, **kw):
     self.type = OFPAT_VENDOR
     self.length = 8
@@ -1631,14 +2108,17 @@ class ofp_action_vendor_header (object):
       if(not self._assert()[0]):
         return None
     packed = ""
-    packed += struct.pack("!HHL", self.type, self.length, self.vendor)
+    packed += _struct_HHL.pack(self.type, self.length, self.vendor)
     return packed
 
+  def unpack_from (self, buf, offset=0):
+    if (len(buf) - offset < 8):
+      return offset
+    (self.type, self.length, self.vendor) = _struct_HHL.unpack_from(buf, offset)
+    return offset + 8
+
   def unpack (self, binaryString):
-    if (len(binaryString) < 8):
-      return binaryString
-    (self.type, self.length, self.vendor) = struct.unpack_from("!HHL", binaryString, 0)
-    return binaryString[8:]
+    return binaryString[self.unpack_from(binaryString):]
 
   def __len__ (self):
     return 8
@@ -1687,26 +2167,29 @@ class ofp_features_reply (ofp_header):
         return None
     packed = ""
     packed += ofp_header.pack(self)
-    packed += struct.pack("!QLB", self.datapath_id, self.n_buffers, self.n_tables)
+    packed += _struct_QLB.pack(self.datapath_id, self.n_buffers, self.n_tables)
     packed += _PAD3
-    packed += struct.pack("!LL", self.capabilities, self.actions)
+    packed += _struct_LL.pack(self.capabilities, self.actions)
     for i in self.ports:
       packed += i.pack(assertstruct)
     return packed
 
-  def unpack (self, binaryString):
-    if (len(binaryString) < 32):
-      return binaryString
-    ofp_header.unpack(self, binaryString[0:])
-    (self.datapath_id, self.n_buffers, self.n_tables) = struct.unpack_from("!QLB", binaryString, 8)
-    (self.capabilities, self.actions) = struct.unpack_from("!LL", binaryString, 24)
+  def unpack_from (self, buf, offset=0):
+    if (len(buf) - offset < 32):
+      return offset
+    ofp_header.unpack_from(self, buf, offset)
+    (self.datapath_id, self.n_buffers, self.n_tables) = _struct_QLB.unpack_from(buf, offset + 8)
+    (self.capabilities, self.actions) = _struct_LL.unpack_from(buf, offset + 24)
     portCount = (self.length - 32) / OFP_PHY_PORT_BYTES
     self.ports = []
     for i in xrange(0, portCount):
       p = ofp_phy_port()
-      p.unpack(binaryString[32+i*OFP_PHY_PORT_BYTES:])
+      p.unpack_from(buf, offset + 32 + i*OFP_PHY_PORT_BYTES)
       self.ports.append(p)
-    return binaryString[self.length:]
+    return offset + self.length
+
+  def unpack (self, binaryString):
+    return binaryString[self.unpack_from(binaryString):]
 
   def __len__ (self):
     l = 32
@@ -1774,15 +2257,18 @@ class ofp_switch_config (ofp_header):
         return None
     packed = ""
     packed += ofp_header.pack(self)
-    packed += struct.pack("!HH", self.flags, self.miss_send_len)
+    packed += _struct_HH.pack(self.flags, self.miss_send_len)
     return packed
 
+  def unpack_from (self, buf, offset=0):
+    if (len(buf) - offset < 12):
+      return offset
+    ofp_header.unpack_from(self, buf, offset)
+    (self.flags, self.miss_send_len) = _struct_HH.unpack_from(buf, offset + 8)
+    return offset + 12
+
   def unpack (self, binaryString):
-    if (len(binaryString) < 12):
-      return binaryString
-    ofp_header.unpack(self, binaryString[0:])
-    (self.flags, self.miss_send_len) = struct.unpack_from("!HH", binaryString, 8)
-    return binaryString[12:]
+    return binaryString[self.unpack_from(binaryString):]
 
   def __len__ (self):
     l = 12
@@ -1853,26 +2339,28 @@ class ofp_flow_mod (ofp_header):
     if(assertstruct):
       if(not self._assert()[0]):
         return None
-    packed = ""
     self.length = len(self)
-    packed += ofp_header.pack(self)
-    packed += self.match.pack(flow_mod=True)
-    packed += struct.pack("!QHHHHLHH", self.cookie, self.command, self.idle_timeout, self.hard_timeout, self.priority, self.buffer_id & 0xffffffff, self.out_port, self.flags)
-    for i in self.actions:
-      packed += i.pack(assertstruct)
-    return packed
-
-  def unpack (self, binaryString):
-    if (len(binaryString) < 72):
-      return binaryString
-    ofp_header.unpack(self, binaryString[0:])
-    self.match.unpack(binaryString[8:], flow_mod=True)
-    (self.cookie, self.command, self.idle_timeout, self.hard_timeout, self.priority, self.buffer_id, self.out_port, self.flags) = struct.unpack_from("!QHHHHLHH", binaryString, 8 + len(self.match))
+    buf = bytearray(self.length)
+    ofp_header.pack_into(self, buf, 0)
+    offset = self.match.pack_into(buf, 8, flow_mod=True)
+    _struct_QHHHHLHH.pack_into(buf, offset, self.cookie, self.command, self.idle_timeout, self.hard_timeout, self.priority, self.buffer_id & 0xffffffff, self.out_port, self.flags)
+    _pack_actions_into(self.actions, buf, offset + 24, assertstruct)
+    return bytes(buf)
+
+  def unpack_from (self, buf, offset=0):
+    if (len(buf) - offset < 72):
+      return offset
+    ofp_header.unpack_from(self, buf, offset)
+    self.match.unpack_from(buf, offset + 8, flow_mod=True)
+    (self.cookie, self.command, self.idle_timeout, self.hard_timeout, self.priority, self.buffer_id, self.out_port, self.flags) = _struct_QHHHHLHH.unpack_from(buf, offset + 8 + len(self.match))
     if self.buffer_id == 0xffffffff:
       self.buffer_id = -1
-    self.actions, offset = _unpack_actions(binaryString, self.length-(32 + len(self.match)), 32 + len(self.match))
-    assert offset == self.length
-    return binaryString[offset:]
+    self.actions, end = _unpack_actions(buf, self.length-(32 + len(self.match)), offset + 32 + len(self.match))
+    assert end == offset + self.length
+    return end
+
+  def unpack (self, binaryString):
+    return binaryString[self.unpack_from(binaryString):]
 
   def __len__ (self):
     l = 32 + len(self.match)
@@ -1916,6 +2404,53 @@ class ofp_flow_mod (ofp_header):
       outstr += obj.show(prefix + '  ')
     return outstr
 
+class FlowModTemplate (object):
+  """
+  Makes flow_mods which only differ from a prototype in a few fields
+
+  Reactive forwarding sends lots of flow_mods which are the same except
+  for the match, buffer_id and output port.  The prototype ofp_flow_mod
+  is packed once, and pack() just patches those fields into a copy of
+  its bytes.  The output port patched is that of the prototype's first
+  ofp_action_output.
+  """
+  __slots__ = ('_data', '_port_offset')
+
+  def __init__ (self, prototype):
+    self._data = prototype.pack()
+    self._port_offset = None
+    offset = 8 + len(prototype.match) + 24
+    for a in prototype.actions:
+      if isinstance(a, ofp_action_output):
+        self._port_offset = offset + 4
+        break
+      offset += len(a)
+
+  def pack (self, match=None, buffer_id=None, port=None, xid=None):
+    """
+    Returns the bytes of a flow_mod like the prototype
+
+    It has a new xid (unless one is given), and whichever of match,
+    buffer_id and (output) port are given.  match can be an ofp_match or
+    one already packed with flow_mod=True.
+    """
+    buf = bytearray(self._data)
+    if xid is None:
+      xid = generateXID()
+    _struct_L.pack_into(buf, 4, xid)
+    if match is not None:
+      if type(match) is bytes:
+        buf[8:48] = match
+      else:
+        match.pack_into(buf, 8, assertstruct=False, flow_mod=True)
+    if buffer_id is not None:
+      _struct_L.pack_into(buf, 64, buffer_id & 0xffffffff)
+    if port is not None:
+      if self._port_offset is None:
+        raise RuntimeError("prototype flow_mod has no output action")
+      _struct_H.pack_into(buf, self._port_offset, port)
+    return bytes(buf)
+
 ofp_flow_mod_command_rev_map = {
   'OFPFC_ADD'           : 0,
   'OFPFC_MODIFY'        : 1,
@@ -1956,23 +2491,26 @@ class ofp_port_mod (ofp_header):
         return None
     packed = ""
     packed += ofp_header.pack(self)
-    packed += struct.pack("!H", self.port_no)
+    packed += _struct_H.pack(self.port_no)
     if isinstance(self.hw_addr, bytes):
       packed += self.hw_addr
     else:
       packed += self.hw_addr.toRaw()
-    packed += struct.pack("!LLL", self.config, self.mask, self.advertise)
+    packed += _struct_LLL.pack(self.config, self.mask, self.advertise)
     packed += _PAD4
     return packed
 
+  def unpack_from (self, buf, offset=0):
+    if (len(buf) - offset < 32):
+      return offset
+    ofp_header.unpack_from(self, buf, offset)
+    (self.port_no,) = _struct_H.unpack_from(buf, offset + 8)
+    self.hw_addr = _intern_eth(_read_bytes(buf, offset + 10, offset + 16))
+    (self.config, self.mask, self.advertise) = _struct_LLL.unpack_from(buf, offset + 16)
+    return offset + 32
+
   def unpack (self, binaryString):
-    if (len(binaryString) < 32):
-      return binaryString
-    ofp_header.unpack(self, binaryString[0:])
-    (self.port_no,) = struct.unpack_from("!H", binaryString, 8)
-    self.hw_addr = EthAddr(binaryString[10:16])
-    (self.config, self.mask, self.advertise) = struct.unpack_from("!LLL", binaryString, 16)
-    return binaryString[32:]
+    return binaryString[self.unpack_from(binaryString):]
 
   def __len__ (self):
     return 32
@@ -2018,16 +2556,19 @@ class ofp_queue_get_config_request (ofp_header):
         return None
     packed = ""
     packed += ofp_header.pack(self)
-    packed += struct.pack("!H", self.port)
+    packed += _struct_H.pack(self.port)
     packed += _PAD2
     return packed
 
+  def unpack_from (self, buf, offset=0):
+    if (len(buf) - offset < 12):
+      return offset
+    ofp_header.unpack_from(self, buf, offset)
+    (self.port,) = _struct_H.unpack_from(buf, offset + 8)
+    return offset + 12
+
   def unpack (self, binaryString):
-    if (len(binaryString) < 12):
-      return binaryString
-    ofp_header.unpack(self, binaryString[0:])
-    (self.port,) = struct.unpack_from("!H", binaryString, 8)
-    return binaryString[12:]
+    return binaryString[self.unpack_from(binaryString):]
 
   def __len__ (self):
     return 12
@@ -2066,18 +2607,21 @@ class ofp_queue_get_config_reply (ofp_header):
         return None
     packed = ""
     packed += ofp_header.pack(self)
-    packed += struct.pack("!H", self.port)
+    packed += _struct_H.pack(self.port)
     packed += _PAD6
     for i in self.queues:
       packed += i.pack(assertstruct)
     return packed
 
+  def unpack_from (self, buf, offset=0):
+    if (len(buf) - offset < 16):
+      return offset
+    ofp_header.unpack_from(self, buf, offset)
+    (self.port,) = _struct_H.unpack_from(buf, offset + 8)
+    return offset + 16
+
   def unpack (self, binaryString):
-    if (len(binaryString) < 16):
-      return binaryString
-    ofp_header.unpack(self, binaryString[0:])
-    (self.port,) = struct.unpack_from("!H", binaryString, 8)
-    return binaryString[16:]
+    return binaryString[self.unpack_from(binaryString):]
 
   def __len__ (self):
     l = 16
@@ -2131,11 +2675,9 @@ class ofp_stats_request (ofp_header):
     if(assertstruct):
       if(not self._assert()[0]):
         return None
-    packed = ""
-    packed += ofp_header.pack(self)
-    packed += struct.pack("!HH", self.type, self.flags)
-    packed += self.body_data
-    return packed
+    return b''.join((ofp_header.pack(self),
+                     _struct_HH.pack(self.type, self.flags),
+                     self.body_data))
 
   @property
   def body_data (self):
@@ -2146,14 +2688,17 @@ class ofp_stats_request (ofp_header):
         self._body_data = (self.body, self.body)
     return self._body_data[1]
 
-  def unpack (self, binaryString):
-    if (len(binaryString) < 12):
-      return binaryString
-    ofp_header.unpack(self, binaryString[0:])
-    (self.type, self.flags) = struct.unpack_from("!HH", binaryString, 8)
-    self.body = binaryString[12:self.length]
+  def unpack_from (self, buf, offset=0):
+    if (len(buf) - offset < 12):
+      return offset
+    ofp_header.unpack_from(self, buf, offset)
+    (self.type, self.flags) = _struct_HH.unpack_from(buf, offset + 8)
+    self.body = _read_bytes(buf, offset + 12, offset + self.length)
     assert self.length == len(self)
-    return binaryString[self.length:]
+    return offset + self.length
+
+  def unpack (self, binaryString):
+    return binaryString[self.unpack_from(binaryString):]
 
   def __len__ (self):
     return 12 + len(self.body_data)
@@ -2197,10 +2742,8 @@ class ofp_stats_reply (ofp_header):
       def _pack(b):
         return b.pack() if hasattr(b, 'pack') else b
 
-      data = b''
       if isinstance(self.body, collections.Iterable):
-        for b in self.body:
-          data += _pack(b)
+        data = b''.join([_pack(b) for b in self.body])
       else:
         data = _pack(self.body)
       self._body_data = (self.body, data)
@@ -2214,19 +2757,20 @@ class ofp_stats_reply (ofp_header):
     if(assertstruct):
       if(not self._assert()[0]):
         return None
-    packed = ""
-    packed += ofp_header.pack(self)
-    packed += struct.pack("!HH", self.type, self.flags)
-    packed += self.body_data
-    return packed
+    return b''.join((ofp_header.pack(self),
+                     _struct_HH.pack(self.type, self.flags),
+                     self.body_data))
+
+  def unpack_from (self, buf, offset=0):
+    if (len(buf) - offset < 12):
+      return offset
+    ofp_header.unpack_from(self, buf, offset)
+    (self.type, self.flags) = _struct_HH.unpack_from(buf, offset + 8)
+    self.body = _read_bytes(buf, offset + 12, offset + self.length)
+    return offset + self.length
 
   def unpack (self, binaryString):
-    if (len(binaryString) < 12):
-      return binaryString
-    ofp_header.unpack(self, binaryString[0:])
-    (self.type, self.flags) = struct.unpack_from("!HH", binaryString, 8)
-    self.body = binaryString[12:self.length]
-    return binaryString[self.length:]
+    return binaryString[self.unpack_from(binaryString):]
 
   def __len__ (self):
     l = 12
@@ -2267,6 +2811,8 @@ ofp_stats_reply_flags_rev_map = {
 }
 
 class ofp_desc_stats (object):
+  __slots__ = ('mfr_desc', 'hw_desc', 'sw_desc', 'serial_num', 'dp_desc')
+
   def __init__ (self, **kw):
     self.mfr_desc= ""
     self.hw_desc= ""
@@ -2311,15 +2857,18 @@ class ofp_desc_stats (object):
     packed += self.dp_desc.ljust(256,'\0')
     return packed
 
+  def unpack_from (self, buf, offset=0):
+    if (len(buf) - offset < 1056):
+      return offset
+    self.mfr_desc = _read_bytes(buf, offset, offset + 256).replace("\0","")
+    self.hw_desc = _read_bytes(buf, offset + 256, offset + 512).replace("\0","")
+    self.sw_desc = _read_bytes(buf, offset + 512, offset + 768).replace("\0","")
+    self.serial_num = _read_bytes(buf, offset + 768, offset + 800).replace("\0","")
+    self.dp_desc = _read_bytes(buf, offset + 800, offset + 1056).replace("\0","")
+    return offset + 1056
+
   def unpack (self, binaryString):
-    if (len(binaryString) < 1056):
-      return binaryString
-    self.mfr_desc = binaryString[0:256].replace("\0","")
-    self.hw_desc = binaryString[256:512].replace("\0","")
-    self.sw_desc = binaryString[512:768].replace("\0","")
-    self.serial_num = binaryString[768:800].replace("\0","")
-    self.dp_desc = binaryString[800:1056].replace("\0","")
-    return binaryString[1056:]
+    return binaryString[self.unpack_from(binaryString):]
 
   def __len__ (self):
     return 1056
@@ -2345,6 +2894,8 @@ class ofp_desc_stats (object):
     return outstr
 
 class ofp_flow_stats_request (object):
+  __slots__ = ('match', 'table_id', 'out_port')
+
   def __init__ (self, **kw):
     self.match = ofp_match()
     self.table_id = TABLE_ALL
@@ -2362,15 +2913,18 @@ class ofp_flow_stats_request (object):
         return None
     packed = ""
     packed += self.match.pack()
-    packed += struct.pack("!BBH", self.table_id, 0, self.out_port)
+    packed += _struct_BBH.pack(self.table_id, 0, self.out_port)
     return packed
 
+  def unpack_from (self, buf, offset=0):
+    if (len(buf) - offset < 44):
+      return offset
+    self.match.unpack_from(buf, offset)
+    (self.table_id, pad, self.out_port) = _struct_BBH.unpack_from(buf, offset + len(self.match))
+    return offset + len(self)
+
   def unpack (self, binaryString):
-    if (len(binaryString) < 44):
-      return binaryString
-    self.match.unpack(binaryString[0:])
-    (self.table_id, pad, self.out_port) = struct.unpack_from("!BBH", binaryString, len(self.match))
-    return binaryString[len(self)]
+    return binaryString[self.unpack_from(binaryString):]
 
   def __len__ (self):
     return 4 + len(self.match)
@@ -2393,6 +2947,10 @@ class ofp_flow_stats_request (object):
     return outstr
 
 class ofp_flow_stats (object):
+  __slots__ = ('length', 'table_id', 'match', 'duration_sec', 'duration_nsec',
+               'priority', 'idle_timeout', 'hard_timeout', 'cookie',
+               'packet_count', 'byte_count', 'actions')
+
   def __init__ (self, **kw):
     self.length = 0
     self.table_id = 0
@@ -2418,27 +2976,27 @@ class ofp_flow_stats (object):
     if(assertstruct):
       if(not self._assert()[0]):
         return None
-    packed = ""
-    packed += struct.pack("!HBB", self.length, self.table_id, 0)
-    packed += self.match.pack()
-    packed += struct.pack("!LLHHH", self.duration_sec, self.duration_nsec, self.priority, self.idle_timeout, self.hard_timeout)
-    packed += _PAD6 # Pad
-    packed += struct.pack("!QQQ", self.cookie, self.packet_count, self.byte_count)
-    for i in self.actions:
-      packed += i.pack(assertstruct)
-    return packed
+    buf = bytearray(len(self))
+    _struct_HBB.pack_into(buf, 0, self.length, self.table_id, 0)
+    offset = self.match.pack_into(buf, 4)
+    _struct_flow_stats.pack_into(buf, offset, self.duration_sec, self.duration_nsec, self.priority, self.idle_timeout, self.hard_timeout, self.cookie, self.packet_count, self.byte_count)
+    _pack_actions_into(self.actions, buf, offset + 44, assertstruct)
+    return bytes(buf)
+
+  def unpack_from (self, buf, offset=0):
+    if (len(buf) - offset < 48 + len(self.match)):
+      return offset
+    (self.length, self.table_id, pad) = _struct_HBB.unpack_from(buf, offset)
+    self.match.unpack_from(buf, offset + 4)
+    (self.duration_sec, self.duration_nsec, self.priority, self.idle_timeout, self.hard_timeout) = _struct_LLHHH.unpack_from(buf, offset + 4 + len(self.match))
+    (self.cookie, self.packet_count, self.byte_count) = _struct_QQQ.unpack_from(buf, offset + 24 + len(self.match))
+    self.actions,end = _unpack_actions(buf, self.length - (48 + len(self.match)), offset + 48 + len(self.match))
+    assert end == offset + self.length
+    assert self.length == len(self)
+    return end
 
   def unpack (self, binaryString):
-    if (len(binaryString) < 48 + len(self.match)):
-      return binaryString
-    (self.length, self.table_id, pad) = struct.unpack_from("!HBB", binaryString, 0)
-    self.match.unpack(binaryString[4:])
-    (self.duration_sec, self.duration_nsec, self.priority, self.idle_timeout, self.hard_timeout) = struct.unpack_from("!LLHHH", binaryString, 4 + len(self.match))
-    (self.cookie, self.packet_count, self.byte_count) = struct.unpack_from("!QQQ", binaryString, 24 + len(self.match))
-    self.actions,offset = _unpack_actions(binaryString, self.length - (48 + len(self.match)), 48 + len(self.match))
-    assert offset == self.length
-    assert self.length == len(self)
-    return binaryString[offset:]
+    return binaryString[self.unpack_from(binaryString):]
 
   def __len__ (self):
     l = 48 + len(self.match)
@@ -2484,6 +3042,8 @@ class ofp_flow_stats (object):
     return outstr
 
 class ofp_aggregate_stats_request (object):
+  __slots__ = ('match', 'table_id', 'out_port')
+
   def __init__ (self, **kw):
     self.match = ofp_match()
     self.table_id = TABLE_ALL
@@ -2502,15 +3062,18 @@ class ofp_aggregate_stats_request (object):
         return None
     packed = ""
     packed += self.match.pack()
-    packed += struct.pack("!BBH", self.table_id, 0, self.out_port)
+    packed += _struct_BBH.pack(self.table_id, 0, self.out_port)
     return packed
 
+  def unpack_from (self, buf, offset=0):
+    if (len(buf) - offset < 4 + len(self.match)):
+      return offset
+    self.match.unpack_from(buf, offset)
+    (self.table_id, pad, self.out_port) = _struct_BBH.unpack_from(buf, offset + len(self.match))
+    return offset + 44
+
   def unpack (self, binaryString):
-    if (len(binaryString) < 4 + len(self.match)):
-      return binaryString
-    self.match.unpack(binaryString[0:])
-    (self.table_id, pad, self.out_port) = struct.unpack_from("!BBH", binaryString, len(self.match))
-    return binaryString[44:]
+    return binaryString[self.unpack_from(binaryString):]
 
   def __len__ (self):
     return 44
@@ -2533,6 +3096,8 @@ class ofp_aggregate_stats_request (object):
     return outstr
 
 class ofp_aggregate_stats (object):
+  __slots__ = ('packet_count', 'byte_count', 'flow_count')
+
   def __init__ (self, **kw):
     self.packet_count = 0
     self.byte_count = 0
@@ -2548,15 +3113,18 @@ class ofp_aggregate_stats (object):
       if(not self._assert()[0]):
         return None
     packed = ""
-    packed += struct.pack("!QQL", self.packet_count, self.byte_count, self.flow_count)
+    packed += _struct_QQL.pack(self.packet_count, self.byte_count, self.flow_count)
     packed += _PAD4 # Pad
     return packed
 
+  def unpack_from (self, buf, offset=0):
+    if (len(buf) - offset < 24):
+      return offset
+    (self.packet_count, self.byte_count, self.flow_count) = _struct_QQL.unpack_from(buf, offset)
+    return offset + 24
+
   def unpack (self, binaryString):
-    if (len(binaryString) < 24):
-      return binaryString
-    (self.packet_count, self.byte_count, self.flow_count) = struct.unpack_from("!QQL", binaryString, 0)
-    return binaryString[24:]
+    return binaryString[self.unpack_from(binaryString):]
 
   def __len__ (self):
     return 24
@@ -2579,6 +3147,9 @@ class ofp_aggregate_stats (object):
 ofp_aggregate_stats_reply = ofp_aggregate_stats
 
 class ofp_table_stats (object):
+  __slots__ = ('table_id', 'name', 'wildcards', 'max_entries', 'active_count',
+               'lookup_count', 'matched_count')
+
   def __init__ (self, **kw):
     self.table_id = 0
     self.name= ""
@@ -2602,19 +3173,22 @@ class ofp_table_stats (object):
       if(not self._assert()[0]):
         return None
     packed = ""
-    packed += struct.pack("!B", self.table_id)
+    packed += _struct_B.pack(self.table_id)
     packed += _PAD3
     packed += self.name.ljust(32,'\0')
-    packed += struct.pack("!LLLQQ", self.wildcards, self.max_entries, self.active_count, self.lookup_count, self.matched_count)
+    packed += _struct_LLLQQ.pack(self.wildcards, self.max_entries, self.active_count, self.lookup_count, self.matched_count)
     return packed
 
+  def unpack_from (self, buf, offset=0):
+    if (len(buf) - offset < 64):
+      return offset
+    (self.table_id,) = _struct_B.unpack_from(buf, offset)
+    self.name = _read_bytes(buf, offset + 4, offset + 36).replace("\0","")
+    (self.wildcards, self.max_entries, self.active_count, self.lookup_count, self.matched_count) = _struct_LLLQQ.unpack_from(buf, offset + 36)
+    return offset + 64
+
   def unpack (self, binaryString):
-    if (len(binaryString) < 64):
-      return binaryString
-    (self.table_id,) = struct.unpack_from("!B", binaryString, 0)
-    self.name = binaryString[4:36].replace("\0","")
-    (self.wildcards, self.max_entries, self.active_count, self.lookup_count, self.matched_count) = struct.unpack_from("!LLLQQ", binaryString, 36)
-    return binaryString[64:]
+    return binaryString[self.unpack_from(binaryString):]
 
   def __len__ (self):
     return 64
@@ -2644,6 +3218,8 @@ class ofp_table_stats (object):
     return outstr
 
 class ofp_port_stats_request (object):
+  __slots__ = ('port_no',)
+
   def __init__ (self, **kw):
     self.port_no = 0
     initHelper(self, kw)
@@ -2656,15 +3232,18 @@ class ofp_port_stats_request (object):
       if(not self._assert()[0]):
         return None
     packed = ""
-    packed += struct.pack("!H", self.port_no)
+    packed += _struct_H.pack(self.port_no)
     packed += _PAD6
     return packed
 
+  def unpack_from (self, buf, offset=0):
+    if (len(buf) - offset < 8):
+      return offset
+    (self.port_no,) = _struct_H.unpack_from(buf, offset)
+    return offset + 8
+
   def unpack (self, binaryString):
-    if (len(binaryString) < 8):
-      return binaryString
-    (self.port_no,) = struct.unpack_from("!H", binaryString, 0)
-    return binaryString[8:]
+    return binaryString[self.unpack_from(binaryString):]
 
   def __len__ (self):
     return 8
@@ -2682,6 +3261,10 @@ class ofp_port_stats_request (object):
     return outstr
 
 class ofp_port_stats (object):
+  __slots__ = ('port_no', 'rx_packets', 'tx_packets', 'rx_bytes', 'tx_bytes',
+               'rx_dropped', 'tx_dropped', 'rx_errors', 'tx_errors',
+               'rx_frame_err', 'rx_over_err', 'rx_crc_err', 'collisions')
+
   def __init__ (self, **kw):
     self.port_no = 0
     self.rx_packets = 0
@@ -2707,17 +3290,20 @@ class ofp_port_stats (object):
       if(not self._assert()[0]):
         return None
     packed = ""
-    packed += struct.pack("!H", self.port_no)
+    packed += _struct_H.pack(self.port_no)
     packed += _PAD6
-    packed += struct.pack("!QQQQQQQQQQQQ", self.rx_packets, self.tx_packets, self.rx_bytes, self.tx_bytes, self.rx_dropped, self.tx_dropped, self.rx_errors, self.tx_errors, self.rx_frame_err, self.rx_over_err, self.rx_crc_err, self.collisions)
+    packed += _struct_QQQQQQQQQQQQ.pack(self.rx_packets, self.tx_packets, self.rx_bytes, self.tx_bytes, self.rx_dropped, self.tx_dropped, self.rx_errors, self.tx_errors, self.rx_frame_err, self.rx_over_err, self.rx_crc_err, self.collisions)
     return packed
 
+  def unpack_from (self, buf, offset=0):
+    if (len(buf) - offset < 104):
+      return offset
+    (self.port_no,) = _struct_H.unpack_from(buf, offset)
+    (self.rx_packets, self.tx_packets, self.rx_bytes, self.tx_bytes, self.rx_dropped, self.tx_dropped, self.rx_errors, self.tx_errors, self.rx_frame_err, self.rx_over_err, self.rx_crc_err, self.collisions) = _struct_QQQQQQQQQQQQ.unpack_from(buf, offset + 8)
+    return offset + 104
+
   def unpack (self, binaryString):
-    if (len(binaryString) < 104):
-      return binaryString
-    (self.port_no,) = struct.unpack_from("!H", binaryString, 0)
-    (self.rx_packets, self.tx_packets, self.rx_bytes, self.tx_bytes, self.rx_dropped, self.tx_dropped, self.rx_errors, self.tx_errors, self.rx_frame_err, self.rx_over_err, self.rx_crc_err, self.collisions) = struct.unpack_from("!QQQQQQQQQQQQ", binaryString, 8)
-    return binaryString[104:]
+    return binaryString[self.unpack_from(binaryString):]
 
   def __len__ (self):
     return 104
@@ -2776,6 +3362,8 @@ class ofp_port_stats (object):
     return outstr
 
 class ofp_queue_stats_request (object):
+  __slots__ = ('port_no', 'queue_id')
+
   def __init__ (self, **kw):
     self.port_no = 0
     self.queue_id = 0
@@ -2790,17 +3378,20 @@ class ofp_queue_stats_request (object):
       if(not self._assert()[0]):
         return None
     packed = ""
-    packed += struct.pack("!H", self.port_no)
+    packed += _struct_H.pack(self.port_no)
     packed += _PAD2
-    packed += struct.pack("!L", self.queue_id)
+    packed += _struct_L.pack(self.queue_id)
     return packed
 
+  def unpack_from (self, buf, offset=0):
+    if (len(buf) - offset < 8):
+      return offset
+    (self.port_no,) = _struct_H.unpack_from(buf, offset)
+    (self.queue_id,) = _struct_L.unpack_from(buf, offset + 4)
+    return offset + 8
+
   def unpack (self, binaryString):
-    if (len(binaryString) < 8):
-      return binaryString
-    (self.port_no,) = struct.unpack_from("!H", binaryString, 0)
-    (self.queue_id,) = struct.unpack_from("!L", binaryString, 4)
-    return binaryString[8:]
+    return binaryString[self.unpack_from(binaryString):]
 
   def __len__ (self):
     return 8
@@ -2820,6 +3411,8 @@ class ofp_queue_stats_request (object):
     return outstr
 
 class ofp_queue_stats (object):
+  __slots__ = ('port_no', 'queue_id', 'tx_bytes', 'tx_packets', 'tx_errors')
+
   def __init__ (self, **kw):
     self.port_no = 0
     self.queue_id = 0
@@ -2837,17 +3430,20 @@ class ofp_queue_stats (object):
       if(not self._assert()[0]):
         return None
     packed = ""
-    packed += struct.pack("!H", self.port_no)
+    packed += _struct_H.pack(self.port_no)
     packed += _PAD2
-    packed += struct.pack("!LQQQ", self.queue_id, self.tx_bytes, self.tx_packets, self.tx_errors)
+    packed += _struct_LQQQ.pack(self.queue_id, self.tx_bytes, self.tx_packets, self.tx_errors)
     return packed
 
+  def unpack_from (self, buf, offset=0):
+    if (len(buf) - offset < 32):
+      return offset
+    (self.port_no,) = _struct_H.unpack_from(buf, offset)
+    (self.queue_id, self.tx_bytes, self.tx_packets, self.tx_errors) = _struct_LQQQ.unpack_from(buf, offset + 4)
+    return offset + 32
+
   def unpack (self, binaryString):
-    if (len(binaryString) < 32):
-      return binaryString
-    (self.port_no,) = struct.unpack_from("!H", binaryString, 0)
-    (self.queue_id, self.tx_bytes, self.tx_packets, self.tx_errors) = struct.unpack_from("!LQQQ", binaryString, 4)
-    return binaryString[32:]
+    return binaryString[self.unpack_from(binaryString):]
 
   def __len__ (self):
     return 32
@@ -2933,27 +3529,25 @@ class ofp_packet_out (ofp_header):
     if self.data is not None:
       self.length += len(self.data)
 
-    if self.data is not None:
-      return b''.join((ofp_header.pack(self),
-      struct.pack("!LHH", self.buffer_id & 0xffFFffFF, self.in_port, actions_len),
+    return b''.join((ofp_header.pack(self),
+      _struct_LHH.pack(self.buffer_id & 0xffFFffFF, self.in_port, actions_len),
       actions,
-      self.data))
-    else:
-      return b''.join((ofp_header.pack(self),
-      struct.pack("!LHH", self.buffer_id & 0xffFFffFF, self.in_port, actions_len),
-      actions))
+      self.data or b''))
 
-  def unpack (self, binaryString):
-    if (len(binaryString) < 16):
-      return binaryString
-    ofp_header.unpack(self, binaryString[0:])
-    (self.buffer_id, self.in_port, actions_len) = struct.unpack_from("!LHH", binaryString, 8)
+  def unpack_from (self, buf, offset=0):
+    if (len(buf) - offset < 16):
+      return offset
+    ofp_header.unpack_from(self, buf, offset)
+    (self.buffer_id, self.in_port, actions_len) = _struct_LHH.unpack_from(buf, offset + 8)
     if self.buffer_id == 0xffFFffFF:
       self.buffer_id = -1
-    self.actions,offset = _unpack_actions(binaryString, actions_len, 16)
+    self.actions,end = _unpack_actions(buf, actions_len, offset + 16)
 
-    self.data = binaryString[offset:self.length] if offset < self.length else None
-    return binaryString[self.length:]
+    self.data = _read_bytes(buf, end, offset + self.length) if end < offset + self.length else None
+    return offset + self.length
+
+  def unpack (self, binaryString):
+    return binaryString[self.unpack_from(binaryString):]
 
   def __len__ (self):
     return 16 + reduce(operator.add, (a.length for a in self.actions), 0) + (len(self.data) if self.data else 0)
@@ -3000,11 +3594,14 @@ class ofp_barrier_reply (ofp_header):
     packed += ofp_header.pack(self)
     return packed
 
+  def unpack_from (self, buf, offset=0):
+    if (len(buf) - offset < 8):
+      return offset
+    ofp_header.unpack_from(self, buf, offset)
+    return offset + 8
+
   def unpack (self, binaryString):
-    if (len(binaryString) < 8):
-      return binaryString
-    ofp_header.unpack(self, binaryString[0:])
-    return binaryString[8:]
+    return binaryString[self.unpack_from(binaryString):]
 
   def __len__ (self):
     return 8
@@ -3040,11 +3637,14 @@ class ofp_barrier_request (ofp_header):
     packed += ofp_header.pack(self)
     return packed
 
+  def unpack_from (self, buf, offset=0):
+    if (len(buf) - offset < 8):
+      return offset
+    ofp_header.unpack_from(self, buf, offset)
+    return offset + 8
+
   def unpack (self, binaryString):
-    if (len(binaryString) < 8):
-      return binaryString
-    ofp_header.unpack(self, binaryString[0:])
-    return binaryString[8:]
+    return binaryString[self.unpack_from(binaryString):]
 
   def __len__ (self):
     return 8
@@ -3099,27 +3699,28 @@ class ofp_packet_in (ofp_header):
     if(assertstruct):
       if(not self._assert()[0]):
         raise AssertionError(self._assert()[1])
-    packed = ""
     # need to update the self.length field for ofp_header.pack to put the correct value in the packed
     # array. this sucks.
     self.length = len(self)
     self._total_len = len(self) # TODO: Is this correct?
-    packed += ofp_header.pack(self)
-    packed += struct.pack("!LHHBB", self.buffer_id & 0xffFFffFF, self._total_len, self.in_port, self.reason, 0)
-    packed += self.data
-    return packed
+    return b''.join((ofp_header.pack(self),
+      _struct_LHHBB.pack(self.buffer_id & 0xffFFffFF, self._total_len, self.in_port, self.reason, 0),
+      self.data))
 
-  def unpack (self, binaryString):
-    if (len(binaryString) < 18):
-      return binaryString
-    ofp_header.unpack(self, binaryString[0:])
-    (self.buffer_id, self._total_len, self.in_port, self.reason, pad) = struct.unpack_from("!LHHBB", binaryString, 8)
+  def unpack_from (self, buf, offset=0):
+    if (len(buf) - offset < 18):
+      return offset
+    ofp_header.unpack_from(self, buf, offset)
+    (self.buffer_id, self._total_len, self.in_port, self.reason, pad) = _struct_LHHBB.unpack_from(buf, offset + 8)
     if self.buffer_id == 0xFFffFFff:
       self.buffer_id = -1
-    if (len(binaryString) < self.length):
-      return binaryString
-    self.data = binaryString[18:self.length]
-    return binaryString[self.length:]
+    if (len(buf) - offset < self.length):
+      return offset
+    self.data = _read_bytes(buf, offset + 18, offset + self.length)
+    return offset + self.length
+
+  def unpack (self, binaryString):
+    return binaryString[self.unpack_from(binaryString):]
 
   def __len__ (self):
     l = 18
@@ -3179,25 +3780,24 @@ class ofp_flow_removed (ofp_header):
     if(assertstruct):
       if(not self._assert()[0]):
         return None
-    packed = ""
-    packed += ofp_header.pack(self)
-    packed += self.match.pack()
-    packed += struct.pack("!QHB", self.cookie, self.priority, self.reason)
-    packed += _PAD
-    packed += struct.pack("!LLH", self.duration_sec, self.duration_nsec, self.idle_timeout)
-    packed += _PAD2
-    packed += struct.pack("!QQ", self.packet_count, self.byte_count)
-    return packed
+    buf = bytearray(len(self))
+    ofp_header.pack_into(self, buf, 0)
+    offset = self.match.pack_into(buf, 8)
+    _struct_flow_removed.pack_into(buf, offset, self.cookie, self.priority, self.reason, self.duration_sec, self.duration_nsec, self.idle_timeout, self.packet_count, self.byte_count)
+    return bytes(buf)
+
+  def unpack_from (self, buf, offset=0):
+    if (len(buf) - offset < len(self)):
+      return offset
+    ofp_header.unpack_from(self, buf, offset)
+    self.match.unpack_from(buf, offset + 8)
+    (self.cookie, self.priority, self.reason) = _struct_QHB.unpack_from(buf, offset + 8 + len(self.match))
+    (self.duration_sec, self.duration_nsec, self.idle_timeout) = _struct_LLH.unpack_from(buf, offset + 20 + len(self.match))
+    (self.packet_count, self.byte_count) = _struct_QQ.unpack_from(buf, offset + 32 + len(self.match))
+    return offset + len(self)
 
   def unpack (self, binaryString):
-    if (len(binaryString) < len(self)):
-      return binaryString
-    ofp_header.unpack(self, binaryString[0:])
-    self.match.unpack(binaryString[8:])
-    (self.cookie, self.priority, self.reason) = struct.unpack_from("!QHB", binaryString, 8 + len(self.match))
-    (self.duration_sec, self.duration_nsec, self.idle_timeout) = struct.unpack_from("!LLH", binaryString, 20 + len(self.match))
-    (self.packet_count, self.byte_count) = struct.unpack_from("!QQ", binaryString, 32 + len(self.match))
-    return binaryString[len(self):]
+    return binaryString[self.unpack_from(binaryString):]
 
   def __len__ (self):
     return 48 + len(self.match)
@@ -3259,20 +3859,22 @@ class ofp_port_status (ofp_header):
     if(assertstruct):
       if(not self._assert()[0]):
         return None
-    packed = ""
-    packed += ofp_header.pack(self)
-    packed += struct.pack("!B", self.reason)
-    packed += _PAD * 7 # Pad
-    packed += self.desc.pack()
-    return packed
+    buf = bytearray(64)
+    ofp_header.pack_into(self, buf, 0)
+    _struct_B.pack_into(buf, 8, self.reason) # Followed by 7 bytes of pad
+    self.desc.pack_into(buf, 16)
+    return bytes(buf)
+
+  def unpack_from (self, buf, offset=0):
+    if (len(buf) - offset < 64):
+      return offset
+    ofp_header.unpack_from(self, buf, offset)
+    (self.reason,) = _struct_B.unpack_from(buf, offset + 8)
+    self.desc.unpack_from(buf, offset + 16)
+    return offset + 64
 
   def unpack (self, binaryString):
-    if (len(binaryString) < 64):
-      return binaryString
-    ofp_header.unpack(self, binaryString[0:])
-    (self.reason,) = struct.unpack_from("!B", binaryString, 8)
-    self.desc.unpack(binaryString[16:])
-    return binaryString[64:]
+    return binaryString[self.unpack_from(binaryString):]
 
   def __len__ (self):
     return 64
@@ -3321,17 +3923,20 @@ class ofp_error (ofp_header):
     self.length = len(self)
     packed = ""
     packed += ofp_header.pack(self)
-    packed += struct.pack("!HH", self.type, self.code)
+    packed += _struct_HH.pack(self.type, self.code)
     for i in self.data:
-      packed += struct.pack("!B",i)
+      packed += _struct_B.pack(i)
     return packed
 
+  def unpack_from (self, buf, offset=0):
+    if (len(buf) - offset < 12):
+      return offset
+    ofp_header.unpack_from(self, buf, offset)
+    (self.type, self.code) = _struct_HH.unpack_from(buf, offset + 8)
+    return offset + 12
+
   def unpack (self, binaryString):
-    if (len(binaryString) < 12):
-      return binaryString
-    ofp_header.unpack(self, binaryString[0:])
-    (self.type, self.code) = struct.unpack_from("!HH", binaryString, 8)
-    return binaryString[12:]
+    return binaryString[self.unpack_from(binaryString):]
 
   def __len__ (self):
     l = 12
@@ -3444,11 +4049,14 @@ class ofp_hello (ofp_header):
     packed += ofp_header.pack(self)
     return packed
 
+  def unpack_from (self, buf, offset=0):
+    if (len(buf) - offset < 8):
+      return offset
+    ofp_header.unpack_from(self, buf, offset)
+    return offset + 8
+
   def unpack (self, binaryString):
-    if (len(binaryString) < 8):
-      return binaryString
-    ofp_header.unpack(self, binaryString[0:])
-    return binaryString[8:]
+    return binaryString[self.unpack_from(binaryString):]
 
   def __len__ (self):
     return 8
@@ -3480,21 +4088,22 @@ class ofp_echo_request (ofp_header):
     if(assertstruct):
       if(not self._assert()[0]):
         return None
-    packed = b""
-    packed += ofp_header.pack(self)
-    packed += self.body
-    return packed
+    self.length = len(self)
+    return b''.join((ofp_header.pack(self), self.body))
 
-  def unpack (self, binaryString):
-    if (len(binaryString) < 8):
-      return binaryString
-    ofp_header.unpack(self, binaryString[0:])
+  def unpack_from (self, buf, offset=0):
+    if (len(buf) - offset < 8):
+      return offset
+    ofp_header.unpack_from(self, buf, offset)
     # Note that we trust the header to be correct here
-    if len(binaryString) < self.length:
-      return binaryString
+    if len(buf) - offset < self.length:
+      return offset
     l = self.length - 8
-    self.body = binaryString[8:8+l]
-    return binaryString[8 + l:]
+    self.body = _read_bytes(buf, offset + 8, offset + 8 + l)
+    return offset + 8 + l
+
+  def unpack (self, binaryString):
+    return binaryString[self.unpack_from(binaryString):]
 
   def __len__ (self):
     return 8 + len(self.body)
@@ -3528,21 +4137,22 @@ class ofp_echo_reply (ofp_header):
     if(assertstruct):
       if(not self._assert()[0]):
         return None
-    packed = b""
-    packed += ofp_header.pack(self)
-    packed += self.body
-    return packed
+    self.length = len(self)
+    return b''.join((ofp_header.pack(self), self.body))
 
-  def unpack (self, binaryString):
-    if (len(binaryString) < 8):
-      return binaryString
-    ofp_header.unpack(self, binaryString[0:])
+  def unpack_from (self, buf, offset=0):
+    if (len(buf) - offset < 8):
+      return offset
+    ofp_header.unpack_from(self, buf, offset)
     # Note that we trust the header to be correct here
-    if len(binaryString) < self.length:
-      return binaryString
+    if len(buf) - offset < self.length:
+      return offset
     l = self.length - 8
-    self.body = binaryString[8:8+l]
-    return binaryString[8 + l:]
+    self.body = _read_bytes(buf, offset + 8, offset + 8 + l)
+    return offset + 8 + l
+
+  def unpack (self, binaryString):
+    return binaryString[self.unpack_from(binaryString):]
 
   def __len__ (self):
     return 8 + len(self.body)
@@ -3579,15 +4189,18 @@ class ofp_vendor_header (ofp_header):
         return None
     packed = ""
     packed += ofp_header.pack(self)
-    packed += struct.pack("!L", self.vendor)
+    packed += _struct_L.pack(self.vendor)
     return packed
 
+  def unpack_from (self, buf, offset=0):
+    if (len(buf) - offset < 12):
+      return offset
+    ofp_header.unpack_from(self, buf, offset)
+    (self.vendor,) = _struct_L.unpack_from(buf, offset + 8)
+    return offset + 12
+
   def unpack (self, binaryString):
-    if (len(binaryString) < 12):
-      return binaryString
-    ofp_header.unpack(self, binaryString[0:])
-    (self.vendor,) = struct.unpack_from("!L", binaryString, 8)
-    return binaryString[12:]
+    return binaryString[self.unpack_from(binaryString):]
 
   def __len__ (self):
     return 12
@@ -3626,22 +4239,25 @@ class ofp_vendor (ofp_header):
     self.length = 12 + len(self.data)
     packed = ""
     packed += ofp_header.pack(self)
-    packed += struct.pack("!L", self.vendor)
+    packed += _struct_L.pack(self.vendor)
     if hasattr(self.data, "pack"):
       packed += self.data.pack()
     else:
       packed += self.data
     return packed
 
+  def unpack_from (self, buf, offset=0):
+    if (len(buf) - offset < 12):
+      return offset
+    ofp_header.unpack_from(self, buf, offset)
+    (self.vendor,) = _struct_L.unpack_from(buf, offset + 8)
+    if len(buf) - offset < self.length:
+      return offset
+    self.data = _read_bytes(buf, offset + 12, offset + self.length)
+    return offset + self.length
+
   def unpack (self, binaryString):
-    if (len(binaryString) < 12):
-      return binaryString
-    ofp_header.unpack(self, binaryString[0:])
-    (self.vendor,) = struct.unpack_from("!L", binaryString, 8)
-    if len(binaryString) < self.length:
-      return binaryString
-    self.data = binaryString[12:self.length]
-    return binaryString[self.length:]
+    return binaryString[self.unpack_from(binaryString):]
 
   def __len__ (self):
     return 12 + len(self.data)
@@ -3682,11 +4298,14 @@ class ofp_features_request (ofp_header):
     packed += ofp_header.pack(self)
     return packed
 
+  def unpack_from (self, buf, offset=0):
+    if (len(buf) - offset < 8):
+      return offset
+    ofp_header.unpack_from(self, buf, offset)
+    return offset + 8
+
   def unpack (self, binaryString):
-    if (len(binaryString) < 8):
-      return binaryString
-    ofp_header.unpack(self, binaryString[0:])
-    return binaryString[8:]
+    return binaryString[self.unpack_from(binaryString):]
 
   def __len__ (self):
     return 8
@@ -3722,11 +4341,14 @@ class ofp_get_config_request (ofp_header):
     packed += ofp_header.pack(self)
     return packed
 
+  def unpack_from (self, buf, offset=0):
+    if (len(buf) - offset < 8):
+      return offset
+    ofp_header.unpack_from(self, buf, offset)
+    return offset + 8
+
   def unpack (self, binaryString):
-    if (len(binaryString) < 8):
-      return binaryString
-    ofp_header.unpack(self, binaryString[0:])
-    return binaryString[8:]
+    return binaryString[self.unpack_from(binaryString):]
 
   def __len__ (self):
     return 8
@@ -3763,15 +4385,18 @@ class ofp_get_config_reply (ofp_header):
         return None
     packed = ""
     packed += ofp_header.pack(self)
-    packed += struct.pack("!HH", self.flags, self.miss_send_len)
+    packed += _struct_HH.pack(self.flags, self.miss_send_len)
     return packed
 
+  def unpack_from (self, buf, offset=0):
+    if (len(buf) - offset < 12):
+      return offset
+    ofp_header.unpack_from(self, buf, offset)
+    (self.flags, self.miss_send_len) = _struct_HH.unpack_from(buf, offset + 8)
+    return offset + 12
+
   def unpack (self, binaryString):
-    if (len(binaryString) < 12):
-      return binaryString
-    ofp_header.unpack(self, binaryString[0:])
-    (self.flags, self.miss_send_len) = struct.unpack_from("!HH", binaryString, 8)
-    return binaryString[12:]
+    return binaryString[self.unpack_from(binaryString):]
 
   def __len__ (self):
     return 12
@@ -3812,15 +4437,18 @@ class ofp_set_config (ofp_header):
         return None
     packed = ""
     packed += ofp_header.pack(self)
-    packed += struct.pack("!HH", self.flags, self.miss_send_len)
+    packed += _struct_HH.pack(self.flags, self.miss_send_len)
     return packed
 
+  def unpack_from (self, buf, offset=0):
+    if (len(buf) - offset < 12):
+      return offset
+    ofp_header.unpack_from(self, buf, offset)
+    (self.flags, self.miss_send_len) = _struct_HH.unpack_from(buf, offset + 8)
+    return offset + 12
+
   def unpack (self, binaryString):
-    if (len(binaryString) < 12):
-      return binaryString
-    ofp_header.unpack(self, binaryString[0:])
-    (self.flags, self.miss_send_len) = struct.unpack_from("!HH", binaryString, 8)
-    return binaryString[12:]
+    return binaryString[self.unpack_from(binaryString):]
 
   def __len__ (self):
     return 12
@@ -3883,10 +4511,25 @@ ofp_type_rev_map = {
 # (This is filled in by _init after the globals have been created)
 _action_map = {}
 
+def _pack_actions_into (actions, buf, offset=0, assertstruct=True):
+  """
+  Packs actions into buf starting at offset
+  Actions without a pack_into() are packed and copied in.
+  returns next_offset
+  """
+  for a in actions:
+    if hasattr(a, 'pack_into'):
+      offset = a.pack_into(buf, offset, assertstruct)
+    else:
+      packed = a.pack(assertstruct)
+      buf[offset:offset+len(packed)] = packed
+      offset += len(packed)
+  return offset
+
 def _unpack_actions (b, length, offset=0):
   """
   Parses actions from a buffer
-  b is a buffer (bytes)
+  b is a buffer (bytes, buffer or memoryview)
   offset, if specified is where in b to start decoding
   returns ([Actions], next_offset)
   """
@@ -3894,7 +4537,7 @@ def _unpack_actions (b, length, offset=0):
   actions = []
   end = length + offset
   while offset < end:
-    (t,l) = struct.unpack_from("!HH", b, offset)
+    (t,l) = _struct_HH.unpack_from(b, offset)
     if (len(b) - offset) < l: return ([], offset)
     a = _action_map.get(t)
     if a is None:
@@ -3902,7 +4545,7 @@ def _unpack_actions (b, length, offset=0):
       a = ofp_action_header()
     else:
       a = a()
-    a.unpack(b[offset:offset+l])
+    a.unpack_from(b, offset)
     assert len(a) == l
     actions.append(a)
     offset += l
@@ -4071,3 +4714,6 @@ ofp_match_data = {
 #  'mpls_label': (0, OFPFW_MPLS_LABEL),
 #  'mpls_tc': (0, OFPFW_MPLS_TC),
 }
+
+# (slot, default value) for each ofp_match field, used by ofp_match.__init__
+_ofp_match_defaults = tuple(('_' + k, v[0]) for k,v in ofp_match_data.iteritems())
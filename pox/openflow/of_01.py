@@ -26,6 +26,7 @@ import pox
 import pox.lib.util
 from pox.lib.revent.revent import EventMixin
 import datetime
+import time
 from pox.lib.socketcapture import CaptureSocket
 import pox.openflow.debug
 from pox.openflow.util import make_type_to_class_table
@@ -38,37 +39,39 @@ log = core.getLogger()
 import socket
 import select
 
-try:
-  PIPE_BUF = select.PIPE_BUF
-except:
-  try:
-    # Try to get it from where PyPy (sometimes) has it
-    import IN
-    PIPE_BUF = IN.PIPE_BUF
-  except:
-    # (Hopefully) reasonable default
-    PIPE_BUF = 512
-
 import pox.openflow.libopenflow_01 as of
 
-import threading
 import os
 import sys
 import exceptions
-from errno import EAGAIN, ECONNRESET
+import threading
+from errno import EAGAIN, ECONNRESET, EINTR
+from collections import deque
+from contextlib import contextmanager
 
 
 import traceback
 
 
+# Messages which are always the same except for their xids, packed just once
+_hello = of.ofp_hello().prepack()
+_features_request = of.ofp_features_request().prepack()
+_echo_reply = of.ofp_echo_reply().prepack()
+_clear_flows = of.ofp_flow_mod(match=of.ofp_match(),
+                               command=of.OFPFC_DELETE).prepack()
+
 def handle_HELLO (con, msg): #S
   #con.msg("HELLO wire protocol " + hex(msg.version))
 
   # Send a features request
-  msg = of.ofp_features_request()
-  con.send(msg.pack())
+  con.send(_features_request)
 
 def handle_ECHO_REQUEST (con, msg): #S
+  if not msg.body:
+    # The usual case: the reply is just a header with the request's xid
+    con.send(_echo_reply.pack(msg.xid))
+    return
+
   reply = msg
   
   reply.header_type = of.OFPT_ECHO_REPLY
@@ -98,44 +101,35 @@ def handle_FEATURES_REPLY (con, msg):
   con.ofnexus._connect(con)
   #connections[con.dpid] = con
 
-  barrier = of.ofp_barrier_request()
-
-  listeners = []
-
-  def finish_connecting (event):
-    if event.xid != barrier.xid:
+  def finish_connecting (request):
+    ok = request.reply is not None
+    if request.error is not None:
+      # Probably an HP switch that doesn't support barriers (ugh).  We'll
+      # just assume that things are okay.
+      ok = (request.error.type == of.OFPET_BAD_REQUEST
+            and request.error.code == of.OFPBRC_BAD_TYPE)
+    if not ok:
+      if con.disconnected: return
       con.dpid = None
       con.err("Failed connect for " + pox.lib.util.dpidToStr(
               msg.datapath_id))
       con.disconnect()
     else:
       con.info("Connected to " + pox.lib.util.dpidToStr(msg.datapath_id))
-      import time
       con.connect_time = time.time()
       #for p in msg.ports: print(p.show())
       con.ofnexus.raiseEventNoErrors(ConnectionUp, con, msg)
       con.raiseEventNoErrors(ConnectionUp, con, msg)
-    con.removeListeners(listeners)
-  listeners.append(con.addListener(BarrierIn, finish_connecting))
-
-  def also_finish_connecting (event):
-    if event.xid != barrier.xid: return
-    if event.ofp.type != of.OFPET_BAD_REQUEST: return
-    if event.ofp.code != of.OFPBRC_BAD_TYPE: return
-    # Okay, so this is probably an HP switch that doesn't support barriers
-    # (ugh).  We'll just assume that things are okay.
-    finish_connecting(event)
-  listeners.append(con.addListener(ErrorIn, also_finish_connecting))
-
-  #TODO: Add a timeout for finish_connecting
 
-  if con.ofnexus.miss_send_len is not None:
-    con.send(of.ofp_switch_config(miss_send_len =
-                                  con.ofnexus.miss_send_len))
-  if con.ofnexus.clear_flows_on_connect:
-    con.send(of.ofp_flow_mod(match=of.ofp_match(), command=of.OFPFC_DELETE))
+  with con.batch():
+    if con.ofnexus.miss_send_len is not None:
+      con.send(of.ofp_switch_config(miss_send_len =
+                                    con.ofnexus.miss_send_len))
+    if con.ofnexus.clear_flows_on_connect:
+      con.send(_clear_flows)
 
-  con.send(barrier)
+    con.request(of.ofp_barrier_request(), con.connect_timeout,
+                finish_connecting)
 
 
 def handle_STATS_REPLY (con, msg):
@@ -159,23 +153,30 @@ def handle_ERROR_MSG (con, msg): #A
             msg.show(str(con) + " Error: ").strip())
   con.ofnexus.raiseEventNoErrors(ErrorIn, con, msg)
   con.raiseEventNoErrors(ErrorIn, con, msg)
+  transaction = con._transaction_xids.get(msg.xid)
+  if transaction is not None:
+    transaction.errors.append((transaction.messages[msg.xid], msg))
 
 def handle_BARRIER (con, msg):
   con.ofnexus.raiseEventNoErrors(BarrierIn, con, msg)
   con.raiseEventNoErrors(BarrierIn, con, msg)
 
+def handle_REPLY (con, msg):
+  # Replies with no event of their own; they just complete Requests
+  pass
+
 #TODO: def handle_VENDOR (con, msg): #S
 
 
 def _processStatsBody (body, obj):
   r = []
   t = obj.__class__
-  remaining = len(body)
-  while remaining:
+  offset = 0
+  while offset < len(body):
     obj = t()
-    body = obj.unpack(body)
-    assert len(body) < remaining # Should have read something
-    remaining = len(body)
+    end = obj.unpack_from(body, offset)
+    assert end > offset # Should have read something
+    offset = end
     r.append(obj)
   return r
 
@@ -185,13 +186,7 @@ def handle_OFPST_DESC (con, parts):
   msg.unpack(parts[0].body)
   con.ofnexus.raiseEventNoErrors(SwitchDescReceived, con, parts[0], msg)
   con.raiseEventNoErrors(SwitchDescReceived, con, parts[0], msg)
-
-def handle_OFPST_FLOW (con, parts):
-  msg = []
-  for part in parts:
-    msg += _processStatsBody(part.body, of.ofp_flow_stats())
-  con.ofnexus.raiseEventNoErrors(FlowStatsReceived, con, parts, msg)
-  con.raiseEventNoErrors(FlowStatsReceived, con, parts, msg)
+  return msg
 
 def handle_OFPST_AGGREGATE (con, parts):
   msg = of.ofp_aggregate_stats_reply()
@@ -199,27 +194,8 @@ def handle_OFPST_AGGREGATE (con, parts):
   con.ofnexus.raiseEventNoErrors(AggregateFlowStatsReceived, con,
                                  parts[0], msg)
   con.raiseEventNoErrors(AggregateFlowStatsReceived, con, parts[0], msg)
+  return msg
 
-def handle_OFPST_TABLE (con, parts):
-  msg = []
-  for part in parts:
-    msg += _processStatsBody(part.body, of.ofp_table_stats())
-  con.ofnexus.raiseEventNoErrors(TableStatsReceived, con, parts, msg)
-  con.raiseEventNoErrors(TableStatsReceived, con, parts, msg)
-
-def handle_OFPST_PORT (con, parts):
-  msg = []
-  for part in parts:
-    msg += _processStatsBody(part.body, of.ofp_port_stats())
-  con.ofnexus.raiseEventNoErrors(PortStatsReceived, con, parts, msg)
-  con.raiseEventNoErrors(PortStatsReceived, con, parts, msg)
-
-def handle_OFPST_QUEUE (con, parts):
-  msg = []
-  for part in parts:
-    msg += _processStatsBody(part.body, of.ofp_queue_stats())
-  con.ofnexus.raiseEventNoErrors(QueueStatsReceived, con, parts, msg)
-  con.raiseEventNoErrors(QueueStatsReceived, con, parts, msg)
 
 
 # A list, where the index is an OFPT, and the value is a libopenflow
@@ -242,135 +218,168 @@ handlerMap = {
   of.OFPT_BARRIER_REPLY : handle_BARRIER,
   of.OFPT_STATS_REPLY : handle_STATS_REPLY,
   of.OFPT_FLOW_REMOVED : handle_FLOW_REMOVED,
+  of.OFPT_ECHO_REPLY : handle_REPLY,
+  of.OFPT_GET_CONFIG_REPLY : handle_REPLY,
+  of.OFPT_QUEUE_GET_CONFIG_REPLY : handle_REPLY,
+}
+
+# Message types which complete a Request with the same xid (stats replies
+# do too, once their last part is in)
+replyTypes = set([
+  of.OFPT_ERROR,
+  of.OFPT_ECHO_REPLY,
+  of.OFPT_FEATURES_REPLY,
+  of.OFPT_GET_CONFIG_REPLY,
+  of.OFPT_BARRIER_REPLY,
+  of.OFPT_QUEUE_GET_CONFIG_REPLY,
+])
+
+# Message types whose handlers do nothing but raise the given event.  If
+# neither the connection nor its nexus has listeners for the event, the
+# message is dropped without being decoded.
+listenerEvents = {
+  of.OFPT_PACKET_IN : PacketIn,
+  of.OFPT_FLOW_REMOVED : FlowRemoved,
+  of.OFPT_PORT_STATUS : PortStatus,
 }
 
+def _hasListeners (source, eventType):
+  handlers = getattr(source, '_eventMixin_handlers', None)
+  if not handlers: return False
+  return len(handlers.get(eventType, ())) != 0
+
+# Handlers for stats which come in a single part
 statsHandlerMap = {
   of.OFPST_DESC : handle_OFPST_DESC,
-  of.OFPST_FLOW : handle_OFPST_FLOW,
   of.OFPST_AGGREGATE : handle_OFPST_AGGREGATE,
-  of.OFPST_TABLE : handle_OFPST_TABLE,
-  of.OFPST_PORT : handle_OFPST_PORT,
-  of.OFPST_QUEUE : handle_OFPST_QUEUE,
 }
 
-# Deferred sending should be unusual, so don't worry too much about
-# efficiency
-class DeferredSender (threading.Thread):
-  """
-  Class that handles sending when a socket write didn't complete
-  """
-  def __init__ (self):
-    # Threads, not recoco?
-    threading.Thread.__init__(self)
-    self._dataForConnection = {}
-    self._lock = threading.RLock()
-    self._waker = pox.lib.util.makePinger()
-    self.daemon = True
-    self.sending = False
-
-    self.start()
-
-  def _sliceup (self, data):
-    """
-    Takes an array of data bytes, and slices into elements of
-    PIPE_BUF bytes each
-    """
-    out = []
-    while len(data) > PIPE_BUF:
-      out.append(data[0:PIPE_BUF])
-      data = data[PIPE_BUF:]
-    if len(data) > 0:
-      out.append(data)
-    return out
-
-  def send (self, con, data):
-    with self._lock:
-      self.sending = True
+# Stats which may come in multiple parts.  Each maps to the class of its
+# entries, the event raised for each part and the event raised with all the
+# entries once the last part is in.
+multipartStatsMap = {
+  of.OFPST_FLOW : (of.ofp_flow_stats, FlowStatsPartReceived,
+                   FlowStatsReceived),
+  of.OFPST_TABLE : (of.ofp_table_stats, TableStatsPartReceived,
+                    TableStatsReceived),
+  of.OFPST_PORT : (of.ofp_port_stats, PortStatsPartReceived,
+                   PortStatsReceived),
+  of.OFPST_QUEUE : (of.ofp_queue_stats, QueueStatsPartReceived,
+                    QueueStatsReceived),
+}
 
-      data = self._sliceup(data)
+class DummyOFNexus (object):
+  def raiseEventNoErrors (self, event, *args, **kw):
+    log.warning("%s raised on dummy OpenFlow nexus" % event)
+  def raiseEvent (self, event, *args, **kw):
+    log.warning("%s raised on dummy OpenFlow nexus" % event)
+  def _disconnect (self, dpid):
+    log.warning("%s disconnected on dummy OpenFlow nexus",
+                pox.lib.util.dpidToStr(dpid))
 
-      if con not in self._dataForConnection:
-        self._dataForConnection[con] = data
-      else:
-        self._dataForConnection[con].extend(data)
+_dummyOFNexus = DummyOFNexus()
 
-      self._waker.ping()
 
-  def kill (self, con):
-    with self._lock:
+class Request (object):
+  """
+  A request sent with Connection.request(), waiting for its reply
+
+  Once done, one of these is set:
+   reply - The reply message.  For stats requests, the list of
+           ofp_stats_replys (one per part), with the decoded stats in
+           .stats (as in the corresponding StatsReceived event).
+   error - The ofp_error the switch sent back instead.
+   failed - Why there won't be a reply ("timeout" or "disconnected").
+  """
+  def __init__ (self, connection, xid):
+    self.connection = connection
+    self.xid = xid
+    self.reply = None
+    self.stats = None
+    self.error = None
+    self.failed = None
+    self.done = False
+    self._callbacks = []
+    self._timer = None
+
+  @property
+  def ok (self):
+    return self.reply is not None
+
+  def addCallback (self, callback):
+    """
+    Calls callback(request) once this request is done (or right away, if
+    it already is)
+    """
+    if self.done:
+      callback(self)
+    else:
+      self._callbacks.append(callback)
+
+  def _complete (self, reply = None, stats = None, error = None,
+                 failed = None):
+    if self.done: return
+    self.done = True
+    self.reply = reply
+    self.stats = stats
+    self.error = error
+    self.failed = failed
+    if self._timer is not None:
+      self._timer.cancel()
+      self._timer = None
+    callbacks = self._callbacks
+    self._callbacks = None
+    for callback in callbacks:
       try:
-        del self._dataForConnection[con]
+        callback(self)
       except:
-        pass
+        log.exception("%s: Exception in callback for request %i",
+                      self.connection, self.xid)
 
-      self._waker.ping()
+  def _state (self):
+    if not self.done: return "pending"
+    if self.failed is not None: return self.failed
+    if self.error is not None: return "error"
+    return "ok"
 
-  def run (self):
-    while core.running:
+  def __repr__ (self):
+    return "<Request %s %s>" % (self.xid, self._state())
 
-      with self._lock:
-        cons = self._dataForConnection.keys()
 
-      rlist, wlist, elist = select.select([self._waker], cons, cons, 1)
-      if not core.running: break
+class Transaction (Request):
+  """
+  A batch of messages followed by a barrier (see Connection.transaction())
 
-      with self._lock:
-        if len(rlist) > 0:
-          self._waker.pongAll()
+  It's done when the barrier's reply comes back, by which point the switch
+  has dealt with all of the messages.  messages maps the xids of the
+  messages to the messages, and errors holds a (message, ofp_error) pair
+  for each one the switch sent back an error for.
+  """
+  def __init__ (self, connection):
+    Request.__init__(self, connection, None)
+    self.messages = {}
+    self.errors = []
 
-        for con in elist:
-          try:
-            del self._dataForConnection[con]
-          except:
-            pass
+  @property
+  def ok (self):
+    return self.reply is not None and not self.errors
 
-        for con in wlist:
-          try:
-            alldata = self._dataForConnection[con]
-            while len(alldata):
-              data = alldata[0]
-              try:
-                l = con.sock.send(data)
-                if l != len(data):
-                  alldata[0] = data[l:]
-                  break
-                del alldata[0]
-              except socket.error as (errno, strerror):
-                if errno != EAGAIN:
-                  con.msg("DeferredSender/Socket error: " + strerror)
-                  con.disconnect()
-                  del self._dataForConnection[con]
-                break
-              except:
-                con.msg("Unknown error doing deferred sending")
-                break
-            if len(alldata) == 0:
-              try:
-                del self._dataForConnection[con]
-                if len(self._dataForConnection) == 0:
-                  self.sending = False
-                  break
-              except:
-                pass
-          except:
-            try:
-              del self._dataForConnection[con]
-            except:
-              pass
-
-# Used by the Connection class below
-deferredSender = DeferredSender()
+  def _sent (self, msg, data):
+    xid = of._struct_L.unpack_from(data, 4)[0]
+    self.messages[xid] = msg
+    self.connection._transaction_xids[xid] = self
 
-class DummyOFNexus (object):
-  def raiseEventNoErrors (self, event, *args, **kw):
-    log.warning("%s raised on dummy OpenFlow nexus" % event)
-  def raiseEvent (self, event, *args, **kw):
-    log.warning("%s raised on dummy OpenFlow nexus" % event)
-  def _disconnect (self, dpid):
-    log.warning("%s disconnected on dummy OpenFlow nexus",
-                pox.lib.util.dpidToStr(dpid))
+  def _complete (self, *args, **kw):
+    if self.done: return
+    xids = self.connection._transaction_xids
+    for xid in self.messages:
+      if xids.get(xid) is self:
+        del xids[xid]
+    Request._complete(self, *args, **kw)
 
-_dummyOFNexus = DummyOFNexus()
+  def __repr__ (self):
+    return "<Transaction %s %s, %i messages, %i errors>" % (self.xid,
+        self._state(), len(self.messages), len(self.errors))
 
 
 """
@@ -465,12 +474,42 @@ class Connection (EventMixin):
     TableStatsReceived,
     PortStatsReceived,
     QueueStatsReceived,
+    FlowStatsPartReceived,
+    TableStatsPartReceived,
+    PortStatsPartReceived,
+    QueueStatsPartReceived,
     FlowRemoved,
   ])
   
   # Globally unique identifier for the Connection instance
   ID = 0
 
+  # Receive buffer tuning.  We ask recv for _read_size bytes, which adapts
+  # between the min and max depending on how full our reads are.
+  initial_buffer_size = 64 * 1024
+  min_read_size = 2048
+  max_read_size = 32 * 1024
+
+  # Send queue watermarks (in bytes).  When a switch isn't keeping up and
+  # more than the high watermark is queued for it, we stop reading from it
+  # until its queue drains below the low watermark.
+  send_high_watermark = 4 * 1024 * 1024
+  send_low_watermark = 1024 * 1024
+
+  # If True, send() just queues, and the queue is flushed once the current
+  # task yields.  This turns bursts of small messages into a single send.
+  coalesce_sends = False
+
+  # Up to this many bytes of queued messages are joined into one send()
+  coalesce_size = 64 * 1024
+
+  # Seconds to wait for the next part of a multipart stats reply before
+  # giving up on it
+  stats_reply_timeout = 60
+
+  # Seconds to wait for the barrier which finishes connecting a switch
+  connect_timeout = 30
+
   def msg (self, m):
     #print str(self), m
     log.debug(str(self) + " " + str(m))
@@ -482,12 +521,42 @@ class Connection (EventMixin):
     #print str(self), m
     log.info(str(self) + " " + str(m))
 
-  def __init__ (self, sock):
-    self._previous_stats = []
+  def __init__ (self, sock, poller = None):
+    # Multipart stats replies being received, keyed by xid.  Each is
+    # [type, parts, entries, time of last part]; parts and entries are None
+    # unless they're wanted for the aggregate event or a Request.
+    self._stats_in_progress = {}
+    # Timer for dropping those which stop getting parts
+    self._stats_timer = None
+    # Outstanding Requests, keyed by xid
+    self._requests = {}
+    # The Transaction in the with block we're in (if any), and the
+    # outstanding Transactions keyed by the xids of their messages
+    self._transaction = None
+    self._transaction_xids = {}
 
     self.ofnexus = _dummyOFNexus
     self.sock = sock
-    self.buf = ''
+    # Outgoing data which the socket wouldn't take yet.  It's sent when
+    # the poller tells us the socket is writable.
+    self._send_queue = deque()
+    self._send_queued = 0
+    # Held while changing or flushing the send queue, since send() may be
+    # called from outside the OpenFlow task
+    self._send_lock = threading.RLock()
+    self._throttled = False
+    self._interest = (True, False) # (read, write)
+    self._corked = 0
+    self._flush_pending = False
+    self._poller = poller
+    if poller is not None:
+      poller.register(self)
+    # Receive buffer.  Unparsed data lives in _rbuf[_rstart:_rend].
+    self._rbuf = bytearray(self.initial_buffer_size)
+    self._rview = memoryview(self._rbuf)
+    self._rstart = 0
+    self._rend = 0
+    self._read_size = self.min_read_size
     Connection.ID += 1
     self.ID = Connection.ID
     # TODO: dpid and features don't belong here; they should be eventually
@@ -497,7 +566,7 @@ class Connection (EventMixin):
     self.disconnected = False
     self.connect_time = None
 
-    self.send(of.ofp_hello())
+    self.send(_hello)
 
     #TODO: set a time that makes sure we actually establish a connection by
     #      some timeout
@@ -508,6 +577,8 @@ class Connection (EventMixin):
   def close (self):
     if not self.disconnected:
       self.info("closing connection")
+      # So that ConnectionDown is raised, requests fail, etc.
+      self.disconnect()
     else:
       #self.msg("closing connection")
       pass
@@ -542,21 +613,42 @@ class Connection (EventMixin):
     if self.dpid != None:
       self.ofnexus.raiseEventNoErrors(ConnectionDown(self))
 
+    with self._send_lock:
+      self._send_queue.clear()
+      self._send_queued = 0
+    # Nothing more will be read or sent, so stop polling the socket (its
+    # interest won't be updated anymore) and close it
+    if self._poller is not None:
+      self._poller.unregister(self)
     try:
-      #deferredSender.kill(self)
-      pass
+      self.sock.shutdown(socket.SHUT_RDWR)
     except:
       pass
     try:
-      self.sock.shutdown(socket.SHUT_RDWR)
+      self.sock.close()
     except:
       pass
+    self._stats_in_progress.clear()
+    if self._stats_timer is not None:
+      self._stats_timer.cancel()
+      self._stats_timer = None
+    requests = self._requests
+    self._requests = {}
+    for request in requests.values():
+      request._complete(failed = "disconnected")
     try:
       pass
       #TODO disconnect notification
     except:
       pass
 
+  @property
+  def send_queue_depth (self):
+    """
+    Number of bytes waiting to be sent to the switch
+    """
+    return self._send_queued
+
   def send (self, data):
     """
     Send raw data to the switch.
@@ -564,62 +656,306 @@ class Connection (EventMixin):
     Generally, data is a bytes object.  If not, we check if it has a pack()
     method and call it (hoping the result will be a bytes object).  This
     way, you can just pass one of the OpenFlow objects from the OpenFlow
-    library to it and get the expected result, for example.
+    library to it and get the expected result, for example.  A message
+    you send often can be packed just once with its prepack() method; the
+    resulting PackedMessage only has its xid filled in here.
+
+    If the switch can't take it all right now, the rest is queued on this
+    connection and sent once the socket becomes writable.  A slow switch
+    only ever delays its own messages.  This may be called from threads
+    other than the OpenFlow task's (the rest of Connection may not).
     """
     if self.disconnected: return
+    msg = data
     if type(data) is not bytes:
       if hasattr(data, 'pack'):
         data = data.pack()
+    if self._transaction is not None:
+      self._transaction._sent(msg, data)
 
-    if deferredSender.sending:
-      log.debug("deferred sender is sending!")
-      deferredSender.send(self, data)
+    with self._send_lock:
+      self._send_queue.append(data)
+      self._send_queued += len(data)
+      if self._corked:
+        return
+      if self.coalesce_sends:
+        if not self._flush_pending:
+          self._flush_pending = True
+          core.callLater(self._deferred_flush)
+      elif len(self._send_queue) == 1 or self._poller is None:
+        # Nothing was queued before this, so we can try sending right away
+        self._flush_send_queue()
+      else:
+        self._update_interest()
+
+  def request (self, msg, timeout = None, callback = None):
+    """
+    Send a request and return a Request which completes on its reply.
+
+    The reply (or an error) is matched to the request by xid, so there's
+    no need to listen for and filter BarrierIns, ErrorIns, stats events,
+    etc., and many requests can be outstanding at once.  If timeout
+    seconds pass without a reply, the Request fails with "timeout".
+    callback, if given, is called with the Request once it's done.
+    msg may also be a PackedMessage.
+    """
+    request = Request(self, None)
+    if callback is not None:
+      request.addCallback(callback)
+    self._send_request(msg, request, timeout)
+    return request
+
+  def _send_request (self, msg, request, timeout):
+    data = msg.pack() # Assigns an xid if it doesn't have one yet
+    request.xid = msg.xid
+    if self.disconnected:
+      request._complete(failed = "disconnected")
       return
+    self._requests[msg.xid] = request
+    if timeout is not None:
+      request._timer = core.callDelayed(timeout, self._request_timeout,
+                                        request)
+    self.send(data)
+
+  def _request_timeout (self, request):
+    request._timer = None
+    if self._requests.get(request.xid) is request:
+      del self._requests[request.xid]
+    request._complete(failed = "timeout")
+
+  def _reply (self, msg, parts = None, stats = None):
+    """
+    Completes the Request (if any) which msg is the reply to
+
+    For stats, msg is the last part, and parts and stats are all of them.
+    """
+    request = self._requests.pop(msg.xid, None)
+    if request is None: return
+    if parts is not None:
+      request._complete(reply = parts, stats = stats)
+    elif msg.header_type == of.OFPT_ERROR:
+      request._complete(error = msg)
+    else:
+      request._complete(reply = msg)
+
+  def cork (self):
+    """
+    Hold sends until uncork() is called.
+
+    Everything sent in between goes out together (in as few send() calls
+    as possible).  Calls may be nested.  See also batch().
+    """
+    self._corked += 1
+
+  def uncork (self):
+    """
+    Undo a cork(), flushing anything queued if this was the last one.
+    """
+    assert self._corked > 0, "Connection not corked"
+    self._corked -= 1
+    if self._corked == 0 and self._send_queue:
+      self._flush_send_queue()
+
+  @contextmanager
+  def batch (self):
+    """
+    Corks the connection for the duration of a with block, e.g.:
+      with connection.batch():
+        for msg in flow_mods:
+          connection.send(msg)
+    """
+    self.cork()
     try:
-      l = self.sock.send(data)
-      if l != len(data):
-        self.msg("Didn't send complete buffer.")
-        data = data[l:]
-        deferredSender.send(self, data)
-    except socket.error as (errno, strerror):
-      if errno == EAGAIN:
-        self.msg("Out of send buffer space.  " +
-                 "Consider increasing SO_SNDBUF.")
-        deferredSender.send(self, data)
-      else:
-        self.msg("Socket error: " + strerror)
-        self.disconnect()
+      yield self
+    finally:
+      self.uncork()
+
+  @contextmanager
+  def transaction (self, timeout = None, callback = None):
+    """
+    Like batch(), but follows the messages with a barrier, e.g.:
+      with connection.transaction() as t:
+        for msg in flow_mods:
+          connection.send(msg)
+      t.addCallback(lambda t: log.info("%s", t.errors))
+    The Transaction (a Request) is done when the barrier reply comes back,
+    and any errors the switch sent for the messages are in its errors.
+    Transactions can't be nested.
+    """
+    assert self._transaction is None, "Transactions can't be nested"
+    transaction = Transaction(self)
+    if callback is not None:
+      transaction.addCallback(callback)
+    self.cork()
+    self._transaction = transaction
+    try:
+      yield transaction
+    finally:
+      self._transaction = None
+      try:
+        self._send_request(of.ofp_barrier_request(), transaction, timeout)
+      finally:
+        self.uncork()
+
+  def _deferred_flush (self):
+    self._flush_pending = False
+    if self.disconnected or self._corked: return
+    self._flush_send_queue()
+
+  def _flush_send_queue (self):
+    """
+    Send as much of the send queue as the socket will take
+    """
+    with self._send_lock:
+      q = self._send_queue
+      while q:
+        if len(q) > 1 and len(q[0]) < self.coalesce_size:
+          # Join small messages so they go out in one system call (we don't
+          # have sendmsg() or writev() in Python 2)
+          parts = []
+          size = 0
+          while q and size < self.coalesce_size:
+            d = q.popleft()
+            parts.append(d if type(d) is bytes else str(d))
+            size += len(d)
+          q.appendleft(b''.join(parts))
+        data = q[0]
+        try:
+          l = self.sock.send(data)
+        except socket.error as (errno, strerror):
+          if errno == EAGAIN: break
+          self.msg("Socket error: " + strerror)
+          self.disconnect()
+          return
+        self._send_queued -= l
+        if l == len(data):
+          q.popleft()
+        else:
+          # Partial write; keep the rest (without copying it if we can)
+          if isinstance(self.sock, OFCaptureSocket):
+            q[0] = data[l:]
+          else:
+            q[0] = buffer(data, l)
+          break
+
+      self._update_interest()
+
+  def _update_interest (self):
+    if self.disconnected: return
+    if self._throttled:
+      if self._send_queued <= self.send_low_watermark:
+        self._throttled = False
+        self.msg("Send queue drained; reading again")
+    elif self._send_queued > self.send_high_watermark:
+      self._throttled = True
+      self.msg("Send queue above high watermark (%i bytes); not reading"
+               % (self._send_queued,))
+    interest = (not self._throttled,
+                len(self._send_queue) != 0 and not self._corked)
+    if interest != self._interest and self._poller is not None:
+      self._interest = interest
+      self._poller.modify(self, *interest)
+
+  def _make_room (self):
+    """
+    Make sure there's at least _read_size free bytes at the end of the
+    receive buffer.  Unparsed data is only moved when we run out of space.
+    """
+    used = self._rend - self._rstart
+    if len(self._rbuf) - self._rend >= self._read_size: return
+    if used + self._read_size <= len(self._rbuf):
+      # Compact
+      self._rbuf[0:used] = self._rbuf[self._rstart:self._rend]
+    else:
+      # Grow.  We replace rather than resize since _rview is exported.
+      b = bytearray(max(len(self._rbuf) * 2, used + self._read_size))
+      b[0:used] = self._rbuf[self._rstart:self._rend]
+      self._rbuf = b
+      self._rview = memoryview(b)
+    self._rstart = 0
+    self._rend = used
+
+  def _recv_into (self, start, size):
+    if isinstance(self.sock, OFCaptureSocket):
+      # Capture sockets only wrap recv()
+      d = self.sock.recv(size)
+      self._rbuf[start:start+len(d)] = d
+      return len(d)
+    return self.sock.recv_into(self._rview[start:start+size], size)
 
   def read (self):
     """
     Read data from this connection.  Generally this is just called by the
     main OpenFlow loop below.
 
-    Note: This function will block if data is not available.
+    Reads until the socket would block, so this is safe to use with
+    edge-triggered pollers.  Stops early if handling what we read put the
+    send queue over the high watermark; reading resumes when the poller
+    reports the socket again after the queue drains.  Returns False if
+    the connection was closed by the other side (or sent us garbage).
     """
-    d = self.sock.recv(2048)
-    if len(d) == 0:
-      return False
-    self.buf += d
-    l = len(self.buf)
-    while l > 4:
-      if ord(self.buf[0]) != of.OFP_VERSION:
-        log.warning("Bad OpenFlow version (" + str(ord(self.buf[0])) +
+    while True:
+      self._make_room()
+      try:
+        l = self._recv_into(self._rend, self._read_size)
+      except socket.error as (errno, strerror):
+        if errno == EAGAIN: return True
+        raise
+      if l == 0:
+        self._parse()
+        return False
+      self._rend += l
+
+      # Adapt the read size to what the switch is actually sending
+      if l == self._read_size:
+        self._read_size = min(self._read_size * 2, self.max_read_size)
+      elif l < self._read_size / 4:
+        self._read_size = max(self._read_size / 2, self.min_read_size)
+
+      if self._parse() is False or self.disconnected:
+        return False
+      if self._throttled:
+        return True
+
+  def _parse (self):
+    """
+    Dispatch all complete messages in the receive buffer
+    """
+    b = self._rbuf
+    while self._rend - self._rstart > 4:
+      start = self._rstart
+      if b[start] != of.OFP_VERSION:
+        log.warning("Bad OpenFlow version (" + str(b[start]) +
                     ") on connection " + str(self))
         return False
       # OpenFlow parsing occurs here:
-      ofp_type = ord(self.buf[1])
-      packet_length = ord(self.buf[2]) << 8 | ord(self.buf[3])
-      if packet_length > l: break
+      ofp_type = b[start+1]
+      packet_length = b[start+2] << 8 | b[start+3]
+      if packet_length < 8:
+        log.warning("Bad OpenFlow message length (" + str(packet_length) +
+                    ") on connection " + str(self))
+        return False
+      if packet_length > self._rend - start: break
+      self._rstart = start + packet_length
+      if self._rstart == self._rend:
+        self._rstart = self._rend = 0
+
+      event = listenerEvents.get(ofp_type)
+      if event is not None:
+        if not (_hasListeners(self, event)
+                or _hasListeners(self.ofnexus, event)):
+          # Nobody would see the event; don't bother decoding it
+          continue
+
       msg = classes[ofp_type]()
-      # msg.unpack implicitly only examines its own bytes, and not trailing
-      # bytes 
-      msg.unpack(self.buf)
-      self.buf = self.buf[packet_length:]
-      l = len(self.buf)
+      # The memoryview covers just this message, so nothing is copied
+      # except the fields unpack_from chooses to read out.
+      msg.unpack_from(self._rview[start:start+packet_length])
       try:
         h = handlers[ofp_type]
         h(self, msg)
+        if self._requests and ofp_type in replyTypes:
+          self._reply(msg)
       except:
         log.exception("%s: Exception while handling OpenFlow message:\n" +
                       "%s %s", self,self,
@@ -628,40 +964,94 @@ class Connection (EventMixin):
     return True
 
   def _incoming_stats_reply (self, ofp):
-    # This assumes that you don't receive multiple stats replies
-    # to different requests out of order/interspersed.
+    # Multipart replies are reassembled by xid, so replies to several
+    # outstanding requests may arrive interleaved.
     more = (ofp.flags & 1) != 0
-    if more:
-      if ofp.type not in [of.OFPST_FLOW, of.OFPST_TABLE,
-                                of.OFPST_PORT, of.OFPST_QUEUE]:
-        log.error("Don't know how to aggregate stats message of type " +
-                  str(ofp.type))
-        self._previous_stats = []
+    multipart = multipartStatsMap.get(ofp.type)
+    if more and multipart is None:
+      log.error("Don't know how to aggregate stats message of type " +
+                str(ofp.type))
+      return
+
+    if multipart is None:
+      handler = statsHandlerMap.get(ofp.type, None)
+      if handler is None:
+        log.warn("No handler for stats of type " + str(ofp.type))
         return
-      
-    if len(self._previous_stats) != 0:
-      if ((ofp.xid == self._previous_stats[0].xid) and
-          (ofp.type == self._previous_stats[0].type)):
-        self._previous_stats.append(ofp)
+      stats = handler(self, [ofp])
+      if ofp.xid in self._requests:
+        self._reply(ofp, [ofp], stats)
+      return
+
+    entry_class, part_event, event = multipart
+    now = time.time()
+    pending = self._stats_in_progress.get(ofp.xid)
+    if pending is not None and pending[0] != ofp.type:
+      log.error("Was expecting continued stats of type %i with xid %i, "
+                "but got type %i", pending[0], ofp.xid, ofp.type)
+      pending = None
+    if pending is None:
+      # First part.  Only hang on to the parts if someone wants them all.
+      if (ofp.xid in self._requests or _hasListeners(self, event)
+          or _hasListeners(self.ofnexus, event)):
+        pending = [ofp.type, [], [], now]
       else:
-        log.error("Was expecting continued stats of type %i with xid %i, " +
-                  "but got type %i with xid %i" %
-                  (self._previous_stats_reply.xid,
-                    self._previous_stats_reply.type,
-                    ofp.xid, ofp.type))
-        self._previous_stats = [ofp]
+        pending = [ofp.type, None, None, now]
+      if more:
+        self._stats_in_progress[ofp.xid] = pending
+        self._schedule_stats_expiry(now)
     else:
-      self._previous_stats = [ofp]
+      pending[3] = now
+
+    parts = pending[1]
+    want_part = (_hasListeners(self, part_event)
+                 or _hasListeners(self.ofnexus, part_event))
+    if want_part or parts is not None:
+      # Entries are decoded as each part arrives, not all at the end
+      stats = _processStatsBody(ofp.body, entry_class())
+      if want_part:
+        self.ofnexus.raiseEventNoErrors(part_event, self, ofp, stats, more)
+        self.raiseEventNoErrors(part_event, self, ofp, stats, more)
+      if parts is not None:
+        parts.append(ofp)
+        pending[2] += stats
 
     if not more:
-      handler = statsHandlerMap.get(self._previous_stats[0].type, None)
-      s = self._previous_stats
-      self._previous_stats = []
-      if handler is None:
-        log.warn("No handler for stats of type " +
-                 str(self._previous_stats[0].type))
-        return
-      handler(self, s)
+      self._stats_in_progress.pop(ofp.xid, None)
+      if parts is not None:
+        self.ofnexus.raiseEventNoErrors(event, self, parts, pending[2])
+        self.raiseEventNoErrors(event, self, parts, pending[2])
+        if ofp.xid in self._requests:
+          self._reply(ofp, parts, pending[2])
+
+  def _schedule_stats_expiry (self, now):
+    """
+    Sets a timer for when the oldest multipart stats reply would expire
+    """
+    if self._stats_timer is not None or not self._stats_in_progress: return
+    oldest = min(pending[3] for pending in self._stats_in_progress.values())
+    self._stats_timer = core.callDelayed(
+        oldest + self.stats_reply_timeout - now, self._expire_stats)
+
+  def _expire_stats (self):
+    """
+    Drops multipart stats replies which haven't had a part for a while
+
+    A Request waiting for one fails with "timeout".
+    """
+    self._stats_timer = None
+    if self.disconnected: return
+    now = time.time()
+    cutoff = now - self.stats_reply_timeout
+    for xid,pending in self._stats_in_progress.items():
+      if pending[3] <= cutoff:
+        log.warn("%s: Gave up waiting for the rest of stats reply %i",
+                 self, xid)
+        del self._stats_in_progress[xid]
+        request = self._requests.pop(xid, None)
+        if request is not None:
+          request._complete(failed = "timeout")
+    self._schedule_stats_expiry(now)
 
   def __str__ (self):
     return "[Con " + str(self.ID) + "/" + str(self.dpid) + "]"
@@ -684,39 +1074,274 @@ def wrap_socket (new_sock):
 
 from pox.lib.recoco.recoco import *
 
+class SelectPoller (object):
+  """
+  Waits on sockets by handing the whole list to recoco's Select each pass.
+
+  This is the traditional behavior.  It's portable, but it's O(n) on every
+  wakeup and can't handle more than FD_SETSIZE sockets.
+
+  The lists are only read when a Select starts, so if they change while
+  the task is waiting (e.g., something sent from another thread queued
+  data), we wake it with a pinger so it starts a new one.
+  """
+  def __init__ (self):
+    self._waker = pox.lib.util.makePinger()
+    self._readers = [self._waker]
+    self._writers = []
+    self._objs = set()
+    self._waiting = False
+
+  def register (self, obj, read = True, write = False):
+    self._objs.add(obj)
+    self._set(obj, read, write)
+
+  def modify (self, obj, read = True, write = False):
+    if obj not in self._objs: return # Unregistered (e.g., since closed)
+    self._set(obj, read, write)
+
+  def _set (self, obj, read, write):
+    changed = False
+    for l,want in ((self._readers, read), (self._writers, write)):
+      if want:
+        if obj not in l:
+          l.append(obj)
+          changed = True
+      elif obj in l:
+        l.remove(obj)
+        changed = True
+    if changed and self._waiting:
+      self._waker.ping()
+
+  def unregister (self, obj):
+    self._objs.discard(obj)
+    self._set(obj, False, False)
+
+  def wait (self, timeout):
+    """
+    Returns a blocking operation for the OpenFlow task to yield
+    """
+    self._waiting = True
+    return Select(self._readers, self._writers, self._readers, timeout)
+
+  def ready (self, result):
+    """
+    Turns the result of the yielded operation into (rlist, wlist, elist)
+    """
+    self._waiting = False
+    rlist, wlist, elist = result
+    if self._waker in rlist:
+      self._waker.pongAll()
+      rlist = [r for r in rlist if r is not self._waker]
+    return rlist, wlist, elist
+
+
+class EPollPoller (object):
+  """
+  Waits on sockets using edge-triggered epoll.
+
+  Each object is registered with the kernel once, and is only re-armed
+  (via epoll's modify) when its interest set actually changes.  The epoll
+  object itself is what we hand to recoco, so a wakeup costs O(ready)
+  rather than O(connections).  Since it's edge-triggered, readers must
+  drain their sockets (Connection.read does).
+  """
+  def __init__ (self):
+    self._poller = select.epoll()
+    self._fds = {} # fd -> (obj, eventmask)
+    self._objs = {} # obj -> fd
+
+  if hasattr(select, 'epoll'):
+    _READ = select.EPOLLIN | select.EPOLLPRI
+    _WRITE = select.EPOLLOUT
+    _TRIGGER = select.EPOLLET
+    _READABLE = select.EPOLLIN | select.EPOLLPRI | select.EPOLLHUP
+    _ERRORS = select.EPOLLERR
+
+  def fileno (self):
+    return self._poller.fileno()
+
+  def _mask (self, read, write):
+    m = self._TRIGGER
+    if read: m |= self._READ
+    if write: m |= self._WRITE
+    return m
+
+  def register (self, obj, read = True, write = False):
+    fd = obj.fileno()
+    mask = self._mask(read, write)
+    self._poller.register(fd, mask)
+    self._fds[fd] = (obj, mask)
+    self._objs[obj] = fd
+
+  def modify (self, obj, read = True, write = False):
+    fd = self._objs.get(obj)
+    if fd is None: return # Unregistered (e.g., since closed)
+    mask = self._mask(read, write)
+    if self._fds[fd][1] == mask: return # Interest set unchanged
+    self._poller.modify(fd, mask)
+    self._fds[fd] = (obj, mask)
+
+  def unregister (self, obj):
+    fd = self._objs.pop(obj, None)
+    if fd is None: return
+    del self._fds[fd]
+    try:
+      self._poller.unregister(fd)
+    except (IOError, OSError, ValueError):
+      # Probably already closed, in which case the kernel dropped it
+      pass
+
+  def wait (self, timeout):
+    return Select([self], [], [], timeout)
+
+  def _poll (self):
+    try:
+      return self._poller.poll(0)
+    except IOError as e:
+      if e.errno == EINTR: return []
+      raise
+
+  def ready (self, result):
+    rlist = []
+    wlist = []
+    elist = []
+    for fd,events in self._poll():
+      entry = self._fds.get(fd)
+      if entry is None: continue
+      obj = entry[0]
+      if events & self._ERRORS: elist.append(obj)
+      if events & self._READABLE: rlist.append(obj)
+      if events & self._WRITE: wlist.append(obj)
+    return rlist, wlist, elist
+
+
+class PollPoller (EPollPoller):
+  """
+  Waits on sockets using (level-triggered) poll.
+
+  This is the fallback where epoll isn't available.  It doesn't have
+  select's FD_SETSIZE limit.  Since a poll object can't be handed to
+  recoco, when nothing is ready we sleep for poll_interval seconds and
+  then check again.
+  """
+  poll_interval = 0.01
+
+  def __init__ (self):
+    self._poller = select.poll()
+    self._fds = {} # fd -> (obj, eventmask)
+    self._objs = {} # obj -> fd
+    self._events = []
+
+  if hasattr(select, 'poll'):
+    _READ = select.POLLIN | select.POLLPRI
+    _WRITE = select.POLLOUT
+    _TRIGGER = 0
+    _READABLE = select.POLLIN | select.POLLPRI | select.POLLHUP
+    _ERRORS = select.POLLERR | select.POLLNVAL
+
+  def unregister (self, obj):
+    fd = self._objs.pop(obj, None)
+    if fd is None: return
+    del self._fds[fd]
+    try:
+      self._poller.unregister(fd)
+    except KeyError:
+      pass
+
+  def _poll (self):
+    events = self._events
+    self._events = []
+    return events
+
+  def wait (self, timeout):
+    try:
+      self._events = self._poller.poll(0)
+    except select.error as e:
+      if e[0] != EINTR: raise
+      self._events = []
+    if len(self._events):
+      return Sleep(0) # Just give others a chance to run
+    return Sleep(self.poll_interval)
+
+
+# Maps the names accepted by launch()'s io argument to poller classes
+pollers = {
+  'select' : SelectPoller,
+  'poll' : PollPoller,
+  'epoll' : EPollPoller,
+}
+
+def make_poller (io = 'select'):
+  """
+  Creates a poller for the given I/O strategy, falling back to the best
+  available one if this platform doesn't support it.
+  """
+  if io not in pollers:
+    raise RuntimeError("Unknown I/O strategy '%s' (try one of: %s)"
+                       % (io, ", ".join(sorted(pollers))))
+  if io == 'epoll' and not hasattr(select, 'epoll'):
+    log.warning("epoll not available; falling back to poll")
+    io = 'poll'
+  if io == 'poll' and not hasattr(select, 'poll'):
+    log.warning("poll not available; falling back to select")
+    io = 'select'
+  return pollers[io]()
+
+
 class OpenFlow_01_Task (Task):
   """
   The main recoco thread for listening to openflow messages
   """
-  def __init__ (self, port = 6633, address = '0.0.0.0'):
+  def __init__ (self, port = 6633, address = '0.0.0.0', io = 'select'):
     Task.__init__(self)
     self.port = int(port)
     self.address = address
+    self.io = io
 
     core.addListener(pox.core.GoingUpEvent, self._handle_GoingUpEvent)
 
   def _handle_GoingUpEvent (self, event):
     self.start()
 
+  def _accept (self, listener, poller):
+    """
+    Accept everything pending on the listener
+    """
+    while True:
+      try:
+        new_sock = listener.accept()[0]
+      except socket.error as (errno, strerror):
+        if errno == EAGAIN: return
+        raise
+      if pox.openflow.debug.pcap_traces:
+        new_sock = wrap_socket(new_sock)
+      new_sock.setblocking(0)
+      # Note that instantiating a Connection object fires a
+      # ConnectionUp event (after negotation has completed)
+      newcon = Connection(new_sock, poller)
+      #print str(newcon) + " connected"
+
   def run (self):
-    # List of open sockets/connections to select on
-    sockets = []
+    # Keeps track of open sockets/connections for us
+    poller = make_poller(self.io)
 
     listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
     listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
     listener.bind((self.address, self.port))
     listener.listen(16)
-    sockets.append(listener)
+    listener.setblocking(0)
+    poller.register(listener)
 
-    log.debug("Listening for connections on %s:%s" %
-              (self.address, self.port))
+    log.debug("Listening for connections on %s:%s (using %s)" %
+              (self.address, self.port, poller.__class__.__name__))
 
     con = None
     while core.running:
       try:
         while True:
           con = None
-          rlist, wlist, elist = yield Select(sockets, [], sockets, 5)
+          rlist, wlist, elist = poller.ready((yield poller.wait(5)))
           if len(rlist) == 0 and len(wlist) == 0 and len(elist) == 0:
             """
             try:
@@ -732,30 +1357,43 @@ class OpenFlow_01_Task (Task):
             if con is listener:
               raise RuntimeError("Error on listener socket")
             else:
+              poller.unregister(con)
               try:
                 con.close()
               except:
                 pass
-              try:
-                sockets.remove(con)
-              except:
-                pass
+
+          for con in wlist:
+            if con in elist: continue
+            con._flush_send_queue()
 
           for con in rlist:
             if con is listener:
-              new_sock = listener.accept()[0]
-              if pox.openflow.debug.pcap_traces:
-                new_sock = wrap_socket(new_sock)
-              new_sock.setblocking(0)
-              # Note that instantiating a Connection object fires a
-              # ConnectionUp event (after negotation has completed)
-              newcon = Connection(new_sock)
-              sockets.append( newcon )
-              #print str(newcon) + " connected"
-            else:
-              if con.read() is False:
+              self._accept(listener, poller)
+              continue
+            if con in elist: continue
+            # Errors are handled per connection so that one bad socket
+            # doesn't keep us from reading the rest of the ready list
+            # (edge-triggered pollers won't report those again).
+            try:
+              ok = con.read()
+            except exceptions.KeyboardInterrupt:
+              raise
+            except socket.error as (errno, strerror):
+              if errno == ECONNRESET:
+                con.info("Connection reset")
+              else:
+                log.exception("Exception reading connection " + str(con))
+              ok = False
+            except:
+              log.exception("Exception reading connection " + str(con))
+              ok = False
+            if ok is False:
+              poller.unregister(con)
+              try:
                 con.close()
-                sockets.remove(con)
+              except:
+                pass
       except exceptions.KeyboardInterrupt:
         break
       except:
@@ -772,11 +1410,11 @@ class OpenFlow_01_Task (Task):
           log.error("Exception on OpenFlow listener.  Aborting.")
           break
         try:
-          con.close()
+          poller.unregister(con)
         except:
           pass
         try:
-          sockets.remove(con)
+          con.close()
         except:
           pass
 
@@ -792,10 +1430,24 @@ for h in handlerMap:
   #print handlerMap[h]
 
 
-def launch (port = 6633, address = "0.0.0.0"):
+def launch (port = 6633, address = "0.0.0.0", io = "select",
+            high_watermark = None, low_watermark = None, coalesce = False):
+  """
+  Listens for OpenFlow 1.0 switches.
+
+  io selects how we wait on sockets: "select" (the default), "poll", or
+  "epoll" (edge-triggered, and the one to use for lots of switches).
+  high_watermark and low_watermark set the per-switch send queue limits
+  in bytes (see Connection).  If coalesce is set, messages sent during a
+  scheduler cycle are held and flushed together at the end of it.
+  """
   if core.hasComponent('of_01'):
     return None
-  l = OpenFlow_01_Task(port = int(port), address = address)
+  if high_watermark is not None:
+    Connection.send_high_watermark = int(high_watermark)
+  if low_watermark is not None:
+    Connection.send_low_watermark = int(low_watermark)
+  Connection.coalesce_sends = pox.lib.util.str_to_bool(coalesce)
+  l = OpenFlow_01_Task(port = int(port), address = address, io = io)
   core.register("of_01", l)
   return l
-
@@ -0,0 +1,182 @@
+# Copyright 2011 James McCauley
+#
+# This file is part of POX.
+#
+# POX is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# POX is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with POX.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+A lightweight view of the headers of a raw ethernet frame
+
+Most PacketIn listeners only look at a couple of header fields (the
+destination address, the ethertype, ...), and building the whole
+pox.lib.packet object graph just for those is expensive.  PacketHeaders
+reads fields straight out of the frame instead, decoding each layer the
+first time one of its fields is asked for.  The full parse is still there
+(.parsed) when a listener needs more.
+"""
+
+import struct
+from pox.lib.addresses import EthAddr, IPAddr
+from pox.lib.packet.ethernet import ethernet
+from pox.lib.packet.ipv4 import ipv4
+from pox.lib.packet.arp import arp
+
+_struct_eth = struct.Struct("!6s6sH")
+_struct_vlan = struct.Struct("!HH")
+_struct_ipv4 = struct.Struct("!BBHHHBBHLL")
+_struct_arp = struct.Struct("!HHBBHxxxxxxLxxxxxxL")
+_struct_ports = struct.Struct("!HH")
+_struct_icmp = struct.Struct("!BB")
+
+# Decoded layers, for when the frame doesn't have them
+_NO_LINK = (None, None, None, None, None, None, None)
+_NO_IP = (None, None, None, None, None)
+_NO_ARP = (None, None, None)
+_NO_TP = (None, None)
+
+
+class PacketHeaders (object):
+  """
+  Lazily decoded view of the headers of a raw ethernet frame
+
+  data can be a str, buffer or memoryview; it is never copied.  Fields of
+  headers the frame doesn't have, or which are cut short, are None.
+  Addresses are EthAddrs and IPAddrs.  tp_src and tp_dst are the TCP/UDP
+  ports or the ICMP type and code, as in an ofp_match.
+  """
+  __slots__ = ('data', '_link', '_ip', '_arp', '_tp', '_parsed')
+
+  def __init__ (self, data):
+    self.data = data
+    self._link = None
+    self._ip = None
+    self._arp = None
+    self._tp = None
+    self._parsed = None
+
+  def _decode_link (self):
+    """
+    (dst, src, ethertype, vlan_id, vlan_pcp, dl_type, next header offset)
+    """
+    l = self._link
+    if l is not None: return l
+    data = self.data
+    if len(data) < 14:
+      l = _NO_LINK
+    else:
+      (dst, src, ethertype) = _struct_eth.unpack_from(data, 0)
+      if ethertype != ethernet.VLAN_TYPE:
+        l = (EthAddr(dst), EthAddr(src), ethertype, None, None, ethertype, 14)
+      elif len(data) < 18:
+        l = (EthAddr(dst), EthAddr(src), ethertype, None, None, None, None)
+      else:
+        (tci, dl_type) = _struct_vlan.unpack_from(data, 14)
+        l = (EthAddr(dst), EthAddr(src), ethertype, tci & 0x0fff, tci >> 13,
+             dl_type, 18)
+    self._link = l
+    return l
+
+  def _decode_ip (self):
+    """
+    (src, dst, protocol, tos, transport header offset or None)
+    """
+    l = self._ip
+    if l is not None: return l
+    l = _NO_IP
+    link = self._decode_link()
+    offset = link[6]
+    if link[5] == ethernet.IP_TYPE and len(self.data) - offset >= 20:
+      (vhl, tos, _, _, frag, _, proto, _, src,
+       dst) = _struct_ipv4.unpack_from(self.data, offset)
+      hl = (vhl & 0x0f) * 4
+      if vhl >> 4 == 4 and hl >= 20:
+        # Fragments (MF set or a fragment offset) have no transport header
+        l = (IPAddr(src), IPAddr(dst), proto, tos,
+             offset + hl if (frag & 0x3fff) == 0 else None)
+    self._ip = l
+    return l
+
+  def _decode_arp (self):
+    """
+    (opcode, protosrc, protodst)
+    """
+    l = self._arp
+    if l is not None: return l
+    l = _NO_ARP
+    link = self._decode_link()
+    offset = link[6]
+    if link[5] == ethernet.ARP_TYPE and len(self.data) - offset >= 28:
+      (hwtype, prototype, hwlen, protolen, opcode, src,
+       dst) = _struct_arp.unpack_from(self.data, offset)
+      if (hwtype == arp.HW_TYPE_ETHERNET and prototype == arp.PROTO_TYPE_IP
+          and hwlen == 6 and protolen == 4):
+        l = (opcode, IPAddr(src), IPAddr(dst))
+    self._arp = l
+    return l
+
+  def _decode_tp (self):
+    """
+    (src, dst)
+    """
+    l = self._tp
+    if l is not None: return l
+    l = _NO_TP
+    ip = self._decode_ip()
+    offset = ip[4]
+    if offset is not None and len(self.data) - offset >= 4:
+      proto = ip[2]
+      if proto == ipv4.TCP_PROTOCOL or proto == ipv4.UDP_PROTOCOL:
+        l = _struct_ports.unpack_from(self.data, offset)
+      elif proto == ipv4.ICMP_PROTOCOL:
+        l = _struct_icmp.unpack_from(self.data, offset)
+    self._tp = l
+    return l
+
+  eth_dst = property(lambda self: self._decode_link()[0])
+  eth_src = property(lambda self: self._decode_link()[1])
+  ethertype = property(lambda self: self._decode_link()[2],
+                       doc="The ethernet header's type (ethernet.type)")
+  vlan_id = property(lambda self: self._decode_link()[3])
+  vlan_pcp = property(lambda self: self._decode_link()[4])
+  dl_type = property(lambda self: self._decode_link()[5],
+                     doc="The type of the payload, after any VLAN tag")
+
+  ip_src = property(lambda self: self._decode_ip()[0])
+  ip_dst = property(lambda self: self._decode_ip()[1])
+  ip_proto = property(lambda self: self._decode_ip()[2])
+  ip_tos = property(lambda self: self._decode_ip()[3])
+
+  arp_opcode = property(lambda self: self._decode_arp()[0])
+  arp_src = property(lambda self: self._decode_arp()[1])
+  arp_dst = property(lambda self: self._decode_arp()[2])
+
+  tp_src = property(lambda self: self._decode_tp()[0])
+  tp_dst = property(lambda self: self._decode_tp()[1])
+
+  @property
+  def parsed (self):
+    """
+    The frame as fully parsed by pox.lib.packet
+    """
+    if self._parsed is None:
+      data = self.data
+      if type(data) is not bytes:
+        data = bytes(data) if type(data) is not memoryview else data.tobytes()
+      self._parsed = ethernet(data)
+    return self._parsed
+
+  def __repr__ (self):
+    return "<PacketHeaders %s>" % (" ".join("%s:%s" % (k, getattr(self, k))
+        for k in ('eth_src', 'eth_dst', 'dl_type', 'ip_src', 'ip_dst',
+                  'tp_src', 'tp_dst') if getattr(self, k) is not None),)
@@ -95,6 +95,21 @@ def _calc_spanning_tree ():
 
 _prev = defaultdict(lambda : defaultdict(lambda : None))
 
+# (port_no, hw_addr, flood) -> PackedMessage of the port_mod for it.  Each
+# port only ever gets one of two port_mods, so we pack each just once.
+_port_mods = {}
+
+def _port_mod (port, flood):
+  key = (port.port_no, port.hw_addr, flood)
+  pm = _port_mods.get(key)
+  if pm is None:
+    pm = of.ofp_port_mod( port_no=port.port_no,
+                          hw_addr=port.hw_addr,
+                          config = 0 if flood else of.OFPPC_NO_FLOOD,
+                          mask = of.OFPPC_NO_FLOOD ).prepack()
+    _port_mods[key] = pm
+  return pm
+
 def _handle (event):
   tree = _calc_spanning_tree()
 
@@ -117,11 +132,7 @@ def _handle (event):
           #print sw,p.port_no,flood
           #TODO: Check results
 
-          pm = of.ofp_port_mod( port_no=p.port_no,
-                               hw_addr=p.hw_addr,
-                               config = 0 if flood else of.OFPPC_NO_FLOOD,
-                               mask = of.OFPPC_NO_FLOOD )
-          con.send(pm)
+          con.send(_port_mod(p, flood))
     if change_count:
       log.info("%i ports changed", change_count)
   except:
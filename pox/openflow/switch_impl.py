@@ -147,7 +147,12 @@ class SwitchImpl(EventMixin):
     """Handle flow mod: just print it here
     """
     self.log.debug("Flow mod %s: %s" % (self.name, ofp.show()))
-    self.table.process_flow_mod(ofp)
+    (result, entries) = self.table.process_flow_mod(ofp)
+    if result == "overlap":
+      # OFPFF_CHECK_OVERLAP add that overlaps an existing entry
+      self.send(ofp_error(xid=ofp.xid, type=OFPET_FLOW_MOD_FAILED, code=OFPFMFC_OVERLAP,
+                          data=[ord(c) for c in ofp.pack()[:64]]))
+      return
     if(ofp.buffer_id > 0):
       self._process_actions_for_packet_from_buffer(ofp.actions, ofp.buffer_id)
 
@@ -0,0 +1,227 @@
+#!/usr/bin/env python
+"""
+Benchmark for FlowTable lookups and queries
+
+Fills a FlowTable with rules like a reactive controller installs (mostly
+exact matches, plus a few wildcarded rules with a handful of different
+masks) and reports lookups per second through the table's index and
+through a linear scan of the entries (how entry_for_packet used to work).
+It also reports how long filling the table took.
+
+Then it runs the kinds of queries flow_mods and flow stats requests make
+(strict and non-strict, with and without out_port), again both through
+the table and by checking every entry, and finally applies a mix of
+MODIFY/DELETE flow_mods and OFPFF_CHECK_OVERLAP adds.  Try it with
+-R 50000.
+"""
+
+from optparse import OptionParser
+import random
+import timeit
+import time
+import sys
+import os.path
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "../.."))
+sys.path.append(ROOT)
+
+from pox.lib.addresses import EthAddr, IPAddr
+from pox.lib.packet.ethernet import ethernet
+from pox.lib.packet.ipv4 import ipv4
+from pox.lib.packet.tcp import tcp
+from pox.openflow.flow_table import SwitchFlowTable, TableEntry
+import pox.openflow.libopenflow_01 as of
+
+def make_packet (r, hosts):
+  """
+  Returns (packet, in_port) for a TCP packet between two random hosts
+  """
+  src = r.randint(1, hosts)
+  dst = r.randint(1, hosts)
+  t = tcp(srcport=10000 + dst, dstport=80)
+  p = ipv4(srcip=IPAddr("10.%i.%i.%i" % (src >> 16, (src >> 8) & 0xff,
+                                         src & 0xff)),
+           dstip=IPAddr("10.%i.%i.%i" % (dst >> 16, (dst >> 8) & 0xff,
+                                         dst & 0xff)),
+           protocol=ipv4.TCP_PROTOCOL, payload=t)
+  e = ethernet(src=EthAddr("00:00:00:%02x:%02x:%02x" % (src >> 16,
+                           (src >> 8) & 0xff, src & 0xff)),
+               dst=EthAddr("00:00:00:%02x:%02x:%02x" % (dst >> 16,
+                           (dst >> 8) & 0xff, dst & 0xff)),
+               type=ethernet.IP_TYPE, payload=p)
+  return (e, src % 48 + 1)
+
+def make_table (rules, hosts, r):
+  """
+  Returns a FlowTable with about the given number of rules
+
+  One in ten are wildcarded: per-destination-subnet rules, per-port rules
+  and a table-miss rule.
+  """
+  table = SwitchFlowTable()
+  for i in range(rules - rules / 10):
+    (packet, in_port) = make_packet(r, hosts)
+    table.add_entry(TableEntry(priority=100, idle_timeout=10,
+        match=of.ofp_match.from_packet(packet, in_port),
+        actions=[of.ofp_action_output(port=r.randint(1, 48))]))
+  for i in range(rules / 10):
+    kind = i % 3
+    if kind == 0:
+      match = of.ofp_match(dl_type=0x800,
+                           nw_dst="10.%i.%i.0/24" % (i % 4, (i >> 2) & 0xff))
+    elif kind == 1:
+      match = of.ofp_match(in_port=i % 48 + 1, dl_type=0x800, nw_proto=6,
+                           tp_dst=1024 + i)
+    else:
+      match = of.ofp_match(dl_type=0x800, nw_src="10.%i.0.0/16" % (i % 4,),
+                           nw_proto=6)
+    table.add_entry(TableEntry(priority=r.choice((10, 20, 30)),
+                               match=match, actions=[]))
+  table.add_entry(TableEntry(priority=0, match=of.ofp_match(), actions=[]))
+  return table
+
+def linear_lookup (table, packet_match):
+  for entry in table.entries:
+    if entry.match.compile().covers(packet_match):
+      return entry
+  return None
+
+def make_queries (table, r):
+  """
+  Returns [(name, [(match, priority, strict, out_port), ...])]
+  """
+  exact = [e for e in table.entries if not e.match.is_wildcarded]
+  def some (f):
+    return [f(i) for i in range(20)]
+  return [
+    ("strict", some(lambda i: (r.choice(exact).match, 100, True, None))),
+    ("in_port", some(lambda i: (of.ofp_match(in_port=i + 1), 0, False,
+                                None))),
+    ("nw_dst/24", some(lambda i: (of.ofp_match(dl_type=0x800,
+                                               nw_dst="10.0.%i.0/24" % i),
+                                  0, False, None))),
+    ("out_port", some(lambda i: (of.ofp_match(), 0, False, i + 1))),
+    ("in_port+out_port", some(lambda i: (of.ofp_match(in_port=i + 1), 0,
+                                         False, i + 2))),
+  ]
+
+def run_queries (table, queries, repeat, linear):
+  """
+  Returns queries per second (the best of several runs)
+  """
+  if linear:
+    def query ():
+      for (match, priority, strict, out_port) in queries:
+        [e for e in table.entries
+         if e.is_matched_by(match, priority, strict, out_port)]
+  else:
+    def query ():
+      for (match, priority, strict, out_port) in queries:
+        table.matching_entries(match, priority, strict, out_port)
+  t = min(timeit.Timer(query).repeat(repeat, 1))
+  return len(queries) / t
+
+def run_flow_mods (table, r, count, hosts):
+  """
+  Applies a mix of flow_mods, returning flow_mods per second
+  """
+  exact = [e for e in table.entries if not e.match.is_wildcarded]
+  mods = []
+  for i in range(count):
+    kind = i % 6
+    if kind == 0:
+      e = r.choice(exact)
+      mods.append(of.ofp_flow_mod(command=of.OFPFC_MODIFY_STRICT,
+          match=e.match, priority=e.priority,
+          actions=[of.ofp_action_output(port=1)]))
+    elif kind == 1:
+      mods.append(of.ofp_flow_mod(command=of.OFPFC_MODIFY,
+          match=of.ofp_match(in_port=r.randint(1, 48)),
+          actions=[of.ofp_action_output(port=2)]))
+    elif kind == 2:
+      e = r.choice(exact)
+      mods.append(of.ofp_flow_mod(command=of.OFPFC_DELETE_STRICT,
+                                  match=e.match, priority=e.priority))
+    elif kind == 3:
+      mods.append(of.ofp_flow_mod(command=of.OFPFC_DELETE,
+          match=of.ofp_match(dl_type=0x800,
+                             nw_src="10.0.%i.0/24" % r.randint(0, 255))))
+    elif kind == 4:
+      (packet, in_port) = make_packet(r, hosts)
+      mods.append(of.ofp_flow_mod(priority=100, flags=of.OFPFF_CHECK_OVERLAP,
+          match=of.ofp_match.from_packet(packet, in_port),
+          actions=[of.ofp_action_output(port=3)]))
+    else:
+      mods.append(of.ofp_flow_mod(priority=r.choice((10, 20, 30)),
+          flags=of.OFPFF_CHECK_OVERLAP,
+          match=of.ofp_match(in_port=r.randint(1, 48), dl_type=0x800,
+                             nw_proto=6, tp_dst=r.randint(1024, 2048)),
+          actions=[]))
+  start = time.time()
+  for mod in mods:
+    table.process_flow_mod(mod)
+  return count / (time.time() - start)
+
+def run (table, packets, number, repeat, linear):
+  """
+  Returns lookups per second (the best of several runs)
+  """
+  matches = [of.ofp_match.from_packet(p, in_port).compile()
+             for (p, in_port) in packets]
+  if linear:
+    def lookup ():
+      for m in matches:
+        linear_lookup(table, m)
+  else:
+    index = table._index
+    def lookup ():
+      for m in matches:
+        index.lookup(m)
+  t = min(timeit.Timer(lookup).repeat(repeat, number))
+  return number * len(matches) / t
+
+def main ():
+  parser = OptionParser(usage="usage: %prog [-R rules] [-p packets]")
+  parser.add_option("-R", "--rules", type="int", default=10000,
+                    help="number of rules in the table")
+  parser.add_option("-H", "--hosts", type="int", default=1000,
+                    help="number of hosts the rules and packets are for")
+  parser.add_option("-p", "--packets", type="int", default=1000,
+                    help="number of packets to look up")
+  parser.add_option("-n", "--number", type="int", default=3,
+                    help="times to go through the packets")
+  parser.add_option("-r", "--repeat", type="int", default=3,
+                    help="runs (the best is reported)")
+  parser.add_option("-m", "--flow-mods", type="int", default=1000,
+                    help="number of flow_mods to apply")
+  parser.add_option("--no-linear", action="store_false", dest="linear",
+                    default=True, help="skip the (slow) linear scans")
+  (options, args) = parser.parse_args()
+
+  r = random.Random(1)
+  start = time.time()
+  table = make_table(options.rules, options.hosts, r)
+  print "%i entries, %i masks, added in %.2fs" % (len(table),
+      len(table._index), time.time() - start)
+  packets = [make_packet(r, options.hosts) for i in range(options.packets)]
+  print "%-24s %14s" % ("", "lookups/s")
+  print "%-24s %14.0f" % ("indexed", run(table, packets, options.number,
+                                          options.repeat, False))
+  if options.linear:
+    print "%-24s %14.0f" % ("linear", run(table, packets, options.number,
+                                         options.repeat, True))
+
+  print
+  print "%-24s %14s %14s" % ("", "queries/s", "linear")
+  for (name, queries) in make_queries(table, r):
+    print "%-24s %14.0f %14s" % (name,
+        run_queries(table, queries, options.repeat, False),
+        "%.0f" % run_queries(table, queries, 1, True) if options.linear
+        else "-")
+
+  print
+  print "%-24s %14.0f" % ("flow_mods/s", run_flow_mods(table, r,
+      options.flow_mods, options.hosts))
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,109 @@
+#!/usr/bin/env python
+"""
+Microbenchmark for the OpenFlow 1.0 codecs
+
+Reports pack/unpack throughput in msgs/sec for the ten message types a
+controller sees most.  Use --compare=<git rev> to load the libopenflow_01
+from that revision as well and show before/after numbers side by side.
+"""
+
+from optparse import OptionParser
+import subprocess
+import timeit
+import imp
+import sys
+import os.path
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "../.."))
+sys.path.append(ROOT)
+
+import pox.openflow.libopenflow_01
+from pox.lib.addresses import EthAddr, IPAddr
+
+def make_messages (of):
+  """
+  Returns [(name, message)] for the ten most common message types
+  """
+  match = of.ofp_match(in_port=3, dl_src=EthAddr("00:11:22:33:44:55"),
+                       dl_dst=EthAddr("66:77:88:99:aa:bb"), dl_type=0x800,
+                       nw_proto=6, nw_src=IPAddr("10.0.0.1"),
+                       nw_dst=IPAddr("10.0.0.2"), tp_src=1234, tp_dst=80)
+  actions = [of.ofp_action_output(port=4)]
+  data = "\x00" * 128
+  flow_stats = [of.ofp_flow_stats(match=match, actions=actions)
+                for i in range(10)]
+  for fs in flow_stats:
+    fs.length = len(fs)
+  port = of.ofp_phy_port(port_no=3, hw_addr=EthAddr("00:00:00:00:00:03"),
+                         name="eth3")
+  return [
+    ('hello', of.ofp_hello()),
+    ('echo_request', of.ofp_echo_request()),
+    ('barrier_request', of.ofp_barrier_request()),
+    ('packet_in', of.ofp_packet_in(in_port=3, buffer_id=12, data=data)),
+    ('packet_out', of.ofp_packet_out(in_port=3, data=data, actions=actions)),
+    ('flow_mod', of.ofp_flow_mod(match=match, actions=actions,
+                                 idle_timeout=10, buffer_id=12)),
+    ('flow_removed', of.ofp_flow_removed(match=match, cookie=1,
+                                         packet_count=10, byte_count=1000)),
+    ('port_status', of.ofp_port_status(reason=2, desc=port)),
+    ('stats_request', of.ofp_stats_request(
+        body=of.ofp_flow_stats_request(match=match))),
+    ('stats_reply', of.ofp_stats_reply(type=of.OFPST_FLOW,
+                                       body=flow_stats)),
+  ]
+
+def run (of, number, repeat):
+  """
+  Returns {name: (pack msgs/sec, unpack msgs/sec)}
+
+  Uses the best of several runs, which is the least noisy estimate.
+  """
+  results = {}
+  for name, msg in make_messages(of):
+    raw = msg.pack()
+    t = min(timeit.Timer(msg.pack).repeat(repeat, number))
+    cls = type(msg)
+    def unpack ():
+      cls().unpack(raw)
+    u = min(timeit.Timer(unpack).repeat(repeat, number))
+    results[name] = (number / t, number / u)
+  return results
+
+def load_revision (rev):
+  src = subprocess.check_output(["git", "show",
+      rev + ":pox/openflow/libopenflow_01.py"], cwd=ROOT)
+  mod = imp.new_module("libopenflow_01_" + rev.replace('~','_'))
+  exec src in mod.__dict__
+  return mod
+
+def main ():
+  parser = OptionParser(usage="usage: %prog [-n number] [--compare=<rev>]")
+  parser.add_option("-n", "--number", type="int", default=20000,
+                    help="iterations per message type")
+  parser.add_option("-r", "--repeat", type="int", default=5,
+                    help="runs per message type (the best is reported)")
+  parser.add_option("-c", "--compare", dest="rev", default=None,
+                    help="also benchmark libopenflow_01 at this git revision")
+  (options, args) = parser.parse_args()
+
+  after = run(pox.openflow.libopenflow_01, options.number, options.repeat)
+  before = None
+  if options.rev:
+    before = run(load_revision(options.rev), options.number,
+                 options.repeat)
+
+  names = [n for n,m in make_messages(pox.openflow.libopenflow_01)]
+  if before is None:
+    print "%-16s %14s %14s" % ("message", "pack/s", "unpack/s")
+    for n in names:
+      print "%-16s %14.0f %14.0f" % ((n,) + after[n])
+  else:
+    print "%-16s %12s %12s %12s %12s" % ("message", "pack/s before",
+        "pack/s after", "unpack/s bef", "unpack/s aft")
+    for n in names:
+      print "%-16s %12.0f %12.0f %12.0f %12.0f" % (n, before[n][0],
+          after[n][0], before[n][1], after[n][1])
+
+if __name__ == '__main__':
+  main()
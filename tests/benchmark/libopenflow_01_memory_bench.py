@@ -0,0 +1,162 @@
+#!/usr/bin/env python
+"""
+Memory benchmark for long-lived OpenFlow structures
+
+Builds 100k each of ofp_match, ofp_action_output and ofp_flow_stats and
+reports the bytes they take.  "object" counts each instance and its
+__dict__ (if it has one) as measured by sys.getsizeof; "rss" is the growth
+of the process's resident set while building them (Linux only).  Field
+values are shared between instances so that only the containers are
+measured.
+
+It then decodes a flow stats reply with the same number of entries for
+traffic among a few hosts, and reports the garbage collector-tracked
+objects and distinct address objects the entries keep alive, and how long
+a full collection then takes.
+
+Use --compare=<git rev> to measure that revision's libopenflow_01 as well.
+"""
+
+from optparse import OptionParser
+import time
+import gc
+import sys
+import os.path
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "../.."))
+sys.path.append(ROOT)
+
+import pox.openflow.libopenflow_01
+from pox.lib.addresses import EthAddr, IPAddr
+from libopenflow_01_bench import load_revision
+
+def rss ():
+  try:
+    with open("/proc/self/statm") as f:
+      return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+  except (IOError, OSError):
+    return 0
+
+def object_size (o):
+  size = sys.getsizeof(o)
+  d = getattr(o, '__dict__', None)
+  if d is not None:
+    size += sys.getsizeof(d)
+  return size
+
+def make_builders (of):
+  src = EthAddr("00:11:22:33:44:55")
+  dst = EthAddr("66:77:88:99:aa:bb")
+  ip = IPAddr("10.0.0.1")
+  def match ():
+    return of.ofp_match(in_port=3, dl_src=src, dl_dst=dst, dl_type=0x800,
+                        nw_proto=6, nw_src=ip, tp_dst=80)
+  def action ():
+    return of.ofp_action_output(port=4)
+  def flow_stats ():
+    return of.ofp_flow_stats(packet_count=10, byte_count=1000)
+  return [('ofp_match', match), ('ofp_action_output', action),
+          ('ofp_flow_stats', flow_stats)]
+
+def run (of, count):
+  """
+  Returns {name: (object bytes, rss bytes)} for count instances
+  """
+  results = {}
+  for name, build in make_builders(of):
+    gc.collect()
+    before = rss()
+    objs = [build() for i in xrange(count)]
+    grown = rss() - before
+    size = sum(object_size(o) for o in objs)
+    if name == 'ofp_flow_stats':
+      # Include the match each entry carries
+      size += sum(object_size(o.match) for o in objs)
+    results[name] = (size, grown)
+    del objs
+  return results
+
+def make_flow_stats_body (of, count, hosts):
+  """
+  Returns the packed body of a flow stats reply with count entries
+
+  Each entry matches traffic between two of the given number of hosts.
+  """
+  macs = [EthAddr("00:00:00:00:%02x:%02x" % (i >> 8, i & 0xff))
+          for i in range(hosts)]
+  ips = [IPAddr("10.0.%i.%i" % (i >> 8, i & 0xff)) for i in range(hosts)]
+  actions = [of.ofp_action_output(port=4)]
+  parts = []
+  for n in xrange(count):
+    i, j = n % hosts, (n // hosts) % hosts
+    match = of.ofp_match(in_port=3, dl_src=macs[i], dl_dst=macs[j],
+                         dl_type=0x800, nw_proto=6, nw_src=ips[i],
+                         nw_dst=ips[j], tp_src=1234, tp_dst=n & 0xffff)
+    fs = of.ofp_flow_stats(match=match, actions=actions)
+    fs.length = len(fs)
+    parts.append(fs.pack())
+  return b''.join(parts)
+
+def run_decode (of, count, hosts):
+  """
+  Returns (tracked objects, address objects, gc seconds, rss bytes) for
+  the entries decoded from a flow stats body with count entries
+  """
+  body = make_flow_stats_body(of, count, hosts)
+  gc.collect()
+  tracked = len(gc.get_objects())
+  before = rss()
+  entries = []
+  while body:
+    fs = of.ofp_flow_stats()
+    body = fs.unpack(body)
+    entries.append(fs)
+  grown = rss() - before
+  tracked = len(gc.get_objects()) - tracked
+  addrs = set()
+  for fs in entries:
+    m = fs.match
+    addrs.update((id(m.dl_src), id(m.dl_dst), id(m.nw_src), id(m.nw_dst)))
+  start = time.time()
+  gc.collect()
+  collect = time.time() - start
+  del entries
+  return (tracked, len(addrs), collect, grown)
+
+def main ():
+  parser = OptionParser(usage="usage: %prog [-n count] [--compare=<rev>]")
+  parser.add_option("-n", "--number", type="int", default=100000,
+                    help="instances of each structure")
+  parser.add_option("-H", "--hosts", type="int", default=100,
+                    help="hosts the decoded flow stats entries are between")
+  parser.add_option("-c", "--compare", dest="rev", default=None,
+                    help="also measure libopenflow_01 at this git revision")
+  (options, args) = parser.parse_args()
+
+  runs = []
+  if options.rev:
+    old = load_revision(options.rev)
+    runs.append((options.rev, run(old, options.number),
+                 run_decode(old, options.number, options.hosts)))
+  of = pox.openflow.libopenflow_01
+  runs.append(("current", run(of, options.number),
+               run_decode(of, options.number, options.hosts)))
+
+  print "bytes per %i instances" % (options.number,)
+  print "%-10s %-18s %14s %14s" % ("revision", "structure", "object", "rss")
+  for rev, results, decoded in runs:
+    for name, build in make_builders(pox.openflow.libopenflow_01):
+      print "%-10s %-18s %14i %14i" % ((rev, name) + results[name])
+
+  print
+  print "decoding a flow stats reply with %i entries among %i hosts" % (
+      options.number, options.hosts)
+  print "%-10s %14s %14s %14s %14s" % ("revision", "gc objects",
+                                       "addresses", "gc.collect ms", "rss")
+  for rev, results, decoded in runs:
+    tracked, addrs, collect, grown = decoded
+    print "%-10s %14i %14i %14.1f %14i" % (rev, tracked, addrs,
+                                           collect * 1000, grown)
+
+if __name__ == '__main__':
+  main()
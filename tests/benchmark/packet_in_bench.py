@@ -0,0 +1,121 @@
+#!/usr/bin/env python
+"""
+Benchmark for PacketIn handling
+
+Feeds a mix of PacketIns through l2_learning and discovery's PacketIn
+handler on a fake connection, and reports PacketIns handled per second.
+Use --parse to also make every packet get fully parsed by pox.lib.packet
+(as happened for every PacketIn before PacketHeaders) for a comparison.
+"""
+
+from optparse import OptionParser
+import timeit
+import sys
+import os.path
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "../.."))
+sys.path.append(ROOT)
+
+from pox.lib.revent import *
+from pox.lib.addresses import EthAddr, IPAddr
+from pox.lib.packet.ethernet import ethernet
+from pox.lib.packet.ipv4 import ipv4
+from pox.lib.packet.tcp import tcp
+from pox.lib.packet.arp import arp
+from pox.openflow import PacketIn
+from pox.openflow.discovery import Discovery
+from pox.forwarding.l2_learning import LearningSwitch
+import pox.openflow.libopenflow_01 as of
+
+class FakeConnection (EventMixin):
+  """
+  Just enough of a Connection for the forwarding components
+  """
+  _eventMixin_events = set([PacketIn])
+
+  def __init__ (self, dpid):
+    self.dpid = dpid
+    self.connect_time = 0 # Long enough ago to flood
+    self.sent = 0
+
+  def send (self, data):
+    if type(data) is not bytes:
+      data = data.pack()
+    self.sent += 1
+
+def make_packet_ins (hosts):
+  """
+  Returns a list of ofp_packet_ins for traffic among some hosts
+
+  Each host sends a TCP packet to each other host, with ARP and broadcast
+  traffic mixed in.
+  """
+  macs = [EthAddr("00:00:00:00:%02x:%02x" % (i >> 8, i & 0xff))
+          for i in range(1, hosts + 1)]
+  ips = [IPAddr("10.0.%i.%i" % (i >> 8, i & 0xff))
+         for i in range(1, hosts + 1)]
+  msgs = []
+  for i in range(hosts):
+    a = arp(opcode=arp.REQUEST, hwsrc=macs[i], protosrc=ips[i],
+            protodst=ips[(i + 1) % hosts])
+    e = ethernet(src=macs[i], dst=EthAddr("ff:ff:ff:ff:ff:ff"),
+                 type=ethernet.ARP_TYPE, payload=a)
+    msgs.append((i, e))
+    for j in range(hosts):
+      if i == j: continue
+      t = tcp(srcport=10000 + j, dstport=80)
+      p = ipv4(srcip=ips[i], dstip=ips[j], protocol=ipv4.TCP_PROTOCOL,
+               payload=t)
+      e = ethernet(src=macs[i], dst=macs[j], type=ethernet.IP_TYPE,
+                   payload=p)
+      msgs.append((i, e))
+  return [of.ofp_packet_in(in_port=i + 1, buffer_id=n, data=e.pack())
+          for n, (i, e) in enumerate(msgs)]
+
+def setup (parse):
+  """
+  Returns a connection with the forwarding components listening to it
+  """
+  con = FakeConnection(1)
+  LearningSwitch(con, False)
+  # A Discovery without its timers or LLDP sender, just for its handler
+  discovery = Discovery.__new__(Discovery)
+  con.addListener(PacketIn, discovery._handle_PacketIn)
+  if parse:
+    con.addListener(PacketIn, lambda event: event.parsed)
+  return con
+
+def run (packet_ins, number, repeat, parse):
+  """
+  Returns PacketIns handled per second (the best of several runs)
+  """
+  con = setup(parse)
+  def handle ():
+    for msg in packet_ins:
+      con.raiseEventNoErrors(PacketIn, con, msg)
+  handle() # Warm up the MAC table
+  t = min(timeit.Timer(handle).repeat(repeat, number))
+  return number * len(packet_ins) / t
+
+def main ():
+  parser = OptionParser(usage="usage: %prog [-n number] [--parse]")
+  parser.add_option("-n", "--number", type="int", default=50,
+                    help="times to go through the PacketIns")
+  parser.add_option("-r", "--repeat", type="int", default=5,
+                    help="runs (the best is reported)")
+  parser.add_option("-H", "--hosts", type="int", default=20,
+                    help="number of hosts sending traffic")
+  parser.add_option("-p", "--parse", action="store_true", default=False,
+                    help="also fully parse every packet, for comparison")
+  (options, args) = parser.parse_args()
+
+  packet_ins = make_packet_ins(options.hosts)
+  print "%-24s %14s" % ("", "packet_ins/s")
+  print "%-24s %14.0f" % ("headers only", run(packet_ins, options.number,
+                                             options.repeat, False))
+  if options.parse:
+    print "%-24s %14.0f" % ("with full parse", run(packet_ins,
+        options.number, options.repeat, True))
+
+if __name__ == '__main__':
+  main()
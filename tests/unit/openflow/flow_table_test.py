@@ -13,6 +13,7 @@ import unittest
 import sys
 import os.path
 import itertools
+import random
 
 sys.path.append(os.path.dirname(__file__) + "/../../..")
 from pox.openflow.libopenflow_01 import *
@@ -20,6 +21,38 @@ from pox.openflow.flow_table import *
 from pox.openflow import *
 from pox.openflow.topology import *
 
+MACS = [EthAddr("00:00:00:00:00:0%d" % i) for i in range(1, 4)]
+MATCH_FIELDS = ('in_port', 'dl_src', 'dl_type', 'nw_src', 'nw_dst', 'nw_proto', 'tp_dst')
+
+def random_match(r, wildcarded=None):
+  """ a match with values from small ranges (so that matches often overlap), with the given number of MATCH_FIELDS
+  (or a random number of them) wildcarded """
+  m = ofp_match(in_port=r.randint(1, 3), dl_src=r.choice(MACS), dl_type=0x800,
+                nw_src="10.%d.%d.%d/%d" % (r.randint(0, 1), r.randint(0, 1), r.randint(0, 1), r.choice((8, 16, 24, 32))),
+                nw_dst="10.0.0.%d" % r.randint(0, 3), nw_proto=r.choice((6, 17)), tp_dst=r.choice((80, 443)))
+  if wildcarded is None:
+    wildcarded = r.randint(0, len(MATCH_FIELDS))
+  for f in r.sample(MATCH_FIELDS, wildcarded):
+    setattr(m, f, None)
+  return m
+
+def random_packet(r):
+  """ a (packet, in_port) from the same ranges as random_match """
+  t = (tcp if r.random() < 0.5 else udp)(srcport=1, dstport=r.choice((80, 443)))
+  ip = ipv4(srcip=IPAddr("10.%d.%d.%d" % (r.randint(0, 1), r.randint(0, 1), r.randint(0, 1))), dstip=IPAddr("10.0.0.%d" % r.randint(0, 3)),
+            protocol=ipv4.TCP_PROTOCOL if isinstance(t, tcp) else ipv4.UDP_PROTOCOL, payload=t)
+  return (ethernet(src=r.choice(MACS), dst=MACS[0], type=ethernet.IP_TYPE, payload=ip), r.randint(1, 3))
+
+def overlaps(a, b):
+  """ whether some packet could match both a and b """
+  a = a.compile()
+  b = b.compile()
+  return (a.value ^ b.value) & a.mask & b.mask == 0
+
+def scan(table, predicate):
+  """ the brute-force answer for the indexed queries: the entries, in table order, that predicate holds for """
+  return [e for e in table.entries if predicate(e)]
+
 class TableEntryTest(unittest.TestCase):
   def test_create(self):
     e = TableEntry(priority=5, cookie=0xDEADBEEF, match=ofp_match(), actions=[ofp_action_output(port=1)])
@@ -83,6 +116,25 @@ class FlowTableTest(unittest.TestCase):
       t.remove_matching_entries(match, priority=priority, strict=strict)
       self.assertEqual([e.cookie for e in t._table], remaining)
 
+  def test_matching_entries(self):
+    """ test that indexed non-strict queries agree with checking every entry """
+    r = random.Random(11)
+    t = FlowTable()
+    for i in range(300):
+      t.add_entry(TableEntry(priority=r.randint(1, 5), cookie=i, match=random_match(r, r.randint(1, 5)),
+                             actions=[ofp_action_output(port=p) for p in r.sample((1, 2, 3, 4), r.randint(0, 2))]))
+    queries = [(random_match(r, r.randint(4, 7)), r.choice((None, None, 2, OFPP_NONE))) for i in range(30)]
+    for i in range(3):
+      for (match, out_port) in queries:
+        port = None if out_port == OFPP_NONE else out_port
+        self.assertEqual(t.matching_entries(match, out_port=out_port), scan(t, lambda e: e.is_matched_by(match, out_port=port)))
+      for e in r.sample(t.entries, 50):
+        t.remove_entry(e)
+      for e in r.sample(t.entries, 50):
+        t.set_actions(e, [ofp_action_output(port=2)])
+      for j in range(50):
+        t.add_entry(TableEntry(priority=r.randint(1, 5), match=random_match(r, r.randint(1, 5)), actions=[ofp_action_output(port=2)]))
+
   def test_remove_expired_entries(self):
     """ test that flow can get expired as time passes """
     t = FlowTable()
@@ -101,6 +153,92 @@ class FlowTableTest(unittest.TestCase):
       t.remove_expired_entries(now=time)
       self.assertEqual([e.cookie for e in t.entries ], remaining)
 
+  def test_expiry(self):
+    """ test that expiry finds the same entries as checking every entry, in one event per call """
+    r = random.Random(3)
+    t = FlowTable()
+    seen_ft_events = []
+    t.addListener(FlowTableModification, lambda(event): seen_ft_events.append(event))
+    t.add_entries([TableEntry(now=0, cookie=i, idle_timeout=r.choice((0, 5, 10)), hard_timeout=r.choice((0, 20, 30)),
+                              match=ofp_match(in_port=i)) for i in range(300)])
+    entries = list(t.entries)
+    for now in range(1, 40):
+      for e in r.sample(t.entries, min(len(t), 20)):
+        e.touch_packet(1, now=now - 0.5)
+      expected = scan(t, lambda e: e.is_expired(now))
+      self.assertEqual(t.expired_entries(now=now), expected)
+      self.assertEqual(t.remove_expired_entries(now=now), expected)
+      self.assertEqual(seen_ft_events[-1].removed, expected)
+      self.assertEqual(len(seen_ft_events), now + 1)
+      self.assertEqual(scan(t, lambda e: e.is_expired(now)), [])
+    t.remove_expired_entries(now=1000)
+    self.assertEqual(t.entries, [e for e in entries if e.hard_timeout == 0 and e.idle_timeout == 0])
+
+  def test_order(self):
+    """ test that entries are kept by descending priority, exact matches first, then in the order they were added """
+    r = random.Random(7)
+    exact = ofp_match(in_port=1, dl_src=EthAddr("00:00:00:00:00:01"), dl_dst=EthAddr("00:00:00:00:00:02"), dl_vlan=1, dl_vlan_pcp=0,
+                      dl_type=0x800, nw_tos=0, nw_proto=6, nw_src="1.2.3.4", nw_dst="1.2.3.5", tp_src=1, tp_dst=2)
+    entries = [TableEntry(priority=r.choice((1, 5, 10)), cookie=i, match=exact if r.random() < 0.2 else ofp_match(in_port=i))
+               for i in range(100)]
+    expected = sorted(entries, key=lambda(e): (e.priority if e.match.is_wildcarded else (1<<16) + 1), reverse=True)
+
+    t = FlowTable()
+    for e in entries:
+      t.add_entry(e)
+    self.assertEqual([e.cookie for e in t.entries], [e.cookie for e in expected])
+
+    seen_ft_events = []
+    t = FlowTable()
+    t.addListener(FlowTableModification, lambda(event): seen_ft_events.append(event))
+    t.add_entries(entries)
+    self.assertEqual([e.cookie for e in t.entries], [e.cookie for e in expected])
+    self.assertEqual(len(seen_ft_events), 1)
+    self.assertEqual(seen_ft_events[0].added, entries)
+
+    for e in entries[::2]:
+      t.remove_entry(e)
+    self.assertEqual([e.cookie for e in t.entries], [e.cookie for e in expected if e.cookie % 2])
+    self.assertEqual(len(t), 50)
+    self.assertRaises(ValueError, t.remove_entry, entries[0])
+
+  def test_readd(self):
+    """ test that adding an entry already in the table replaces it rather than leaving a stale copy in the index """
+    t = FlowTable()
+    e = TableEntry(priority=5, cookie=1, match=ofp_match(in_port=1), actions=[ofp_action_output(port=2)])
+    other = TableEntry(priority=5, cookie=2, match=ofp_match(in_port=1))
+    t.add_entry(e)
+    t.add_entry(other)
+    t.add_entries([e])
+    self.assertEqual([x.cookie for x in t.entries], [2, 1])
+    self.assertEqual(len(t), 2)
+    t.remove_entry(e)
+    self.assertEqual(len(t), 1)
+    self.assertTrue(t.entry_for_packet(ethernet(), 1) is other)
+    self.assertEqual(t.matching_entries(ofp_match(in_port=1)), [other])
+    self.assertEqual(t.matching_entries(ofp_match(), out_port=2), [])
+    t.remove_entry(other)
+    self.assertEqual(t._index.lookup(ofp_match(in_port=1).compile()), None)
+
+  def test_entry_for_packet(self):
+    """ test that indexed lookups agree with a linear scan of the table """
+    r = random.Random(42)
+    def linear(t, packet, in_port):
+      packet_match = ofp_match.from_packet(packet, in_port).compile()
+      return (scan(t, lambda e: e.match.compile().covers(packet_match)) + [None])[0]
+
+    t = FlowTable()
+    for i in range(200):
+      t.add_entry(TableEntry(priority=r.choice((1, 5, 10)), cookie=i, match=random_match(r)))
+    packets = [random_packet(r) for i in range(300)]
+    self.assertTrue(any(linear(t, packet, in_port) is not None for (packet, in_port) in packets))
+    for (packet, in_port) in packets:
+      self.assertTrue(t.entry_for_packet(packet, in_port) is linear(t, packet, in_port))
+    for entry in r.sample(t.entries, 150):
+      t.remove_entry(entry)
+    for (packet, in_port) in packets:
+      self.assertTrue(t.entry_for_packet(packet, in_port) is linear(t, packet, in_port))
+
 class SwitchFlowTableTest(unittest.TestCase):
   def test_process_flow_mod_add(self):
     """ test that simple insertion of a flow works"""
@@ -156,6 +294,78 @@ class SwitchFlowTableTest(unittest.TestCase):
     self.assertEquals([e.cookie for e in t.entries if e.actions == [ofp_action_output(port=8)] ], [2])
     self.assertEquals(len(t.entries), 3)
 
+  def test_process_flow_mod_delete(self):
+    """ test that non-strict deletes remove every covered flow, and strict ones just the exact one """
+    def table():
+      t = SwitchFlowTable()
+      t.add_entry(TableEntry(priority=6, cookie=0x1, match=ofp_match(dl_src=EthAddr("00:00:00:00:00:01"),nw_src="1.2.3.4"), actions=[ofp_action_output(port=5)]))
+      t.add_entry(TableEntry(priority=5, cookie=0x2, match=ofp_match(dl_src=EthAddr("00:00:00:00:00:02"), nw_src="1.2.3.0/24"), actions=[ofp_action_output(port=6)]))
+      t.add_entry(TableEntry(priority=1, cookie=0x3, match=ofp_match(), actions=[]))
+      return t
+
+    t = table()
+    t.process_flow_mod(ofp_flow_mod(command = OFPFC_DELETE, match=ofp_match(nw_src="1.2.0.0/16")))
+    self.assertEquals([e.cookie for e in t.entries], [3])
+
+    t = table()
+    t.process_flow_mod(ofp_flow_mod(command = OFPFC_DELETE_STRICT, priority=5, match=ofp_match(nw_src="1.2.3.0/24")))
+    self.assertEquals([e.cookie for e in t.entries], [1, 2, 3])
+    t.process_flow_mod(ofp_flow_mod(command = OFPFC_DELETE_STRICT, priority=5, match=ofp_match(dl_src=EthAddr("00:00:00:00:00:02"), nw_src="1.2.3.0/24")))
+    self.assertEquals([e.cookie for e in t.entries], [1, 3])
+
+  def test_process_flow_mod_check_overlap(self):
+    """ test that OFPFF_CHECK_OVERLAP adds are refused if they overlap a flow of the same priority """
+    t = SwitchFlowTable()
+    t.process_flow_mod(ofp_flow_mod(priority=5, cookie=1, match=ofp_match(dl_type=0x800, nw_src="1.2.3.0/24")))
+    t.process_flow_mod(ofp_flow_mod(priority=6, cookie=2, match=ofp_match(dl_type=0x800, nw_dst="1.2.3.4")))
+    for (match, priority, overlapping) in (
+        (ofp_match(dl_type=0x800, nw_src="1.2.0.0/16"), 5, [1]), # covers flow 1
+        (ofp_match(dl_type=0x800, nw_src="1.2.3.4", tp_dst=80, nw_proto=6), 5, [1]), # covered by flow 1
+        (ofp_match(in_port=1), 6, [2]), # some packets match both
+        (ofp_match(dl_type=0x800, nw_src="1.2.4.0/24"), 5, []), # disjoint
+        (ofp_match(dl_type=0x806), 6, []), # disjoint
+        (ofp_match(dl_type=0x800, nw_src="1.2.3.0/24"), 4, []), # different priority
+        ):
+      self.assertEqual([e.cookie for e in t.overlapping_entries(match, priority)], overlapping)
+      (result, entries) = t.process_flow_mod(ofp_flow_mod(priority=priority, cookie=3, match=match, flags=OFPFF_CHECK_OVERLAP))
+      if overlapping:
+        self.assertEqual(result, "overlap")
+        self.assertEqual([e.cookie for e in entries], overlapping)
+        self.assertEqual(len(t), 2)
+      else:
+        self.assertEqual(result, "added")
+        self.assertEqual(len(t), 3)
+        t.process_flow_mod(ofp_flow_mod(command=OFPFC_DELETE_STRICT, priority=priority, match=match))
+        self.assertEqual(len(t), 2)
+
+  def test_check_overlap_random(self):
+    """ test that overlap checks agree with comparing against every flow """
+    r = random.Random(5)
+    t = SwitchFlowTable()
+    for i in range(200):
+      t.add_entry(TableEntry(priority=r.randint(1, 3), cookie=i, match=random_match(r)))
+    found = 0
+    for i in range(100):
+      match = random_match(r)
+      priority = r.randint(1, 3)
+      expected = scan(t, lambda e: e.priority == priority and overlaps(e.match, match))
+      self.assertEqual(t.overlapping_entries(match, priority), expected)
+      found += len(expected) != 0
+    self.assertTrue(found > 10)
+
+  def test_process_flow_mod_delete_out_port(self):
+    """ test that deletes with an out_port only remove flows that output to it """
+    t = SwitchFlowTable()
+    t.add_entry(TableEntry(priority=6, cookie=0x1, match=ofp_match(in_port=1), actions=[ofp_action_output(port=5)]))
+    t.add_entry(TableEntry(priority=5, cookie=0x2, match=ofp_match(in_port=2), actions=[ofp_action_output(port=6), ofp_action_output(port=5)]))
+    t.add_entry(TableEntry(priority=1, cookie=0x3, match=ofp_match(), actions=[ofp_action_output(port=6)]))
+    t.process_flow_mod(ofp_flow_mod(command = OFPFC_DELETE_STRICT, priority=6, match=ofp_match(in_port=1), out_port=6))
+    self.assertEquals([e.cookie for e in t.entries], [1, 2, 3])
+    t.process_flow_mod(ofp_flow_mod(command = OFPFC_DELETE, match=ofp_match(), out_port=5))
+    self.assertEquals([e.cookie for e in t.entries], [3])
+    t.process_flow_mod(ofp_flow_mod(command = OFPFC_DELETE, match=ofp_match(), out_port=OFPP_NONE))
+    self.assertEquals(len(t), 0)
+
 class MockSwitch(EventMixin):
   _eventMixin_events = [FlowRemoved, BarrierIn, SwitchConnectionUp, SwitchConnectionDown ]
   def __init__(self):
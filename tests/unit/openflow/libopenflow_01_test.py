@@ -1,6 +1,7 @@
 #!/usr/bin/env python
 
 import unittest
+import struct
 import sys
 import os.path
 from copy import copy
@@ -68,6 +69,118 @@ class ofp_match_test(unittest.TestCase):
       self.assertEquals(getattr(m, "get_"+attr)(), (None, 0), "get_%s for unset %s should return (None,0)" % (attr, attr))
       self.assertTrue( ((m.wildcards & bitmask) >> shift) >= 32)
 
+  def test_clone(self):
+    """ ofp_match: clone and copy give equal, independent matches """
+    m = ofp_match(in_port=1, dl_type=0x800, nw_proto=17, nw_src="10.0.0.0/8", tp_dst=53)
+    for c in (m.clone(), copy(m)):
+      self.assertEqual(c, m)
+      self.assertEqual(c.wildcards, m.wildcards)
+      c.tp_dst = 54
+      self.assertEqual(m.tp_dst, 53)
+    self.assertRaises(AttributeError, setattr, m, "no_such_field", 1)
+
+  def test_key(self):
+    """ ofp_match: key() is hashable and equal for equivalent matches """
+    full = ofp_match(in_port=1, dl_type=0x800, dl_src=EthAddr("00:00:00:00:00:01"), dl_vlan=5, nw_proto=6, nw_src="10.0.0.1", nw_dst="11.0.0.0/8", tp_src=12345, tp_dst=80)
+    for a, b in (
+        (ofp_match(), ofp_match()),
+        (ofp_match(dl_type=0x806, tp_dst=80), ofp_match(dl_type=0x806)),
+        (ofp_match(dl_type=0x800, nw_proto=89, tp_src=5), ofp_match(dl_type=0x800, nw_proto=89)),
+        (ofp_match(dl_type=0x800, nw_src="10.1.2.3/16"), ofp_match(dl_type=0x800, nw_src="10.1.0.0/16")),
+        (full, full.clone())):
+      self.assertEqual(a.key(), b.key())
+      self.assertEqual(hash(a.key()), hash(b.key()))
+
+    for a, b in (
+        (ofp_match(in_port=1), ofp_match(in_port=2)),
+        (ofp_match(in_port=0), ofp_match()),
+        (ofp_match(dl_type=0x800, nw_src="10.1.2.3/24"), ofp_match(dl_type=0x800, nw_src="10.1.3.3/24"))):
+      self.assertNotEqual(a.key(), b.key())
+
+    # survives a round trip through a flow_mod
+    fm = ofp_flow_mod()
+    fm.unpack(ofp_flow_mod(match=ofp_match(dl_type=0x806, nw_proto=1)).pack())
+    self.assertEqual(fm.match.key(), ofp_match(dl_type=0x806, nw_proto=1).key())
+
+    self.assertEqual(ofp_match.from_key(full.key()).key(), full.key())
+    self.assertEqual(len(set([full.key(), full.clone().key(), ofp_match().key()])), 2)
+
+  def test_compile(self):
+    """ ofp_match: compiled (value, mask) form """
+    m = ofp_match(in_port=1, dl_type=0x800, nw_src="10.0.0.0/8", tp_dst=80)
+    c = m.compile()
+    self.assertTrue(c is m.compile(), "compiled form should be cached")
+    self.assertTrue(c.covers(c))
+    self.assertTrue(ofp_match().compile().covers(c))
+    self.assertFalse(c.covers(ofp_match().compile()))
+
+    # the compiled form is invalidated by changes
+    m.in_port = 2
+    self.assertNotEqual(m.compile(), c)
+    self.assertEqual(m.compile(), ofp_match(in_port=2, dl_type=0x800, nw_src="10.0.0.0/8", tp_dst=80).compile())
+
+    packet = ofp_match(in_port=2, dl_type=0x800, nw_src="10.1.2.3", nw_dst="1.1.1.1", nw_proto=6, tp_src=1234, tp_dst=80).compile()
+    self.assertTrue(m.compile().covers(packet))
+    m.nw_src = "11.0.0.0/8"
+    self.assertFalse(m.compile().covers(packet))
+
+  def test_unpack_shares_addresses(self):
+    """ ofp_match: decoded matches share their address objects """
+    raw = ofp_match(dl_src=EthAddr("00:00:00:00:00:01"), dl_type=0x800, nw_src="10.0.0.1").pack()
+    a = ofp_match()
+    a.unpack(raw)
+    b = ofp_match()
+    b.unpack(raw)
+    self.assertEqual(a, b)
+    self.assertEqual(a.dl_src, EthAddr("00:00:00:00:00:01"))
+    self.assertEqual(a.nw_src, IPAddr("10.0.0.1"))
+    self.assertTrue(a.dl_src is b.dl_src)
+    self.assertTrue(a.nw_src is b.nw_src)
+
+  def test_from_raw(self):
+    """ ofp_match: from_raw() agrees with from_packet() """
+    def eth(payload, type=ethernet.IP_TYPE):
+      return ethernet(src=EthAddr("00:00:00:00:00:01"), dst=EthAddr("00:00:00:00:00:02"), type=type, payload=payload)
+    def ip(payload, protocol):
+      return ipv4(srcip=IPAddr("1.2.3.4"), dstip=IPAddr("1.2.3.5"), tos=0x10, protocol=protocol, payload=payload)
+    def with_ip_options(data):
+      # Add a 4 byte IP option (four NOPs) after the IP header at offset 14
+      vhl, tos, iplen = struct.unpack("!BBH", data[14:18])
+      return data[:14] + struct.pack("!BBH", vhl + 1, tos, iplen + 4) + data[18:34] + "\x01" * 4 + data[34:]
+
+    udp_packet = eth(ip(udp(srcport=1234, dstport=53, payload="haha"), ipv4.UDP_PROTOCOL)).pack()
+    packets = [
+        udp_packet,
+        with_ip_options(udp_packet),
+        eth(ip(tcp(srcport=4321, dstport=80), ipv4.TCP_PROTOCOL)).pack(),
+        eth(ip(icmp(type=8, code=0, payload="ping"), ipv4.ICMP_PROTOCOL)).pack(),
+        eth(ip("hello", 89)).pack(),
+        eth(vlan(id=42, pcp=5, eth_type=ethernet.IP_TYPE, payload=ip(udp(srcport=1, dstport=2), ipv4.UDP_PROTOCOL)), type=ethernet.VLAN_TYPE).pack(),
+        eth(arp(opcode=arp.REQUEST, hwsrc=EthAddr("00:00:00:00:00:01"), protosrc=IPAddr("1.2.3.4"), protodst=IPAddr("1.2.3.5")), type=ethernet.ARP_TYPE).pack(),
+        eth("payload", type=0x88cc).pack() ]
+
+    for data in packets:
+      for in_port in (None, 3):
+        raw = ofp_match.from_raw(data, in_port)
+        parsed = ofp_match.from_packet(ethernet(data), in_port)
+        self.assertEqual(raw, parsed, "%s should equal %s" % (raw.show(), parsed.show()))
+        self.assertEqual(raw.wildcards, parsed.wildcards)
+      self.assertEqual(ofp_match.from_raw(buffer(data), 1), ofp_match.from_raw(data, 1))
+
+    m = ofp_match.from_raw(with_ip_options(udp_packet))
+    self.assertEqual((m.nw_tos, m.nw_proto, m.tp_src, m.tp_dst), (0x10, 17, 1234, 53))
+
+    # truncated headers are wildcarded
+    m = ofp_match.from_raw(udp_packet[:30], 1)
+    self.assertEqual((m.in_port, m.dl_type, m.dl_vlan), (1, 0x800, OFP_VLAN_NONE))
+    self.assertEqual((m.nw_src, m.nw_proto, m.tp_src), (None, None, None))
+    self.assertEqual(ofp_match.from_raw(udp_packet[:36]).tp_src, None)
+
+    # so are the ports of IP fragments
+    fragment = udp_packet[:20] + "\x20\x00" + udp_packet[22:]
+    m = ofp_match.from_raw(fragment)
+    self.assertEqual((m.nw_proto, m.tp_src, m.tp_dst), (17, None, None))
+
   def test_match_with_wildcards(self):
     """ ofp_match: test the matches_with_wildcards method """
     def create(wildcards=(), **kw):
@@ -283,6 +396,83 @@ class ofp_command_test(unittest.TestCase):
             for (check_attr,val) in attrs.iteritems():
               self.assertEqual(getattr(unpacked, check_attr), val)
 
+  def test_unpack_from_offset(self):
+    """ unpack_from works in place on a memoryview and returns the next offset """
+    match = ofp_match(in_port=1, dl_type=0x0800, nw_proto=6, nw_src="10.0.0.1", tp_dst=80)
+    msgs = [ ofp_hello(xid=1),
+             ofp_flow_mod(xid=2, match=match, actions=self.some_actions[4]),
+             ofp_packet_out(xid=3, actions=self.some_actions[2], data="\x01" * 20),
+             ofp_echo_request(xid=4, body="ping"),
+             ofp_flow_mod(xid=5, match=match, actions=self.some_actions[2]) ]
+    raw = "junk" + "".join(m.pack() for m in msgs)
+    view = memoryview(bytearray(raw))
+
+    offset = 4
+    for m in msgs:
+      unpacked = type(m)()
+      end = unpacked.unpack_from(view, offset)
+      self.assertEqual(end, offset + len(m))
+      self.assertEqual(m, unpacked)
+      offset = end
+    self.assertEqual(offset, len(raw))
+
+  def test_unpack_from_truncated(self):
+    """ unpack_from leaves the offset alone if the buffer is too short """
+    packed = ofp_flow_mod(xid=1, actions=self.some_actions[1]).pack()
+    o = ofp_flow_mod()
+    self.assertEqual(o.unpack_from(packed[:40], 0), 0)
+    self.assertEqual(o.unpack(packed[:40]), packed[:40])
+
+  def test_unpack_flow_stats_body(self):
+    """ a body of several flow_stats entries decodes back to back """
+    entries = []
+    for actions in self.some_actions:
+      s = ofp_flow_stats(match=ofp_match(in_port=3), actions=actions, packet_count=5)
+      s.length = len(s)
+      entries.append(s)
+    body = buffer("".join(s.pack() for s in entries))
+
+    offset = 0
+    for s in entries:
+      unpacked = ofp_flow_stats()
+      offset = unpacked.unpack_from(body, offset)
+      self.assertEqual(s, unpacked)
+    self.assertEqual(offset, len(body))
+
+  def test_prepack(self):
+    """ prepack() gives the message's wire bytes with a new xid per pack """
+    fm = ofp_flow_mod(xid=7, match=ofp_match(in_port=3), actions=self.some_actions[2])
+    packed = fm.pack()
+    p = fm.prepack()
+    self.assertEqual(len(p), len(packed))
+    self.assertEqual(p.header_type, OFPT_FLOW_MOD)
+
+    a = p.pack()
+    b = p.pack()
+    self.assertNotEqual(extract_num(a, 4, 4), extract_num(b, 4, 4))
+    self.assertEqual(extract_num(b, 4, 4), p.xid)
+    for data in (a, b):
+      self.assertEqual(data[:4], packed[:4])
+      self.assertEqual(data[8:], packed[8:])
+    self.assertEqual(p.pack(xid=7), packed)
+
+    # unaffected by later changes to the message
+    fm.priority = 5
+    self.assertEqual(p.pack(xid=7), packed)
+
+  def test_flow_mod_template(self):
+    """ FlowModTemplate gives the same bytes as building the flow_mod """
+    def flow_mod(match=None, buffer_id=-1, port=1, xid=None):
+      actions = [ofp_action_dl_addr.set_dst(EthAddr("00:00:00:00:00:01")), ofp_action_output(port=port)]
+      return ofp_flow_mod(xid=xid, match=match or ofp_match(), buffer_id=buffer_id, idle_timeout=10, actions=actions)
+    t = FlowModTemplate(flow_mod())
+    match = ofp_match(in_port=3, dl_type=0x800, nw_src="10.0.0.1")
+    self.assertEqual(t.pack(xid=9), flow_mod(xid=9).pack())
+    self.assertEqual(t.pack(match=match, buffer_id=12, port=5, xid=10), flow_mod(match, 12, 5, 10).pack())
+    self.assertEqual(t.pack(match=match.pack(flow_mod=True), xid=11), flow_mod(match, xid=11).pack())
+    self.assertNotEqual(extract_num(t.pack(), 4, 4), extract_num(t.pack(), 4, 4))
+    self.assertRaises(RuntimeError, FlowModTemplate(ofp_flow_mod()).pack, port=1)
+
 class ofp_action_test(unittest.TestCase):
   def assert_packed_action(self, cls, packed, a_type, length):
     self.assertEqual(extract_num(packed, 0,2), a_type, "Action %s: expected type %d (but is %d)" % (cls, a_type, extract_num(packed, 0,2)))
@@ -0,0 +1,317 @@
+#!/usr/bin/env python
+
+import unittest
+import sys
+import os.path
+import socket
+import select
+from errno import EAGAIN
+
+sys.path.append(os.path.dirname(__file__) + "/../../..")
+
+from pox.core import core
+from pox.openflow.libopenflow_01 import *
+from pox.openflow.of_01 import *
+import pox.openflow.of_01 as of_01
+
+class MockSocket(object):
+  """
+  A non-blocking socket with data waiting to be read, which only takes
+  sends once writable is set
+  """
+  def __init__(self, data):
+    self.data = data
+    self.writable = False
+    self.sent = []
+    self.closed = False
+
+  def recv_into(self, buf, size):
+    if not self.data:
+      raise socket.error(EAGAIN, "Resource temporarily unavailable")
+    l = min(size, len(self.data))
+    buf[0:l] = self.data[:l]
+    self.data = self.data[l:]
+    return l
+
+  def send(self, data):
+    if not self.writable:
+      raise socket.error(EAGAIN, "Resource temporarily unavailable")
+    self.sent.append(str(data))
+    return len(data)
+
+  def shutdown(self, how):
+    pass
+
+  def close(self):
+    self.closed = True
+
+class MockTimer(object):
+  def __init__(self, seconds, callback, *args):
+    self.seconds = seconds
+    self.callback = callback
+    self.args = args
+    self.cancelled = False
+
+  def cancel(self):
+    self.cancelled = True
+
+  def fire(self):
+    self.callback(*self.args)
+
+class ConnectionTest(unittest.TestCase):
+  def test_throttle(self):
+    requests = b''.join(ofp_echo_request(xid=i).pack() for i in range(1, 2001))
+    sock = MockSocket(requests)
+    poller = SelectPoller()
+    c = Connection(sock, poller)
+    c.send_high_watermark = 1024
+    c.send_low_watermark = 256
+
+    # Each echo request queues a reply, so we should stop reading part way
+    self.assertTrue(c.read())
+    self.assertTrue(c._throttled)
+    self.assertTrue(len(sock.data) > 0, "should have stopped reading")
+    self.assertTrue(c.send_queue_depth > c.send_high_watermark)
+    self.assertFalse(c in poller._readers)
+
+    sock.writable = True
+    c._flush_send_queue()
+    self.assertEqual(c.send_queue_depth, 0)
+    self.assertFalse(c._throttled)
+    self.assertTrue(c in poller._readers)
+
+    self.assertTrue(c.read())
+    self.assertEqual(sock.data, b'')
+    sent = b''.join(sock.sent)
+    self.assertEqual(len(sent), len(ofp_hello().pack()) + len(requests))
+
+  def test_disconnect(self):
+    sock = MockSocket(b'')
+    poller = SelectPoller()
+    c = Connection(sock, poller)
+    # The hello couldn't be sent, so we're waiting for the socket to be writable
+    self.assertTrue(c in poller._writers)
+    c.disconnect()
+    self.assertTrue(sock.closed)
+    self.assertEqual(c.send_queue_depth, 0)
+    self.assertFalse(c in poller._readers or c in poller._writers)
+
+  def test_select_wakeup(self):
+    sock = MockSocket(b'')
+    poller = SelectPoller()
+    c = Connection(sock, poller)
+    poller.wait(5)
+    # A change while the task is waiting (e.g., data queued from another
+    # thread) has to wake it up so that it waits on the new lists
+    poller.modify(c, False, True)
+    self.assertTrue(poller._waker in select.select([poller._waker], [], [], 0)[0])
+    rlist, wlist, elist = poller.ready(([poller._waker], [], []))
+    self.assertEqual(rlist, [])
+    self.assertFalse(poller._waker in select.select([poller._waker], [], [], 0)[0])
+  def test_close(self):
+    sock = MockSocket(b'')
+    poller = SelectPoller()
+    c = Connection(sock, poller)
+    # As the OpenFlow task does when the switch closes the connection
+    poller.unregister(c)
+    c.close()
+    self.assertTrue(c.disconnected)
+    self.assertTrue(sock.closed)
+    c.send(ofp_hello())
+    poller.modify(c, True, True)
+    self.assertFalse(c in poller._readers or c in poller._writers)
+    if hasattr(select, 'epoll'):
+      poller = EPollPoller()
+      poller.modify(c, True, True)
+      self.assertEqual(poller._objs, {})
+
+class RequestTest(unittest.TestCase):
+  def setUp(self):
+    self.timers = []
+    core.callDelayed = self.callDelayed
+    self.sock = MockSocket(b'')
+    self.sock.writable = True
+    self.conn = Connection(self.sock, SelectPoller())
+
+  def tearDown(self):
+    del core.callDelayed
+
+  def callDelayed(self, seconds, callback, *args):
+    timer = MockTimer(seconds, callback, *args)
+    self.timers.append(timer)
+    return timer
+
+  def from_switch(self, *msgs):
+    self.sock.data += b''.join(msg.pack() for msg in msgs)
+    self.assertTrue(self.conn.read())
+
+  def port_stats(self, xid, ports, more):
+    return ofp_stats_reply(xid=xid, type=OFPST_PORT, flags=1 if more else 0,
+                           body=b''.join(ofp_port_stats(port_no=p).pack() for p in ports))
+
+  def test_reply(self):
+    c = self.conn
+    done = []
+    r = c.request(ofp_echo_request(), callback=done.append)
+    other = c.request(ofp_echo_request())
+    self.assertFalse(r.done)
+    self.from_switch(ofp_echo_reply(xid=r.xid))
+    self.assertTrue(r.done and r.ok)
+    self.assertEqual(r.reply.xid, r.xid)
+    self.assertEqual(done, [r])
+    self.assertFalse(other.done)
+
+  def test_error(self):
+    c = self.conn
+    r = c.request(ofp_barrier_request())
+    self.from_switch(ofp_error(xid=r.xid, type=OFPET_BAD_REQUEST, code=OFPBRC_BAD_TYPE))
+    self.assertTrue(r.done)
+    self.assertFalse(r.ok)
+    self.assertEqual((r.error.type, r.error.code), (OFPET_BAD_REQUEST, OFPBRC_BAD_TYPE))
+    self.assertEqual(r.reply, None)
+
+  def test_stats(self):
+    c = self.conn
+    r = c.request(ofp_stats_request(type=OFPST_PORT, body=ofp_port_stats_request()))
+    self.from_switch(self.port_stats(r.xid, [1, 2], True))
+    self.assertFalse(r.done)
+    self.from_switch(self.port_stats(r.xid, [3], False))
+    self.assertTrue(r.done and r.ok)
+    self.assertEqual(len(r.reply), 2)
+    self.assertEqual([s.port_no for s in r.stats], [1, 2, 3])
+    self.assertEqual(c._stats_in_progress, {})
+
+  def test_stats_interleaved(self):
+    c = self.conn
+    r1 = c.request(ofp_stats_request(type=OFPST_PORT, body=ofp_port_stats_request()))
+    r2 = c.request(ofp_stats_request(type=OFPST_PORT, body=ofp_port_stats_request()))
+    self.from_switch(self.port_stats(r1.xid, [1], True), self.port_stats(r2.xid, [5, 6], True),
+                     self.port_stats(r1.xid, [2], True), self.port_stats(r2.xid, [7], False))
+    self.assertFalse(r1.done)
+    self.assertTrue(r2.done)
+    self.assertEqual([s.port_no for s in r2.stats], [5, 6, 7])
+    self.from_switch(self.port_stats(r1.xid, [3], False))
+    self.assertEqual([s.port_no for s in r1.stats], [1, 2, 3])
+    self.assertEqual(c._stats_in_progress, {})
+
+  def test_stats_timeout(self):
+    c = self.conn
+    r1 = c.request(ofp_stats_request(type=OFPST_PORT, body=ofp_port_stats_request()))
+    r2 = c.request(ofp_stats_request(type=OFPST_PORT, body=ofp_port_stats_request()))
+    self.from_switch(self.port_stats(r1.xid, [1], True), self.port_stats(r2.xid, [5], True))
+    self.assertEqual(len(self.timers), 1)
+    self.assertTrue(abs(self.timers[0].seconds - c.stats_reply_timeout) < 1)
+    # The switch never sends the rest of r1
+    c._stats_in_progress[r1.xid][3] -= c.stats_reply_timeout
+    self.timers[0].fire()
+    self.assertEqual(c._stats_in_progress.keys(), [r2.xid])
+    self.assertEqual(r1.failed, "timeout")
+    self.assertFalse(r2.done)
+    # ...and checks again for r2
+    self.assertEqual(len(self.timers), 2)
+    self.from_switch(self.port_stats(r2.xid, [6], False))
+    self.assertEqual([s.port_no for s in r2.stats], [5, 6])
+    self.timers[1].fire()
+    self.assertEqual(len(self.timers), 2)
+
+  def test_timeout(self):
+    c = self.conn
+    r = c.request(ofp_echo_request(), timeout=5)
+    done = c.request(ofp_echo_request(), timeout=5)
+    self.assertEqual([t.seconds for t in self.timers], [5, 5])
+    self.from_switch(ofp_echo_reply(xid=done.xid))
+    self.assertTrue(self.timers[1].cancelled)
+    self.timers[0].fire()
+    self.assertTrue(r.done)
+    self.assertEqual(r.failed, "timeout")
+    self.assertFalse(r.ok)
+    # A late reply is ignored
+    self.from_switch(ofp_echo_reply(xid=r.xid))
+    self.assertEqual(r.reply, None)
+
+  def test_connection_down(self):
+    c = self.conn
+    r = c.request(ofp_echo_request())
+    c.request(ofp_stats_request(type=OFPST_PORT, body=ofp_port_stats_request()))
+    self.from_switch(self.port_stats(r.xid + 1, [1], True))
+    self.assertEqual(len(c._stats_in_progress), 1)
+    # As the OpenFlow task does when the switch closes the connection
+    c.close()
+    self.assertTrue(r.done)
+    self.assertEqual(r.failed, "disconnected")
+    self.assertEqual(c._requests, {})
+    self.assertEqual(c._stats_in_progress, {})
+    r = c.request(ofp_echo_request())
+    self.assertEqual(r.failed, "disconnected")
+
+  def test_transaction(self):
+    c = self.conn
+    fm1 = ofp_flow_mod(match=ofp_match(in_port=1))
+    fm2 = ofp_flow_mod(match=ofp_match(in_port=2))
+    with c.transaction() as t:
+      c.send(fm1)
+      c.send(fm2)
+    self.assertEqual(t.messages, {fm1.xid: fm1, fm2.xid: fm2})
+    error = ofp_error(xid=fm2.xid, type=OFPET_FLOW_MOD_FAILED, code=OFPFMFC_ALL_TABLES_FULL)
+    self.from_switch(error, ofp_barrier_reply(xid=t.xid))
+    self.assertTrue(t.done)
+    self.assertTrue(t.reply is not None)
+    self.assertEqual(len(t.errors), 1)
+    self.assertTrue(t.errors[0][0] is fm2)
+    self.assertEqual(t.errors[0][1].xid, fm2.xid)
+    self.assertFalse(t.ok)
+    self.assertEqual(c._transaction_xids, {})
+
+class StatsEventTest(unittest.TestCase):
+  def setUp(self):
+    self.sock = MockSocket(b'')
+    self.sock.writable = True
+    self.conn = Connection(self.sock, SelectPoller())
+    self.decoded = 0
+    self._processStatsBody = of_01._processStatsBody
+    def process(body, obj):
+      self.decoded += 1
+      return self._processStatsBody(body, obj)
+    of_01._processStatsBody = process
+
+  def tearDown(self):
+    of_01._processStatsBody = self._processStatsBody
+
+  def from_switch(self, xid, parts):
+    """ parts are lists of port numbers """
+    for (i, ports) in enumerate(parts):
+      self.sock.data += ofp_stats_reply(xid=xid, type=OFPST_PORT, flags=1 if i < len(parts) - 1 else 0,
+          body=b''.join(ofp_port_stats(port_no=p).pack() for p in ports)).pack()
+    self.assertTrue(self.conn.read())
+
+  def test_parts(self):
+    c = self.conn
+    parts = []
+    c.addListener(PortStatsPartReceived, parts.append)
+    self.from_switch(1, [[1, 2], [3], [4]])
+    self.assertEqual([([s.port_no for s in e.stats], e.more) for e in parts], [([1, 2], True), ([3], True), ([4], False)])
+    self.assertEqual(self.decoded, 3)
+
+  def test_parts_kept_for_listeners(self):
+    c = self.conn
+    c.addListener(PortStatsPartReceived, lambda event: None)
+    self.sock.data += ofp_stats_reply(xid=2, type=OFPST_PORT, flags=1, body=ofp_port_stats(port_no=1).pack()).pack()
+    self.assertTrue(c.read())
+    # Nobody wants all the parts at once, so they aren't kept
+    self.assertEqual(c._stats_in_progress[2][1:3], [None, None])
+
+    received = []
+    c.addListener(PortStatsReceived, received.append)
+    self.from_switch(3, [[1, 2], [3]])
+    self.assertEqual(len(received), 1)
+    self.assertEqual(len(received[0].ofp), 2)
+    self.assertEqual([s.port_no for s in received[0].stats], [1, 2, 3])
+
+  def test_no_listeners(self):
+    self.from_switch(1, [[1, 2], [3]])
+    self.assertEqual(self.decoded, 0)
+    self.assertEqual(self.conn._stats_in_progress, {})
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,62 @@
+#!/usr/bin/env python
+
+import unittest
+import sys
+import os.path
+
+sys.path.append(os.path.dirname(__file__) + "/../../..")
+
+from pox.openflow.libopenflow_01 import *
+from pox.openflow.packet_headers import *
+
+class PacketHeadersTest(unittest.TestCase):
+  def setUp(self):
+    self.src = EthAddr("00:00:00:00:00:01")
+    self.dst = EthAddr("00:00:00:00:00:02")
+
+  def eth(self, payload, type=ethernet.IP_TYPE):
+    return ethernet(src=self.src, dst=self.dst, type=type, payload=payload)
+
+  def ip(self, payload, protocol):
+    return ipv4(srcip=IPAddr("1.2.3.4"), dstip=IPAddr("1.2.3.5"), tos=0x10, protocol=protocol, payload=payload)
+
+  def test_udp(self):
+    data = self.eth(self.ip(udp(srcport=1234, dstport=53, payload="haha"), ipv4.UDP_PROTOCOL)).pack()
+    h = PacketHeaders(data)
+    self.assertEqual((h.eth_src, h.eth_dst, h.ethertype, h.dl_type), (self.src, self.dst, 0x800, 0x800))
+    self.assertEqual((h.vlan_id, h.vlan_pcp), (None, None))
+    self.assertEqual((h.ip_src, h.ip_dst, h.ip_proto, h.ip_tos), (IPAddr("1.2.3.4"), IPAddr("1.2.3.5"), 17, 0x10))
+    self.assertEqual((h.tp_src, h.tp_dst), (1234, 53))
+    self.assertEqual((h.arp_opcode, h.arp_src, h.arp_dst), (None, None, None))
+    self.assertEqual(PacketHeaders(buffer(data)).tp_dst, 53)
+
+  def test_vlan_icmp(self):
+    data = self.eth(vlan(id=42, pcp=5, eth_type=ethernet.IP_TYPE, payload=self.ip(icmp(type=8, code=0), ipv4.ICMP_PROTOCOL)), type=ethernet.VLAN_TYPE).pack()
+    h = PacketHeaders(data)
+    self.assertEqual((h.ethertype, h.dl_type, h.vlan_id, h.vlan_pcp), (ethernet.VLAN_TYPE, 0x800, 42, 5))
+    self.assertEqual((h.ip_proto, h.tp_src, h.tp_dst), (1, 8, 0))
+
+  def test_arp(self):
+    data = self.eth(arp(opcode=arp.REPLY, hwsrc=self.src, protosrc=IPAddr("1.2.3.4"), protodst=IPAddr("1.2.3.5")), type=ethernet.ARP_TYPE).pack()
+    h = PacketHeaders(data)
+    self.assertEqual((h.arp_opcode, h.arp_src, h.arp_dst), (arp.REPLY, IPAddr("1.2.3.4"), IPAddr("1.2.3.5")))
+    self.assertEqual((h.ip_src, h.tp_src), (None, None))
+
+  def test_truncated(self):
+    data = self.eth(self.ip(tcp(srcport=1, dstport=2), ipv4.TCP_PROTOCOL)).pack()
+    self.assertEqual(PacketHeaders(data[:10]).eth_dst, None)
+    h = PacketHeaders(data[:30])
+    self.assertEqual((h.eth_dst, h.dl_type, h.ip_src, h.tp_dst), (self.dst, 0x800, None, None))
+    h = PacketHeaders(data[:36])
+    self.assertEqual((h.ip_proto, h.tp_dst), (6, None))
+
+  def test_parsed(self):
+    data = self.eth(self.ip(udp(srcport=1234, dstport=53), ipv4.UDP_PROTOCOL)).pack()
+    h = PacketHeaders(data)
+    p = h.parsed
+    self.assertTrue(p is h.parsed, "parse should be cached")
+    self.assertEqual((p.src, p.dst, p.type), (h.eth_src, h.eth_dst, h.ethertype))
+    self.assertEqual(PacketHeaders(buffer(data)).parsed.dst, self.dst)
+
+if __name__ == '__main__':
+  unittest.main()
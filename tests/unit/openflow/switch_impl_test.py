@@ -67,6 +67,19 @@ class SwitchImplTest(unittest.TestCase):
     self.assertEqual(e.priority,1)
     self.assertEqual(e.match, ofp_match(in_port=1, nw_src="1.2.3.4"))
 
+  def test_flow_mod_check_overlap(self):
+    c = self.conn
+    s = self.switch
+    c.to_switch(ofp_flow_mod(xid=124, priority=1, match=ofp_match(in_port=1, nw_src="1.2.3.4")))
+    c.to_switch(ofp_flow_mod(xid=125, priority=1, match=ofp_match(in_port=1), flags=OFPFF_CHECK_OVERLAP))
+    self.assertEqual(len(s.table), 1)
+    self.assertEqual(len(c.received), 1)
+    self.assertTrue(isinstance(c.last, ofp_error) and c.last.xid == 125 and c.last.type == OFPET_FLOW_MOD_FAILED
+                    and c.last.code == OFPFMFC_OVERLAP, "should have received overlap error but got %s" % c.last)
+    c.to_switch(ofp_flow_mod(xid=126, priority=2, match=ofp_match(in_port=1), flags=OFPFF_CHECK_OVERLAP))
+    self.assertEqual(len(s.table), 2)
+    self.assertEqual(len(c.received), 1)
+
   def test_packet_out(self):
     c = self.conn
     s = self.switch